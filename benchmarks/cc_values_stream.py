@@ -0,0 +1,74 @@
+"""Cost of the CC values sent to Trevor, JSON packages vs. binary frames
+
+Simulates N watched parameters of 4 MIDI devices changing continuously and
+builds the message sent to the clients at 60 frames per second, as the former
+nested JSON package and as the binary frame. It reports the CPU time per
+second of stream and the bytes per frame.
+
+usage: python benchmarks/cc_values_stream.py [parameters] [seconds]
+"""
+
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+
+from nallely.trevor.value_stream import ControlValueStream
+
+FPS = 60
+MESSAGES_PER_FRAME = 20  # CCs received by parameter between two frames
+
+
+def keys(count):
+    return [
+        (device, f"Device{device}", f"section{i % 8}", f"param{i}")
+        for i in range(count)
+        for device in range(4)
+    ][:count]
+
+
+def json_stream(params, frames, values):
+    size = 0
+    start = time.process_time()
+    for i in range(frames):
+        package = defaultdict(
+            lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
+        )
+        for device_id, device, section, parameter in params:
+            for value in values:
+                package[device_id][device][section][parameter] = (value + i) % 128
+        size += len(
+            json.dumps({"command": "RuntimeAPI::updateCCValues", "arg": package})
+        )
+    return time.process_time() - start, size / frames
+
+
+def binary_stream(params, frames, values):
+    stream = ControlValueStream()
+    size = 0
+    start = time.process_time()
+    for i in range(frames):
+        for key in params:
+            for value in values:
+                stream.update(key, (value + i) % 128)
+        if stream.unpublished():
+            stream.table()
+        frame = stream.frame()
+        size += len(frame) if frame else 0
+    return time.process_time() - start, size / frames
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    params = keys(count)
+    frames = FPS * seconds
+    print(f"{count} parameters, {FPS} fps, {MESSAGES_PER_FRAME} CCs/parameter/frame")
+    for name, run in (("json", json_stream), ("binary", binary_stream)):
+        rng = random.Random(42)
+        values = [rng.randint(0, 127) for _ in range(MESSAGES_PER_FRAME)]
+        cpu, size = run(params, frames, values)
+        print(
+            f"  {name:>6}: {cpu / seconds * 1000:.1f}ms CPU per second, {size:.0f} bytes/frame"
+        )
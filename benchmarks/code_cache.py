@@ -0,0 +1,61 @@
+"""Cost of the code sent again by the UI: a playground cell and a class patch
+
+A cell (20 lines) is executed N times, compiled each time as before and
+with compile_cached. The same class patch (the source of the sequencer, as
+the UI sends it on reconnect) is applied N times to a running instance with
+object_centric_compile_inject: before, it was compiled and the instance
+migrated (paused, set up again, resumed) each time; now it's applied once.
+
+usage: python benchmarks/code_cache.py [runs]
+"""
+
+import inspect
+import sys
+import time
+
+import nallely
+from nallely.session import Session
+from nallely.utils import compile_cached
+
+CELL = "\n".join(f"x{i} = [j * {i} for j in range(10)]" for i in range(20))
+
+
+def run_cell(runs, compiler):
+    context = {}
+    start = time.perf_counter()
+    for _ in range(runs):
+        exec(compiler(CELL, "<string>", "exec"), {}, context)
+    return (time.perf_counter() - start) / runs
+
+
+def apply_patch(runs, reset):
+    from nallely.sequencer import Sequencer
+
+    device = Sequencer()
+    device.start()
+    meta = Session().meta_trevor
+    code = inspect.getsource(Sequencer)
+    migrations = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        cls = device.__class__
+        if reset:
+            cls.__compiled_from__ = None  # as before: compiled every time
+        meta.object_centric_compile_inject(device, code)
+        migrations += device.__class__ is not cls
+    elapsed = (time.perf_counter() - start) / runs
+    nallely.stop_all_connected_devices()
+    return elapsed, migrations
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    results = [
+        ("cell, compiled", run_cell(runs, compile), None),
+        ("cell, cached", run_cell(runs, compile_cached), None),
+        ("class patch, before", *apply_patch(runs, reset=True)),
+        ("class patch, now", *apply_patch(runs, reset=False)),
+    ]
+    for name, elapsed, migrations in results:
+        migrated = "" if migrations is None else f", {migrations} migrations"
+        print(f"{name:>20}: {elapsed * 1e6:.0f}us per run{migrated}")
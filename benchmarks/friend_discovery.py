@@ -0,0 +1,87 @@
+"""Cost of finding the other Nallely instances: /24 port scan vs. beacons
+
+The port scan is the one Trevor used to run each time the UI asked for the
+friends: a TCP connection to port 6788 on each address of the /24 of the
+host, 100 at a time with a 2s timeout (the websocket handshake done on the
+open ports is left out). Its duration and CPU time are measured once.
+
+For the beacons, N instances are started on the loopback (they share the
+beacon port, as instances of a same host do), and the time until each one
+knows all the others is measured, then the CPU time they use per second
+and the time to read the friends.
+
+usage: python benchmarks/friend_discovery.py [instances]
+"""
+
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nallely.distributed import PeerBeacon
+from nallely.utils import get_my_ip
+
+
+def port_scan(port=6788, timeout=2):
+    found = []
+
+    def check_port(ip):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            if s.connect_ex((ip, port)) == 0:
+                found.append(ip)
+
+    prefix = ".".join(get_my_ip().split(".")[:-1])
+    threads = threading.active_count()
+    with ThreadPoolExecutor(max_workers=100) as executor:
+        for i in range(1, 255):
+            executor.submit(check_port, f"{prefix}.{i}")
+        threads = max(threads, threading.active_count())
+    return found, threads
+
+
+def beacons(count, port=6796):
+    return [
+        PeerBeacon(
+            lambda i=i: {"name": f"peer{i}", "ports": {"trevor": 6788 + i}},
+            port=port,
+            address="127.255.255.255",
+        )
+        for i in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    start, cpu = time.perf_counter(), time.process_time()
+    found, threads = port_scan()
+    print(
+        f"/24 port scan: {time.perf_counter() - start:.2f}s, "
+        f"CPU {(time.process_time() - cpu) * 1000:.0f}ms, {threads} threads, "
+        f"{len(found)} found"
+    )
+
+    instances = beacons(count)
+    start = time.perf_counter()
+    for instance in instances:
+        instance.ensure_running()
+    while not all(len(i.snapshot()) == count for i in instances):
+        time.sleep(0.001)
+    converged = time.perf_counter() - start
+    cpu = time.process_time()
+    time.sleep(10)
+    cpu = (time.process_time() - cpu) / 10 / count
+    reads = []
+    for _ in range(1000):
+        start = time.perf_counter()
+        instances[0].snapshot()
+        reads.append(time.perf_counter() - start)
+    for instance in instances:
+        instance.stop()
+    print(
+        f"{count} beacons on loopback: all known in {converged * 1000:.1f}ms, "
+        f"CPU {cpu * 1000:.2f}ms/s per instance, "
+        f"friends read in {statistics.median(reads) * 1e6:.1f}us"
+    )
@@ -0,0 +1,107 @@
+"""Inter-onset jitter of MIDI events: thread wake-up timing vs. scheduled dispatch
+
+Sends a steady stream of notes (16th notes at the given BPM) to a fake output
+port recording the send time, while other threads load the interpreter. Before
+each event, the producer does a variable amount of work (as a neuron/link chain
+would) which directly delays the event when it is sent right away.
+
+usage: python benchmarks/midi_scheduler_jitter.py [bpm] [events] [load_threads]
+"""
+
+import random
+import statistics
+import sys
+import threading
+import time
+
+import mido
+
+from nallely.core.scheduler import MidiScheduler
+
+
+class RecordingPort:
+    def __init__(self):
+        self.times = []
+
+    def send(self, msg):
+        self.times.append(time.perf_counter())
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def work():
+    end = time.perf_counter() + random.uniform(0, 0.008)
+    while time.perf_counter() < end:
+        pass
+
+
+def sleep_until(t):
+    # same strategy as VirtualDevice.sleep
+    while True:
+        remaining = t - time.perf_counter()
+        if remaining <= 0:
+            return
+        time.sleep(remaining / 2 if remaining > 0.002 else 0)
+
+
+def run_threaded(period, events):
+    port = RecordingPort()
+    msg = mido.Message("note_on", note=60)
+    next_time = time.perf_counter() + 0.05
+    for _ in range(events):
+        sleep_until(next_time)
+        work()
+        port.send(msg)
+        next_time += period
+    return port.times
+
+
+def run_scheduled(period, events, lookahead=4):
+    port = RecordingPort()
+    scheduler = MidiScheduler()
+    msg = mido.Message("note_on", note=60)
+    next_time = time.perf_counter() + 0.05
+    for _ in range(events):
+        # the producer only wakes up "lookahead" steps before the deadline
+        sleep_until(next_time - lookahead * period)
+        work()
+        scheduler.send_at(port, msg, next_time)
+        next_time += period
+    sleep_until(next_time + 0.05)
+    scheduler.stop()
+    return port.times
+
+
+def report(name, times, period):
+    intervals = [(b - a) * 1000 for a, b in zip(times, times[1:])]
+    errors = [abs(i - period * 1000) for i in intervals]
+    print(
+        f"{name:>10}: mean={statistics.mean(intervals):.3f}ms "
+        f"stdev={statistics.pstdev(intervals):.3f}ms "
+        f"max_err={max(errors):.3f}ms p99_err={sorted(errors)[int(len(errors) * 0.99)]:.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    bpm = float(sys.argv[1]) if len(sys.argv) > 1 else 120
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    load_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    period = 60 / bpm / 4
+
+    stop = threading.Event()
+    loaders = [threading.Thread(target=busy, args=(stop,)) for _ in range(load_threads)]
+    for t in loaders:
+        t.start()
+    try:
+        print(
+            f"{events} events, period={period * 1000:.2f}ms, {load_threads} load threads"
+        )
+        report("threaded", run_threaded(period, events), period)
+        report("scheduled", run_scheduled(period, events), period)
+    finally:
+        stop.set()
+        for t in loaders:
+            t.join()
@@ -0,0 +1,88 @@
+"""Cost of printing from the playground, with the output captured for the UI
+
+A playground loop prints N lines as fast as it can while the output is
+captured, as with "execute_code". The messages go through the outbound queue
+of a client whose socket takes 50us to send a message (as a websocket on a
+Pi). It's measured with the previous capture (a "stdout" message for each
+write, print() writes the text and the newline separately) and with the
+batched one: the time spent in print, the messages sent, and the share of
+the output the client received (the previous capture sent values, the
+outbound queue drops the oldest values of a slow client, the batches are
+sent as control messages).
+
+usage: python benchmarks/playground_output.py [lines]
+"""
+
+import io
+import json
+import sys
+import threading
+import time
+
+from nallely.outbound import ClientWriters
+from nallely.trevor.trevor_bus import IOCapture
+from nallely.utils import to_json
+
+
+class PreviousIOCapture(io.StringIO):
+    def __init__(self, send_value, send_message):
+        super().__init__()
+        self.send_value = send_value
+        self._lock = threading.RLock()
+
+    def write(self, data):
+        with self._lock:
+            self.send_value({"command": "stdout", "line": data})
+            return super().write(data)
+
+
+class SlowClient:
+    def __init__(self):
+        self.messages = 0
+        self.received = 0
+
+    def send(self, message):
+        time.sleep(50e-6)
+        self.messages += 1
+        self.received += len(json.loads(message)["line"])
+
+
+def run(capture_class, lines):
+    client = SlowClient()
+    writers = ClientWriters("bench")
+    writer = writers.for_client(client)
+
+    def send_value(message):
+        writer.send_value(to_json(message))
+
+    def send_message(message):
+        writer.send(to_json(message))
+
+    capture = capture_class(send_value, send_message)
+    produced = 0
+    start = time.perf_counter()
+    for i in range(lines):
+        line = f"step {i}: value={i * 0.5:.2f}"
+        print(line, file=capture)
+        produced += len(line) + 1
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)
+    while writer.pending:
+        time.sleep(0.05)
+    writers.clear()
+    return elapsed, client.messages, client.received, produced
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"{lines} lines printed")
+    for name, capture_class in (
+        ("previous", PreviousIOCapture),
+        ("batched", lambda send_value, send_message: IOCapture(send_message)),
+    ):
+        elapsed, messages, received, produced = run(capture_class, lines)
+        print(
+            f"  {name:>8}: {elapsed / lines * 1e6:.2f}us per print, "
+            f"{messages} messages sent, "
+            f"{received / produced * 100:.0f}% of the output received"
+        )
@@ -0,0 +1,99 @@
+"""Messages sent and time-to-apply when switching presets, full vs. differential
+
+Loads pairs of presets on generated devices (NTS-1, Minilogue) connected to a
+fake output port which takes the time a CC needs on a DIN MIDI cable (3 bytes
+at 31250 bauds). The first preset is loaded, then the second one, and only the
+second load is measured.
+
+usage: python benchmarks/preset_transfer.py [rounds]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+import nallely
+from nallely.devices import NTS1, Minilogue
+
+WIRE_TIME = 3 * 10 / 31250  # 3 bytes, 10 bits each
+
+
+class WirePort:
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, msg):
+        self.sent += 1
+        end = time.perf_counter() + WIRE_TIME
+        while time.perf_counter() < end:
+            pass
+
+
+def random_preset(device, rng):
+    preset = {}
+    for parameter in device.all_parameters():
+        if parameter.type != "control_change":
+            continue
+        low, high = parameter.range
+        section = preset.setdefault(parameter.section_name, {})
+        section[parameter.name] = rng.randint(low, high)
+    return preset
+
+
+def variation(preset, ratio, rng):
+    # tweaks some parameters of the preset, as a patch and one of its variations
+    new = {section: {**params} for section, params in preset.items()}
+    for params in new.values():
+        for name in params:
+            if rng.random() < ratio:
+                params[name] = rng.randint(0, 127)
+    return new
+
+
+def measure(device, first, second, diff):
+    device.outport = WirePort()  # type: ignore
+    device.modules.forget()
+    device.load_preset(dct=first, diff=diff)
+    port = device.outport = WirePort()  # type: ignore
+    start = time.perf_counter()
+    device.load_preset(dct=second, diff=diff)
+    return port.sent, (time.perf_counter() - start) * 1000
+
+
+def run(device, rounds):
+    rng = random.Random(42)
+    pairs = {
+        "same preset": lambda p: p,
+        "variation 10%": lambda p: variation(p, 0.1, rng),
+        "variation 50%": lambda p: variation(p, 0.5, rng),
+        "other preset": lambda _: random_preset(device, rng),
+    }
+    print(f"{device.__class__.__name__} ({len(device.all_parameters())} parameters)")
+    for name, second_of in pairs.items():
+        results = {}
+        for diff in (False, True):
+            sent, times = [], []
+            for _ in range(rounds):
+                first = random_preset(device, rng)
+                count, elapsed = measure(device, first, second_of(first), diff)
+                sent.append(count)
+                times.append(elapsed)
+            results[diff] = (statistics.mean(sent), statistics.mean(times))
+        (full_sent, full_time), (diff_sent, diff_time) = results[False], results[True]
+        print(
+            f"  {name:>14}: full={full_sent:.0f} msgs {full_time:.2f}ms  "
+            f"diff={diff_sent:.0f} msgs {diff_time:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    devices = [NTS1(autoconnect=False), Minilogue(autoconnect=False)]
+    try:
+        for device in devices:
+            run(device, rounds)
+    finally:
+        for device in devices:
+            device.outport = None
+        nallely.stop_all_connected_devices()
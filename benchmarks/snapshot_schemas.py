@@ -0,0 +1,87 @@
+"""Cost of serializing a session with and without the per-class schema cache
+
+Creates N virtual devices (cycling over the available classes, without
+starting them) and measures the serialization of the devices as done for the
+session snapshot, plus the list of all the classes schemas. The "uncached" run
+rebuilds the schemas for each device as before the cache.
+
+usage: python benchmarks/snapshot_schemas.py [devices] [rounds]
+"""
+
+import statistics
+import sys
+import time
+from dataclasses import asdict
+
+import nallely
+from nallely.core import VirtualDevice, get_all_virtual_parameters
+from nallely.core.world import get_virtual_device_classes
+
+
+def uncached_schema_as_dict(cls):
+    parameters = list(get_all_virtual_parameters(cls).values())
+    return {
+        "name": cls.__name__,
+        "parameters": [asdict(p) for p in parameters if not p.hidden],
+        "doc": cls.__doc__,
+    }
+
+
+def uncached_all_parameters(cls):
+    return list(get_all_virtual_parameters(cls).values())
+
+
+def create_devices(count):
+    devices = []
+    classes = [
+        cls
+        for cls in get_virtual_device_classes()
+        if cls.__name__ not in ("WebSocketBus", "OSCBus", "TrevorBus")
+    ]
+    while len(devices) < count:
+        for cls in classes:
+            if len(devices) >= count:
+                break
+            try:
+                devices.append(cls(autoconnect=False))
+            except Exception:
+                classes.remove(cls)
+    return devices
+
+
+def snapshot(devices):
+    return (
+        [device.to_dict(save_defaultvalues=True) for device in devices],
+        [cls.schema_as_dict() for cls in get_virtual_device_classes()],
+    )
+
+
+def measure(devices, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        snapshot(devices)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    devices = create_devices(count)
+    try:
+        cached = measure(devices, rounds)
+        schema_as_dict = VirtualDevice.schema_as_dict
+        all_parameters = VirtualDevice.all_parameters
+        VirtualDevice.schema_as_dict = classmethod(uncached_schema_as_dict)  # type: ignore
+        VirtualDevice.all_parameters = classmethod(uncached_all_parameters)  # type: ignore
+        try:
+            uncached = measure(devices, rounds)
+        finally:
+            VirtualDevice.schema_as_dict = schema_as_dict  # type: ignore
+            VirtualDevice.all_parameters = all_parameters  # type: ignore
+        print(f"{len(devices)} devices, median of {rounds} snapshots")
+        print(f"  uncached: {uncached:.2f}ms")
+        print(f"    cached: {cached:.2f}ms")
+    finally:
+        nallely.stop_all_connected_devices()
@@ -0,0 +1,55 @@
+"""Size and serialization time of the session state with a class schema table
+
+Creates N virtual devices (cycling over a few classes, without starting them),
+and serializes the session snapshot as sent to Trevor clients: once with the
+schema of its class inlined in each device ("meta"), once with the schemas sent
+once per class in the schemas table.
+
+usage: python benchmarks/state_schema_table.py [devices] [rounds]
+"""
+
+import json
+import statistics
+import sys
+import time
+
+import nallely
+from nallely.core.world import virtual_device_classes
+from nallely.session import Session
+from nallely.trevor.schemas import SchemaTable
+from nallely.utils import StateEncoder
+
+CLASSES = ("LFO", "Looper", "Bitwise", "Comparator", "Arpegiator")
+
+
+def create_devices(count):
+    classes = [virtual_device_classes[name] for name in CLASSES]
+    return [classes[i % len(classes)](autoconnect=False) for i in range(count)]
+
+
+def measure(session, rounds, table=None):
+    times, size = [], 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        state = session.snapshot(save_defaultvalues=True)
+        if table:
+            table.normalize(state)
+        message = json.dumps(state, cls=StateEncoder)
+        times.append((time.perf_counter() - start) * 1000)
+        size = len(message)
+    return size, statistics.median(times)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    devices = create_devices(count)
+    session = Session()
+    try:
+        inline = measure(session, rounds)
+        table = measure(session, rounds, SchemaTable())
+        print(f"{len(devices)} devices, median of {rounds} snapshots")
+        print(f"  inline schemas: {inline[0] / 1024:.0f}KiB in {inline[1]:.2f}ms")
+        print(f"  schemas table:  {table[0] / 1024:.0f}KiB in {table[1]:.2f}ms")
+    finally:
+        nallely.stop_all_connected_devices()
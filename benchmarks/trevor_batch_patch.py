@@ -0,0 +1,122 @@
+"""Building a patch over the Trevor socket, command by command vs. one batch
+
+Starts a Trevor server (in a subprocess) and creates a patch of N LFOs and
+2*N links from a TrevorClient. Command by command, the client has to wait for
+the state update after each device creation to know the ID to wire, the links
+are then sent one at a time too. With a batch, all the operations are sent in
+one message, the links refer to the devices created by the same batch and a
+single update is sent back. The time is measured until the client state holds
+the whole patch.
+
+usage: python benchmarks/trevor_batch_patch.py [devices]
+"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "libs" / "python"))
+
+from trevor_client import TrevorClient  # noqa: E402
+
+
+def serve():
+    from nallely.trevor.trevor_bus import TrevorBus
+
+    trevor = TrevorBus()
+    trevor.start()
+    # the logs of the bus go to stdout, the bench talks on stderr
+    print("ready", file=sys.stderr, flush=True)
+    sys.stdin.readline()
+
+
+def links(ids):
+    count = len(ids)
+    for i, src in enumerate(ids):
+        yield src, ids[(i + 1) % count], "speed_cv"
+        yield src, ids[(i + 2) % count], "pulse_width_cv"
+
+
+def wire_params(src, dst, parameter):
+    return {
+        "from_parameter": f"{src}::__virtual__::output_cv",
+        "to_parameter": f"{dst}::__virtual__::{parameter}",
+    }
+
+
+def wait_until(client, condition):
+    while not condition():
+        client._receive()
+
+
+def one_by_one(client, devices):
+    ids = []
+    for _ in range(devices):
+        known = {device["id"] for device in client.virtual_devices}
+        client.ws.send(json.dumps({"command": "create_device", "name": "LFO"}))
+        wait_until(client, lambda: len(client.virtual_devices) > len(known))
+        ids.extend(d["id"] for d in client.virtual_devices if d["id"] not in known)
+    for src, dst, parameter in links(ids):
+        count = len(client.connections)
+        client.ws.send(
+            json.dumps(
+                {
+                    "command": "associate_parameters",
+                    "unbind": False,
+                    **wire_params(src, dst, parameter),
+                }
+            )
+        )
+        wait_until(client, lambda: len(client.connections) > count)
+
+
+def batched(client, devices):
+    with client.batch() as batch:
+        ids = [batch.create_device("LFO") for _ in range(devices)]
+        for src, dst, parameter in links(ids):
+            batch.wire(**wire_params(src, dst, parameter))
+
+
+def run(build, devices):
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        if not server.stderr.readline().startswith("ready"):  # type: ignore
+            raise RuntimeError("The server didn't start")
+        client = TrevorClient()
+        for _ in range(50):
+            try:
+                client.connect()
+                break
+            except OSError:
+                time.sleep(0.1)
+        virtual_devices = len(client.virtual_devices)
+        start = time.perf_counter()
+        build(client, devices)
+        wait_until(
+            client,
+            lambda: len(client.virtual_devices) == virtual_devices + devices
+            and len(client.connections) == 2 * devices,
+        )
+        elapsed = time.perf_counter() - start
+        client.disconnect()
+        return elapsed * 1000
+    finally:
+        server.kill()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve()
+        sys.exit(0)
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{devices} devices, {2 * devices} links")
+    print(f"  one by one: {run(one_by_one, devices):.1f}ms")
+    print(f"     batched: {run(batched, devices):.1f}ms")
@@ -0,0 +1,145 @@
+"""Initial state and update traffic of full vs. lazy Trevor clients
+
+Starts a Trevor server (in a subprocess) and builds a patch of N LFOs and
+L links with a batch. It then measures the first message a new client
+receives, and how long it takes to parse it: the full state for a regular
+client, the topology for a lazy one (/trevor?lazy=1). Finally, both clients
+listen while another one changes a parameter of the LFOs in a round robin.
+The lazy client only displays V devices. The bytes each one receives are
+reported.
+
+usage: python benchmarks/trevor_lazy_state.py [devices] [links] [viewport]
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from websockets.sync.client import connect
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "libs" / "python"))
+
+from trevor_client import TrevorClient  # noqa: E402
+
+URL = "ws://localhost:6788/trevor"
+TARGETS = ("speed_cv", "pulse_width_cv", "step_size_cv", "min_value_cv")
+
+
+def serve():
+    from nallely.trevor.trevor_bus import TrevorBus
+
+    trevor = TrevorBus()
+    trevor.start()
+    # the logs of the bus go to stdout, the bench talks on stderr
+    print("ready", file=sys.stderr, flush=True)
+    sys.stdin.readline()
+
+
+def build_patch(client, devices, links):
+    with client.batch() as batch:
+        ids = [batch.create_device("LFO") for _ in range(devices)]
+        for i in range(links):
+            src = ids[i % devices]
+            dst = ids[(i // len(TARGETS) + 1 + i) % devices]
+            batch.wire(
+                f"{src}::__virtual__::output_cv",
+                f"{dst}::__virtual__::{TARGETS[i % len(TARGETS)]}",
+            )
+    return [batch.resolve(id) for id in ids]
+
+
+def first_message(url):
+    with connect(url, max_size=None) as client:
+        start = time.perf_counter()
+        message = client.recv()
+        received = time.perf_counter() - start
+        start = time.perf_counter()
+        json.loads(message)
+        parsed = time.perf_counter() - start
+    return len(message), received * 1000, parsed * 1000
+
+
+def listen(client, received, stop):
+    while not stop.is_set():
+        try:
+            message = client.recv(timeout=0.1)
+        except TimeoutError:
+            continue
+        if isinstance(message, str):
+            received[0] += len(message)
+
+
+def update_traffic(ids, viewport, duration):
+    full = connect(URL, max_size=None)
+    full.recv()
+    lazy = TrevorClient(lazy=True)
+    lazy.connect()
+    lazy.set_viewport(ids[:viewport])
+    stop = threading.Event()
+    full_received, lazy_received = [0], [0]
+    listeners = [
+        threading.Thread(target=listen, args=(full, full_received, stop)),
+        threading.Thread(target=listen, args=(lazy.ws, lazy_received, stop)),
+    ]
+    for listener in listeners:
+        listener.start()
+    driver = TrevorClient()
+    driver.connect()
+    end = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < end:
+        driver.submit(
+            "set_virtual_value",
+            device_id=ids[i % len(ids)],
+            parameter="max_value",
+            value=100 + i % 27,
+        )
+        i += 1
+        time.sleep(0.005)
+    time.sleep(0.2)
+    stop.set()
+    for listener in listeners:
+        listener.join()
+    for client in (full, lazy, driver):
+        client.close() if client is full else client.disconnect()
+    return full_received[0], lazy_received[0]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve()
+        sys.exit(0)
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    links = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    viewport = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        if not server.stderr.readline().startswith("ready"):  # type: ignore
+            raise RuntimeError("The server didn't start")
+        time.sleep(0.5)
+        builder = TrevorClient(lazy=True)
+        builder.connect()
+        ids = build_patch(builder, devices, links)
+        builder.disconnect()
+        print(f"{devices} devices, {links} links")
+        for name, url in (("full", URL), ("lazy", f"{URL}?lazy=1")):
+            size, received, parsed = first_message(url)
+            print(
+                f"  {name:>4} first message: {size / 1024:.0f}KiB, "
+                f"received in {received:.1f}ms, parsed in {parsed:.1f}ms"
+            )
+        full, lazy = update_traffic(ids, viewport, 2)
+        print(f"  updates over 2s (lazy viewport of {viewport} devices)")
+        print(f"    full: {full / 1024:.0f}KiB")
+        print(f"    lazy: {lazy / 1024:.0f}KiB")
+    finally:
+        server.kill()
@@ -0,0 +1,89 @@
+"""Serialized vs. pipelined Trevor commands with request acknowledgements
+
+Starts a Trevor server (in a subprocess) with an LFO and sends N
+"set_virtual_value" commands from a TrevorClient: once waiting for the
+acknowledgement of each command before sending the next one, once sending all
+of them then waiting for their acknowledgements.
+
+usage: python benchmarks/trevor_pipelining.py [commands]
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "libs" / "python"))
+
+from trevor_client import TrevorClient  # noqa: E402
+
+
+def serve():
+    from nallely.trevor.trevor_bus import TrevorBus
+
+    trevor = TrevorBus()
+    trevor.start()
+    # the logs of the bus go to stdout, the bench talks on stderr
+    print("ready", file=sys.stderr, flush=True)
+    sys.stdin.readline()
+
+
+def commands(lfo_id, count):
+    for i in range(count):
+        yield {"device_id": lfo_id, "parameter": "speed", "value": (i % 100) / 10}
+
+
+def serialized(client, lfo_id, count):
+    for params in commands(lfo_id, count):
+        client.request("set_virtual_value", **params)
+
+
+def pipelined(client, lfo_id, count):
+    requests = [
+        client.submit("set_virtual_value", **params)
+        for params in commands(lfo_id, count)
+    ]
+    for request in requests:
+        client.result(request)
+
+
+def connect():
+    client = TrevorClient()
+    for _ in range(50):
+        try:
+            client.connect()
+            return client
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Cannot connect to the server")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve()
+        sys.exit(0)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        if not server.stderr.readline().startswith("ready"):  # type: ignore
+            raise RuntimeError("The server didn't start")
+        client = connect()
+        lfo_id = client.create_device("LFO")
+        print(f"{count} commands")
+        for mode in (serialized, pipelined):
+            start = time.perf_counter()
+            mode(client, lfo_id, count)
+            elapsed = time.perf_counter() - start
+            print(
+                f"  {mode.__name__:>10}: {elapsed * 1000:.1f}ms "
+                f"({count / elapsed:.0f} commands/s)"
+            )
+        client.disconnect()
+    finally:
+        server.kill()
@@ -0,0 +1,161 @@
+"""Command latency and throughput of the threaded vs. asyncio Trevor servers
+
+Starts a Trevor server (in a subprocess, so the clients don't share its GIL)
+with an LFO, then connects M clients which each send R "set_virtual_value"
+commands per second (as a slider dragged in the UI) for some seconds, or as
+fast as possible if R is 0. Meanwhile, a probe client
+sends "queue_metrics" commands one at a time and measures the round trip until
+its answer. The number of commands handled by the server is counted on its side.
+
+usage: python benchmarks/trevor_server_load.py [clients] [rate] [seconds]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from websockets.sync.client import connect
+
+URL = "ws://localhost:6788/trevor"
+
+
+def serve(mode):
+    from nallely.trevor.trevor_bus import TrevorBus
+
+    trevor = TrevorBus(server=mode)
+    handled = 0
+    handle = trevor.handleMessage
+
+    def counting_handle(client, message):
+        nonlocal handled
+        handled += 1
+        return handle(client, message)
+
+    trevor.handleMessage = counting_handle
+    lfo = trevor.trevor.create_device("LFO")
+    trevor._setup_created_instance(lfo)
+    trevor.start()
+    # the logs of the bus go to stdout, the bench talks on stderr
+    print(f"ready {lfo.uuid}", file=sys.stderr, flush=True)
+    sys.stdin.readline()
+    print(f"handled {handled}", file=sys.stderr, flush=True)
+
+
+def drain(client, stop):
+    while not stop.is_set():
+        try:
+            client.recv(timeout=0.1)
+        except TimeoutError:
+            pass
+        except Exception:
+            return
+
+
+def load(lfo_id, rate, duration, sent, stop):
+    client = connect(URL)
+    reader = threading.Thread(target=drain, args=(client, stop), daemon=True)
+    reader.start()
+    start = time.perf_counter()
+    end = start + duration
+    count = 0
+    while (now := time.perf_counter()) < end:
+        if rate and count >= (now - start) * rate:
+            time.sleep(1 / rate)
+            continue
+        client.send(
+            json.dumps(
+                {
+                    "command": "set_virtual_value",
+                    "device_id": lfo_id,
+                    "parameter": "speed",
+                    "value": (count % 100) / 10,
+                }
+            )
+        )
+        count += 1
+    sent.append(count)
+
+
+def probe(duration, latencies):
+    client = connect(URL)
+    client.recv()  # full state
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        client.send(json.dumps({"command": "queue_metrics"}))
+        while True:
+            message = client.recv(timeout=10)
+            if isinstance(message, str) and '"queueMetrics"' in message:
+                break
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+    client.close()
+
+
+def run(mode, clients, rate, duration):
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", mode],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        while True:
+            line = server.stderr.readline()  # type: ignore
+            if not line:
+                raise RuntimeError("The server didn't start")
+            if line.startswith("ready"):
+                lfo_id = int(line.split()[1])
+                break
+        time.sleep(0.5)
+        stop = threading.Event()
+        sent, latencies = [], []
+        loaders = [
+            threading.Thread(
+                target=load, args=(lfo_id, rate, duration, sent, stop), daemon=True
+            )
+            for _ in range(clients)
+        ]
+        start = time.perf_counter()
+        for loader in loaders:
+            loader.start()
+        probe(duration, latencies)
+        # what is still buffered is not counted, the server is killed after
+        elapsed = time.perf_counter() - start
+        server.stdin.write("\n")  # type: ignore
+        server.stdin.flush()  # type: ignore
+        handled = 0
+        for line in server.stderr:  # type: ignore
+            if line.startswith("handled"):
+                handled = int(line.split()[1])
+                break
+    finally:
+        stop.set()
+        server.kill()
+    latencies.sort()
+    return {
+        "throughput": handled / elapsed,
+        "sent": sum(sent),  # type: ignore
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--serve":
+        serve(sys.argv[2])
+        sys.exit(0)
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 3
+    print(f"{clients} clients, {rate or 'max'} commands/s each, {duration}s")
+    for mode in ("threaded", "async"):
+        r = run(mode, clients, rate, duration)
+        print(
+            f"  {mode:>8}: {r['throughput']:.0f} commands/s handled ({r['sent']} sent), "
+            f"latency p50={r['p50']:.2f}ms p99={r['p99']:.2f}ms"
+        )
@@ -0,0 +1,161 @@
+"""Encode time and wire bytes of the Trevor state updates
+
+Records a session of N virtual devices (cycling over a few classes) with
+links between them: the state as Trevor builds it after each of S edits (a
+parameter of a device changes, sometimes a link is added). The recording is
+then replayed twice: as the stdlib json path (json.dumps round trip to
+normalize the state, then the patch encoded with json.dumps), and with the
+encoding of VersionedState (items reused when their JSON didn't change,
+orjson when it's installed). A client joining at each step receives the
+full state, encoded as json.dumps, or with the JSON of the items spliced.
+
+The messages of the session (a full state, then the patches) are compressed
+as permessage-deflate does it (one compressor for the connection, flushed
+after each message) with websockets' default settings and the ones of
+nallely.outbound.deflate().
+
+usage: python benchmarks/trevor_state_encoding.py [devices] [steps]
+"""
+
+import json
+import random
+import statistics
+import sys
+import time
+import zlib
+
+import nallely
+from nallely.core.world import virtual_device_classes
+from nallely.outbound import DEFLATE_LEVEL, DEFLATE_WINDOW_BITS
+from nallely.session import Session
+from nallely.trevor.schemas import SchemaTable
+from nallely.trevor.state_diff import VersionedState, diff
+from nallely.trevor.trevor_api import TrevorAPI
+from nallely.utils import StateEncoder, orjson, to_json
+
+CLASSES = ("LFO", "Looper", "Bitwise", "Comparator", "Arpegiator")
+PARAMETERS = ("speed", "min_value", "max_value", "phase")
+
+
+def record(count, steps):
+    trevor = TrevorAPI()
+    classes = [virtual_device_classes[name] for name in CLASSES]
+    devices = [classes[i % len(classes)](autoconnect=False) for i in range(count)]
+    lfos = [device for device in devices if type(device).__name__ == "LFO"]
+    session, schemas = Session(), SchemaTable()
+    rnd = random.Random(1)
+
+    def wire():
+        src, dst = rnd.choice(lfos), rnd.choice(lfos)
+        trevor.associate_parameters(
+            f"{src.uuid}::__virtual__::output_cv",
+            f"{dst.uuid}::__virtual__::{rnd.choice(PARAMETERS)}_cv",
+        )
+
+    for _ in range(count // 2):
+        wire()
+    recording = []
+    for step in range(steps):
+        lfo = rnd.choice(lfos)
+        trevor.set_virtual_value(lfo.uuid, rnd.choice(PARAMETERS), rnd.randint(1, 50))
+        if step % 20 == 19:
+            wire()
+        state = schemas.normalize(session.snapshot(save_defaultvalues=True))
+        recording.append(json.dumps(state, cls=StateEncoder))
+    return recording
+
+
+def replay_stdlib(recording):
+    messages, updates, fulls = [], [], []
+    last, version = None, 0
+    for record in recording:
+        state = json.loads(record)
+        start = time.perf_counter()
+        new = json.loads(json.dumps(state, cls=StateEncoder))
+        if last is None:
+            message = json.dumps({**new, "version": 1}, cls=StateEncoder)
+        else:
+            patch = {"command": "state_patch", "patch": diff(last, new)}
+            message = json.dumps(patch, cls=StateEncoder)
+        updates.append(time.perf_counter() - start)
+        last, version = new, version + 1
+        messages.append(message)
+        start = time.perf_counter()
+        json.dumps({**last, "version": version}, cls=StateEncoder)
+        fulls.append(time.perf_counter() - start)
+    return messages, updates, fulls
+
+
+def replay_versioned(recording):
+    messages, updates, fulls = [], [], []
+    states = VersionedState()
+    for record in recording:
+        state = json.loads(record)
+        start = time.perf_counter()
+        if states.state is None:
+            message = states.encode(states.full(state))
+        else:
+            message = to_json(states.update(state))
+        updates.append(time.perf_counter() - start)
+        messages.append(message)
+        start = time.perf_counter()
+        states.encode(states.full())
+        fulls.append(time.perf_counter() - start)
+    return messages, updates, fulls
+
+
+def wire_bytes(messages, window_bits=None, level=-1, mem_level=5):
+    """Bytes sent for the messages (with the frame headers), deflated or not"""
+    total = 0
+    compressor = None
+    if window_bits:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -window_bits, mem_level)
+    for message in messages:
+        data = message.encode()
+        if compressor:
+            data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            data = data[:-4]  # the empty block ending a flush isn't sent
+        total += len(data) + (2 if len(data) < 126 else 4 if len(data) < 65536 else 10)
+    return total
+
+
+def ms(times):
+    return statistics.median(times) * 1000
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    try:
+        recording = record(count, steps)
+    finally:
+        nallely.stop_all_connected_devices()
+    print(
+        f"{count} devices, {steps} steps recorded, "
+        f"orjson {'installed' if orjson else 'not installed'}"
+    )
+    results = {
+        "stdlib json": replay_stdlib(recording),
+        "versioned": replay_versioned(recording),
+    }
+    for name, (messages, updates, fulls) in results.items():
+        print(
+            f"  {name:>11}: update {ms(updates[1:]):.2f}ms, "
+            f"full state {ms(fulls):.2f}ms ({len(messages[0]) / 1024:.0f}KiB)"
+        )
+    messages = results["versioned"][0]
+    print(f"  session traffic ({len(messages)} messages)")
+    for name, options in (
+        ("uncompressed", {}),
+        ("websockets default deflate", {"window_bits": 12}),
+        (
+            "nallely deflate",
+            {"window_bits": DEFLATE_WINDOW_BITS, "level": DEFLATE_LEVEL},
+        ),
+    ):
+        full = wire_bytes(messages[:1], **options)
+        session = wire_bytes(messages, **options)
+        print(
+            f"    {name:>26}: full state {full / 1024:.1f}KiB, "
+            f"session {session / 1024:.1f}KiB"
+        )
@@ -0,0 +1,232 @@
+"""Load time of Trevor-UI with the previous and the current static server
+
+Builds a fake UI build (an index.html, a 1.5MiB JS bundle, a CSS file and
+some images, the hashed assets with their ".gz" as vite builds them) and
+serves it from a subprocess, either as before (single-threaded, files read
+from disk for each request, "no-cache" on everything) or with
+HTTPServerThread. A browser is emulated: 6 connections per host, an HTTP
+cache honoring Cache-Control, ETag and Last-Modified. It measures:
+
+- the first load (empty cache), the first time the server serves the files
+  and once they were served to another browser
+- R reloads (the cache is kept)
+- the first load while another client sends its request slowly, then
+  downloads the bundle uncompressed, slowly (a phone on a bad wifi)
+
+and the CPU time the server spent for each.
+
+usage: python benchmarks/trevor_ui_load.py [reloads]
+"""
+
+import gzip
+import http.client
+import http.server
+import os
+import queue
+import random
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PORT = 3098
+ASSETS = [
+    "/index.html",
+    "/assets/index-Bz3x9_aQ.js",
+    "/assets/index-C7kWq1pL.css",
+    *(f"/icons/icon{i}.png" for i in range(10)),
+]
+
+
+def build_ui(directory: Path):
+    rnd = random.Random(1)
+    words = ["const", "device", "parameter", "=>", "useState", "return", "{", "}"]
+    (directory / "assets").mkdir()
+    (directory / "icons").mkdir()
+    scripts = ASSETS[1:3]
+    html = "".join(f'<script src="{src}"></script>' for src in scripts)
+    (directory / "index.html").write_text(f"<html><head>{html}</head></html>")
+    for path, size in ((ASSETS[1], 1536 * 1024), (ASSETS[2], 100 * 1024)):
+        data = " ".join(rnd.choice(words) for _ in range(size // 6)).encode()
+        (directory / path[1:]).write_bytes(data)
+        (directory / f"{path[1:]}.gz").write_bytes(gzip.compress(data))
+    for path in ASSETS[3:]:
+        (directory / path[1:]).write_bytes(os.urandom(20 * 1024))
+
+
+class PreviousHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def do_GET(self):
+        accept = self.headers.get("Accept-Encoding", "")
+        path = Path(self.translate_path(self.path))
+        gz_path = path.with_suffix(f"{path.suffix}.gz")
+        if "gzip" in accept and gz_path.exists():
+            data = gz_path.read_bytes()
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        super().do_GET()
+
+
+class PreviousServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+def serve(mode, directory):
+    if mode == "previous":
+        handler = lambda *args, **kwargs: PreviousHandler(
+            *args, directory=directory, **kwargs
+        )
+        httpd = PreviousServer(("localhost", PORT), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    else:
+        from nallely.trevor.static_server import HTTPServerThread
+
+        HTTPServerThread(Path(directory), port=PORT).start()
+    print("ready", file=sys.stderr, flush=True)
+    while sys.stdin.readline():
+        print(f"cpu {time.process_time()}", file=sys.stderr, flush=True)
+
+
+class Browser:
+    """HTTP cache of a browser, and its connections to the server"""
+
+    def __init__(self):
+        self.cache = {}  # path -> (headers, expires)
+
+    def fetch(self, connection, path):
+        headers = {"Accept-Encoding": "gzip, deflate, br"}
+        cached = self.cache.get(path)
+        if cached:
+            cached_headers, expires = cached
+            if expires > time.time():
+                return 0
+            if cached_headers.get("ETag"):
+                headers["If-None-Match"] = cached_headers["ETag"]
+            if cached_headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        if response.will_close:
+            connection.close()
+        if response.status == 200:
+            cache_control = response.headers.get("Cache-Control", "")
+            max_age = 0
+            if "max-age=" in cache_control:
+                max_age = int(cache_control.split("max-age=")[1].split(",")[0])
+            self.cache[path] = (dict(response.headers), time.time() + max_age)
+        return len(body)
+
+    def load(self):
+        connections = [
+            http.client.HTTPConnection("localhost", PORT, timeout=30) for _ in range(6)
+        ]
+        start = time.perf_counter()
+        received = self.fetch(connections[0], ASSETS[0])
+        idle = queue.SimpleQueue()
+        for connection in connections:
+            idle.put(connection)
+
+        def fetch(path):
+            connection = idle.get()
+            try:
+                return self.fetch(connection, path)
+            finally:
+                idle.put(connection)
+
+        with ThreadPoolExecutor(6) as pool:
+            received += sum(pool.map(fetch, ASSETS[1:]))
+        elapsed = time.perf_counter() - start
+        for connection in connections:
+            connection.close()
+        return elapsed * 1000, received
+
+
+def slow_client(stop):
+    client = socket.create_connection(("localhost", PORT))
+    request = f"GET {ASSETS[1]} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+    # the request takes a second to arrive, then the bundle is read slowly
+    for i in range(len(request)):
+        client.sendall(request[i : i + 1])
+        time.sleep(1 / len(request))
+    while not stop.is_set():
+        if not client.recv(1024):
+            break
+        time.sleep(0.01)
+    client.close()
+
+
+def run(mode, directory, reloads):
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", mode, directory],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    def cpu():
+        server.stdin.write("\n")  # type: ignore
+        server.stdin.flush()  # type: ignore
+        return float(server.stderr.readline().split()[1]) * 1000  # type: ignore
+
+    try:
+        if not server.stderr.readline().startswith("ready"):  # type: ignore
+            raise RuntimeError("The server didn't start")
+        results = {}
+        before = cpu()
+        results["first load (server cold)"] = (*Browser().load(), cpu() - before)
+        browser = Browser()
+        before = cpu()
+        results["first load"] = (*browser.load(), cpu() - before)
+        loads = []
+        before = cpu()
+        for _ in range(reloads):
+            loads.append(browser.load())
+        results["reload"] = (
+            sorted(loads)[len(loads) // 2][0],
+            sum(received for _, received in loads) / reloads,
+            (cpu() - before) / reloads,
+        )
+        stop = threading.Event()
+        slow = threading.Thread(target=slow_client, args=(stop,), daemon=True)
+        slow.start()
+        time.sleep(0.2)
+        before = cpu()
+        results["first load, slow client"] = (*Browser().load(), cpu() - before)
+        stop.set()
+        return results
+    finally:
+        server.kill()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+    reloads = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        build_ui(Path(directory))
+        for mode in ("previous", "current"):
+            print(mode)
+            for name, (elapsed, received, cpu) in run(mode, directory, reloads).items():
+                print(
+                    f"  {name:>24}: {elapsed:.1f}ms, {received / 1024:.0f}KiB "
+                    f"received, server CPU {cpu:.1f}ms"
+                )
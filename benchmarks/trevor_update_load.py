@@ -0,0 +1,107 @@
+"""State updates built and sent by Trevor under a burst of commands
+
+Sends N "set_virtual_value" commands per second to a TrevorBus from a client
+thread while M fake clients are connected, each one taking some time to
+receive a message (as a websocket over a slow network would). The run is done
+once building/sending an update for each command, and once with the coalescing
+broadcaster. It reports the number of updates built, the bytes sent to each
+client, the time spent in the commands, and checks the last state reached the
+clients.
+
+usage: python benchmarks/trevor_update_load.py [commands/s] [clients] [seconds]
+"""
+
+import json
+import statistics
+import sys
+import threading
+import time
+
+import nallely
+from nallely.trevor.state_diff import VersionedState
+from nallely.trevor.trevor_bus import TrevorBus
+
+SEND_TIME = 0.0005
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = 0
+        self.bytes = 0
+        self.version = 0
+
+    def send(self, message):
+        self.sent += 1
+        self.bytes += len(message)
+        self.version = json.loads(message).get("version", self.version)
+        time.sleep(SEND_TIME)
+
+
+def run(trevor, lfo, rate, clients, duration, coalesce):
+    if coalesce:
+        trevor.send_update = TrevorBus.send_update.__get__(trevor)
+    else:
+        trevor.send_update = lambda device=None: trevor.flush_update()
+    fakes = [FakeClient() for _ in range(clients)]
+    trevor.connected["trevor"][:] = fakes
+    trevor.flush_update()
+
+    built = 0
+    update = VersionedState.update.__get__(trevor.states)
+
+    def count_update(state):
+        nonlocal built
+        built += 1
+        return update(state)
+
+    trevor.states.update = count_update
+    durations = []
+    period = 1 / rate
+    end = time.perf_counter() + duration
+    value = 0
+    next_time = time.perf_counter()
+    while time.perf_counter() < end:
+        value = (value + 1) % 1000
+        start = time.perf_counter()
+        trevor.set_virtual_value(lfo.uuid, "speed", value / 100)
+        durations.append((time.perf_counter() - start) * 1000)
+        next_time += period
+        remaining = next_time - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+    time.sleep(0.2)  # the last frame
+    drain_end = time.perf_counter() + 10
+    while time.perf_counter() < drain_end and any(
+        metrics["pending"] for metrics in trevor.writers.metrics().values()
+    ):
+        time.sleep(0.01)
+    time.sleep(SEND_TIME * 2)
+    with trevor.states.lock:
+        delivered = all(client.version == trevor.states.version for client in fakes)
+    return {
+        "built": built,
+        "kbytes": statistics.mean(c.bytes for c in fakes) / 1024,
+        "cmd_ms": statistics.mean(durations),
+        "cmd_max_ms": max(durations),
+        "delivered": delivered,
+    }
+
+
+if __name__ == "__main__":
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print(f"{rate} commands/s, {clients} clients, {duration}s")
+    trevor = TrevorBus(update_fps=30)
+    lfo = trevor.trevor.create_device("LFO")
+    trevor._setup_created_instance(lfo)
+    try:
+        for name, coalesce in (("per command", False), ("coalesced", True)):
+            r = run(trevor, lfo, rate, clients, duration, coalesce)
+            print(
+                f"  {name:>11}: {r['built']} updates, {r['kbytes']:.1f}KB/client, "
+                f"command {r['cmd_ms']:.3f}ms (max {r['cmd_max_ms']:.2f}ms), "
+                f"last state delivered={r['delivered']}"
+            )
+    finally:
+        nallely.stop_all_connected_devices()
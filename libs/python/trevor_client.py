@@ -17,27 +17,150 @@ Usage:
     client.wire(f"{lfo_id}::__virtual__::output_cv",
                 f"{synth_id}::filter::cutoff")
 
+    # many operations applied at once (all or nothing), with a single update
+    with client.batch() as batch:
+        lfo = batch.create_device("LFO")  # "$0", resolved by the server
+        synth = batch.create_device("Amsynth")
+        batch.wire(f"{lfo}::__virtual__::output_cv",
+                   f"{synth}::filter::cutoff")
+    lfo_id = batch.resolve(lfo)
+
+    # pipelined commands, the acknowledgements are awaited at the end
+    requests = [client.submit("set_virtual_value", device_id=lfo_id,
+                              parameter="speed", value=i / 10)
+                for i in range(100)]
+    for request in requests:
+        client.result(request)
+
     client.disconnect()
 """
 
+import itertools
 import json
+from contextlib import contextmanager
 
 from websockets.sync.client import connect as ws_connect
 
 
+class TrevorError(Exception):
+    """Error reported by the Trevor server."""
+
+
+def _unescape(key):
+    return key.replace("~1", "/").replace("~0", "~")
+
+
+def apply_patch(document, operations):
+    """Apply JSON-patch (RFC 6902) add/remove/replace operations in place."""
+    for operation in operations:
+        op, path = operation["op"], operation["path"]
+        if path == "":
+            document = operation.get("value")
+            continue
+        *parents, last = [_unescape(key) for key in path.split("/")[1:]]
+        target = document
+        for key in parents:
+            target = target[int(key)] if isinstance(target, list) else target[key]
+        if isinstance(target, list):
+            index = len(target) if last == "-" else int(last)
+            if op == "add":
+                target.insert(index, operation["value"])
+            elif op == "remove":
+                del target[index]
+            else:
+                target[index] = operation["value"]
+        elif op == "remove":
+            del target[last]
+        else:
+            target[last] = operation["value"]
+    return document
+
+
+class TrevorBatch:
+    """Operations recorded in a ``with client.batch()`` block.
+
+    Each method returns a reference ("$0", "$1", ...) to the result of its
+    operation, which can be used in the parameters of the next operations.
+    Once the block is done, ``resolve()`` gives the actual results.
+    """
+
+    def __init__(self):
+        self.operations = []
+        self.results = None
+
+    def _add(self, command, **params):
+        params["command"] = command
+        self.operations.append(params)
+        return f"${len(self.operations) - 1}"
+
+    def resolve(self, reference):
+        """Result of an operation from its reference (e.g: a device ID)."""
+        return self.results[int(reference[1:])]
+
+    def create_device(self, name):
+        """Create a device by class name. Returns a reference to its ID."""
+        return self._add("create_device", name=name)
+
+    def set_virtual_value(self, device_id, parameter, value):
+        """Set a parameter on a virtual device."""
+        return self._add("set_virtual_value", device_id=device_id,
+                         parameter=parameter, value=value)
+
+    def set_parameter_value(self, device_id, section_name, parameter_name,
+                            value):
+        """Set a parameter on a MIDI device."""
+        return self._add("set_parameter_value", device_id=device_id,
+                         section_name=section_name,
+                         parameter_name=parameter_name, value=value)
+
+    def set_scaler_parameter(self, scaler_id, parameter, value):
+        """Modify a scaler on an existing connection."""
+        return self._add("set_scaler_parameter", scaler_id=scaler_id,
+                         parameter=parameter, value=value)
+
+    def wire(self, from_parameter, to_parameter, with_scaler=True):
+        """Connect two parameters. Returns a reference to the ID of the
+        scaler of the connection (for ``set_scaler_parameter``)."""
+        return self._add("associate_parameters",
+                         from_parameter=from_parameter,
+                         to_parameter=to_parameter,
+                         unbind=False, with_scaler=with_scaler)
+
+    def unwire(self, from_parameter, to_parameter):
+        """Disconnect two parameters."""
+        return self._add("associate_parameters",
+                         from_parameter=from_parameter,
+                         to_parameter=to_parameter,
+                         unbind=True)
+
+    def mute_link(self, from_parameter, to_parameter, muted=True):
+        """Mute or unmute a connection."""
+        return self._add("mute_link", from_parameter=from_parameter,
+                         to_parameter=to_parameter, muted=muted)
+
+
 class TrevorClient:
     """Synchronous client for the Nallely Trevor protocol."""
 
-    def __init__(self, host="localhost", port=6788):
-        self.url = f"ws://{host}:{port}/trevor"
+    def __init__(self, host="localhost", port=6788, lazy=False):
+        """With lazy=True, the client receives the topology of the session
+        (devices and link endpoints) instead of its full state, and the
+        details of the devices and links in its viewport only.
+        """
+        self.url = f"ws://{host}:{port}/trevor" + ("?lazy=1" if lazy else "")
         self.ws = None
         self.state = None
+        self.topology = None
+        self.details = {"devices": {}, "links": {}}
+        self._request_ids = itertools.count(1)
+        self._acks = {}
 
     def connect(self):
-        """Connect and receive the initial session state."""
-        self.ws = ws_connect(self.url)
-        self.state = json.loads(self.ws.recv())
-        return self.state
+        """Connect and receive the initial session state (or topology)."""
+        # the state of large sessions can exceed the default 1MiB limit
+        self.ws = ws_connect(self.url, max_size=None)
+        self._receive()
+        return self.state or self.topology
 
     def disconnect(self):
         """Close the connection."""
@@ -45,36 +168,159 @@ class TrevorClient:
             self.ws.close()
             self.ws = None
 
-    def _send(self, command, **params):
-        """Send a command and return the updated state."""
+    def _receive(self):
+        """Receive the next message, keeping the state up to date.
+
+        Full states replace the state, state patches are applied to it, binary
+        frames (streamed values) are skipped. In lazy mode, the same goes for
+        the topology, and the details of the viewport are updated.
+        """
+        while True:
+            message = self.ws.recv()
+            if isinstance(message, bytes):
+                continue
+            message = json.loads(message)
+            command = message.get("command")
+            if command is None:
+                self.state = message
+            elif command == "state_patch":
+                if self.state is None or message["base"] != self.state.get("version"):
+                    # we missed something, the server sends us a full state
+                    self.ws.send(json.dumps({"command": "full_state"}))
+                else:
+                    self.state = apply_patch(self.state, message["patch"])
+                    self.state["version"] = message["version"]
+            elif command == "topology":
+                self.topology = message
+            elif command == "topology_patch":
+                if (self.topology is None
+                        or message["base"] != self.topology.get("version")):
+                    self.ws.send(json.dumps({"command": "subscribe_topology"}))
+                else:
+                    self.topology = apply_patch(self.topology, message["patch"])
+                    self.topology["version"] = message["version"]
+            elif command == "device_patch":
+                device = self.details["devices"].get(message["id"])
+                if device is not None:
+                    apply_patch(device, message["patch"])
+            elif command in ("device_update", "link_update"):
+                kind = "devices" if command == "device_update" else "links"
+                value = message["device" if kind == "devices" else "link"]
+                if value is None:
+                    self.details[kind].pop(message["id"], None)
+                else:
+                    self.details[kind][message["id"]] = value
+            return message
+
+    def submit(self, command, **params):
+        """Send a command without waiting for it, returns its request ID.
+
+        The server acknowledges the requests in the order it receives them,
+        use result() to get the outcome of one.
+        """
+        request_id = next(self._request_ids)
         params["command"] = command
+        params["requestId"] = request_id
         self.ws.send(json.dumps(params))
-        self.state = json.loads(self.ws.recv())
+        return request_id
+
+    def result(self, request_id):
+        """Wait for the acknowledgement of a request and return its result.
+
+        Raises TrevorError if the command failed on the server.
+        """
+        while request_id not in self._acks:
+            message = self._receive()
+            if message.get("command") == "ack":
+                self._acks[message["requestId"]] = message
+        ack = self._acks.pop(request_id)
+        if "error" in ack:
+            raise TrevorError(ack["error"])
+        return ack.get("result")
+
+    def request(self, command, **params):
+        """Send a command and return its result once acknowledged."""
+        return self.result(self.submit(command, **params))
+
+    def _send(self, command, **params):
+        """Send a command and return the state.
+
+        The state updates are sent at a limited rate, the state could not yet
+        reflect the command when it's acknowledged.
+        """
+        self.request(command, **params)
         return self.state
 
+    @contextmanager
+    def batch(self):
+        """Record operations and apply them in one transaction on exit.
+
+        The operations are applied in order, all or nothing: if one fails the
+        previous ones are reverted and a TrevorError is raised. Nothing is sent
+        if the block raises.
+        """
+        batch = TrevorBatch()
+        yield batch
+        if not batch.operations:
+            batch.results = []
+            return
+        request_id = next(self._request_ids)
+        self.ws.send(json.dumps({"command": "batch",
+                                 "operations": batch.operations,
+                                 "requestId": request_id}))
+        while True:
+            message = self._receive()
+            if (message.get("command") == "batchResult"
+                    and message.get("requestId") == request_id):
+                break
+        if "error" in message:
+            raise TrevorError(message["error"])
+        batch.results = message["results"]
+
     # -- State --
 
     def full_state(self):
-        """Request a full state snapshot."""
+        """Request a full state snapshot, sent to this client only."""
+        # the full state is sent before the acknowledgement
         return self._send("full_state")
 
     def reset_all(self):
         """Clear all devices and connections."""
         return self._send("reset_all")
 
+    # -- Lazy state --
+
+    def set_viewport(self, device_ids):
+        """Devices displayed, their details (and their links) are kept updated."""
+        return self.request("set_viewport", device_ids=list(device_ids))
+
+    def get_details(self, device_ids=(), link_ids=()):
+        """Fetch the details of some devices and links."""
+        return self.request("get_details", device_ids=list(device_ids),
+                            link_ids=list(link_ids))
+
+    def get_page(self, kind, offset=0, limit=100):
+        """Fetch a page of "virtual_devices", "midi_devices" or "connections".
+
+        Returns {"kind", "offset", "total", "items"}.
+        """
+        return self.request("get_page", kind=kind, offset=offset, limit=limit)
+
+    def iter_pages(self, kind, limit=100):
+        """Iterate over all the items of a kind, one page at a time."""
+        offset = 0
+        while True:
+            page = self.get_page(kind, offset, limit)
+            yield from page["items"]
+            offset += len(page["items"])
+            if not page["items"] or offset >= page["total"]:
+                return
+
     # -- Devices --
 
     def create_device(self, name):
         """Create a device by class name. Returns the new device ID."""
-        state = self._send("create_device", name=name)
-        # The new device is the last one added in either list
-        for dev in reversed(state.get("virtual_devices", [])):
-            if dev["meta"]["name"] == name:
-                return dev["id"]
-        for dev in reversed(state.get("midi_devices", [])):
-            if dev["meta"]["class_name"] == name:
-                return dev["id"]
-        return None
+        return self.request("create_device", name=name)
 
     def kill_device(self, device_id):
         """Remove a device."""
@@ -178,14 +424,21 @@ class TrevorClient:
 
         Returns {"className": str, "classCode": str, "methods": {name: src}}.
         """
-        self.ws.send(json.dumps({
-            "command": "get_class_code", "device_id": device_id,
-        }))
-        resp = json.loads(self.ws.recv())
-        return resp.get("arg", resp)
+        return self.request("get_class_code", device_id=device_id)
 
     # -- Lookups --
 
+    def schema(self, device):
+        """Class schema (parameters, sections, doc) of a device of the state.
+
+        The schemas are sent once per class in state["schemas"], the devices
+        refer to them by "class" and "schema_version".
+        """
+        if "meta" in device:
+            return device["meta"]
+        schemas = (self.state or self.topology or {}).get("schemas", {})
+        return schemas[device["class"]][str(device["schema_version"])]
+
     def find_device(self, repr_name):
         """Find a device ID by its display name (repr). Returns ID or None."""
         for dev in self.state.get("virtual_devices", []):
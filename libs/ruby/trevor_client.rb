@@ -6,16 +6,38 @@ require 'websocket-client-simple'
 require 'json'
 
 module Nallely
+  # Error reported by the Trevor server
+  class TrevorError < StandardError; end
+
   # Trevor protocol client for Nallely session control
+  #
+  # The server sends a full state on connection, then versioned JSON patches
+  # (coalesced, at a limited rate) as the session changes. The patches are
+  # applied to `state`; when one doesn't apply on the version we have, the
+  # full state is asked again.
   class TrevorClient
     attr_reader :state, :connected
 
+    # How long a command waits for the state to change (seconds)
+    STATE_TIMEOUT = 1.0
+
+    # How long a request waits for its acknowledgement (seconds)
+    ACK_TIMEOUT = 10.0
+
+    # Messages the server sends on its own, they don't answer a command
+    UNSOLICITED = %w[notification stdout queueMetrics RuntimeAPI::addStdinWait
+                     GeneralAPI::setOnlineFriends].freeze
+
     def initialize(host: 'localhost', port: 6788)
       @host = host
       @port = port
       @ws = nil
       @connected = false
       @state = nil
+      @full_states = 0
+      @resyncing = false
+      @request_ids = 0
+      @acks = {}
       @response_queue = []
       @mutex = Mutex.new
       @cv = ConditionVariable.new
@@ -49,27 +71,56 @@ module Nallely
       end
 
       # Wait for initial state
-      wait_for_message
+      wait_for_full_state(0)
       self
     end
 
 
+    # Send a command and wait for its acknowledgement
+    #
+    # The server acknowledges the requests in the order it receives them, the
+    # messages a command answers with are sent before its acknowledgement.
+    #
+    # @param command [Hash] flat JSON command
+    # @return [Object] result of the command (e.g. the ID of a created device)
+    # @raise [TrevorError] if the command failed on the server
+    def request(command)
+      raise "Not connected" unless @connected
+
+      request_id = @mutex.synchronize do
+        @response_queue.clear
+        @request_ids += 1
+      end
+      @ws.send(command.merge(requestId: request_id).to_json)
+      ack = wait_for_ack(request_id)
+      raise TrevorError, ack['error'] if ack.key?('error')
+
+      ack['result']
+    end
+
     # Send a command and wait for response
     #
+    # The commands don't answer with the state: the state is patched when the
+    # server sends its next update, after the acknowledgement. This waits for
+    # that update (or returns the message the command answered with) at most
+    # STATE_TIMEOUT seconds after the acknowledgement.
+    #
     # @param command [Hash] flat JSON command
     # @return [Hash] updated session state (or special response for some commands)
+    # @raise [TrevorError] if the command failed on the server
     def send_command(command)
-      raise "Not connected" unless @connected
-
-      @ws.send(command.to_json)
-      wait_for_message
+      version = @mutex.synchronize { @state && @state['version'] }
+      request(command)
+      wait_for_message(version)
     end
 
-    # Get full session state
+    # Get full session state, sent to this client only
     #
     # @return [Hash] current state
     def full_state
-      send_command({ command: 'full_state' })
+      # the state is sent before the acknowledgement
+      request({ command: 'full_state' })
+      @mutex.synchronize { @state }
     end
 
     # Create a new device
@@ -300,33 +351,124 @@ module Nallely
       "#{device_id}::#{section}::#{param}"
     end
 
+    # Apply JSON-patch (RFC 6902) add/remove/replace operations in place
+    #
+    # @param document [Hash] document to patch
+    # @param operations [Array<Hash>] patch operations
+    # @return [Hash] patched document
+    def self.apply_patch(document, operations)
+      operations.each do |operation|
+        path = operation['path']
+        if path.empty?
+          document = operation['value']
+          next
+        end
+        keys = path.split('/', -1)[1..].map { |key| key.gsub('~1', '/').gsub('~0', '~') }
+        *parents, last = keys
+        target = parents.reduce(document) { |node, key| node.is_a?(Array) ? node[key.to_i] : node[key] }
+        if target.is_a?(Array)
+          index = last == '-' ? target.length : last.to_i
+          case operation['op']
+          when 'add' then target.insert(index, operation['value'])
+          when 'remove' then target.delete_at(index)
+          else target[index] = operation['value']
+          end
+        elsif operation['op'] == 'remove'
+          target.delete(last)
+        else
+          target[last] = operation['value']
+        end
+      end
+      document
+    end
+
     private
 
     # Handle incoming WebSocket message
     def handle_message(msg)
+      # binary frames are streamed values, the state doesn't need them
       return unless msg.type == :text
 
       data = JSON.parse(msg.data)
+      return unless data.is_a?(Hash)
 
-      # Update state if it's session state
-      @state = data if data.is_a?(Hash) && (data['virtual_devices'] || data['midi_devices'])
-
-      # Signal waiting thread
       @mutex.synchronize do
-        @response_queue << data
-        @cv.signal
+        case data['command']
+        when nil
+          # full state, the messages without version aren't states
+          if data.key?('version')
+            @state = data
+            @full_states += 1
+            @resyncing = false
+          end
+        when 'ack'
+          @acks[data['requestId']] = data
+        when 'state_patch'
+          if @state.nil? || data['base'] != @state['version']
+            # we missed a patch, we ask for the full state again
+            resync
+          else
+            @state = TrevorClient.apply_patch(@state, data['patch'])
+            @state['version'] = data['version']
+          end
+        else
+          @response_queue << data unless UNSOLICITED.include?(data['command'])
+        end
+        @cv.broadcast
       end
     rescue => e
       puts "Error handling Trevor message: #{e.message}"
     end
 
-    # Wait for a message response
+    # Ask the full state again (called with the mutex held)
+    def resync
+      return if @resyncing
+
+      @resyncing = true
+      @ws.send({ command: 'full_state' }.to_json)
+    end
+
+    # Wait for the state to change from version, or for a message
+    #
+    # @return [Hash] response data, or the state
+    def wait_for_message(version)
+      deadline = Process.clock_gettime(Process::CLOCK_MONOTONIC) + STATE_TIMEOUT
+      @mutex.synchronize do
+        loop do
+          return @response_queue.shift unless @response_queue.empty?
+          return @state if @state && @state['version'] != version
+
+          remaining = deadline - Process.clock_gettime(Process::CLOCK_MONOTONIC)
+          return @state if remaining <= 0
+
+          @cv.wait(@mutex, remaining)
+        end
+      end
+    end
+
+    # Wait for the acknowledgement of a request
+    #
+    # @return [Hash] the acknowledgement
+    def wait_for_ack(request_id)
+      deadline = Process.clock_gettime(Process::CLOCK_MONOTONIC) + ACK_TIMEOUT
+      @mutex.synchronize do
+        until @acks.key?(request_id)
+          remaining = deadline - Process.clock_gettime(Process::CLOCK_MONOTONIC)
+          raise TrevorError, "No acknowledgement for request #{request_id}" if remaining <= 0
+
+          @cv.wait(@mutex, remaining)
+        end
+        @acks.delete(request_id)
+      end
+    end
+
+    # Wait for a full state after the received-th one
     #
-    # @return [Hash] response data
-    def wait_for_message
+    # @return [Hash] the state
+    def wait_for_full_state(received)
       @mutex.synchronize do
-        @cv.wait(@mutex) if @response_queue.empty?
-        @response_queue.shift
+        @cv.wait(@mutex) while @full_states <= received
+        @state
       end
     end
   end
@@ -5,10 +5,12 @@ from .core import (
     MIDIBridge,
     MidiDevice,
     Module,
+    ModuleMPE,
     ModulePadsOrKeys,
     ModuleParameter,
     ModulePitchwheel,
     PadOrKey,
+    SysexDump,
     ThreadContext,
     VirtualDevice,
     VirtualParameter,
@@ -77,8 +79,10 @@ __all__ = [
     "DeviceNotFound",
     "ModuleParameter",
     "PadOrKey",
+    "SysexDump",
     "ModulePadsOrKeys",
     "Module",
+    "ModuleMPE",
     "WebSocketBus",
     "LFO",
     "Cycler",
@@ -37,6 +37,17 @@ def parse_args(argv):
         action="store_true",
         help="Serves Trevor-UI, and makes it accessible from your browser. This option is only activated if '--with-trevor' is used",
     )
+    run_parser.add_argument(
+        "--trevor-server",
+        choices=["threaded", "async"],
+        default="threaded",
+        help="Trevor websocket server: a thread per client (threaded) or all the clients on one event loop (async). This option is only activated if '--with-trevor' is used",
+    )
+    run_parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Disables the permessage-deflate compression of the Trevor and WebSocketBus connections. This option is only activated if '--with-trevor' is used",
+    )
     run_parser.add_argument(
         "-b",
         "--builtin-devices",
@@ -112,6 +123,8 @@ def main():
                 serve_ui=args.serve_ui,
                 include_experimental=args.experimental,
                 address=args.address,
+                server=args.trevor_server,
+                compression=not args.no_compression,
             )
         elif args.init_script:
             from nallely.trevor import launch_standalone_script
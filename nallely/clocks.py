@@ -1,9 +1,11 @@
+import math
 import time
 from decimal import Decimal
 from fractions import Fraction
 from random import random
 
-from .core import VirtualDevice, VirtualParameter, on
+from .core import ThreadContext, VirtualDevice, VirtualParameter, on
+from .core.midi_clock import PPQN, active_midi_clock
 
 
 class Clock(VirtualDevice):
@@ -16,6 +18,14 @@ class Clock(VirtualDevice):
     * play_cv [0, 1] init=0 >0: Control if the clock must be started or not (1 = start, 0 = stop).
                                 By default, the clock is stopped.
     * reset_cv [0, 1] >0 <rising>: Reset the clock to 0
+    * lookahead_cv [0, 32] init=0: Lookahead in ticks (0 = off). Each tick is computed this
+                                   number of ticks before it is due: the devices that compute
+                                   ahead (sequencers) get it right away and the MIDI messages
+                                   they trigger are scheduled at the time of the tick, the
+                                   other receivers get the pulse at the time of the tick.
+    * clock_source_cv [internal, midi] init=internal: Clock used to produce ticks.
+                                   "midi" follows the incoming MIDI clock of the MIDI device
+                                   that ticked last (tempo, position, start/stop/continue).
 
     outputs:
     * lead_cv [0, 1]: quater note output
@@ -40,6 +50,10 @@ class Clock(VirtualDevice):
         "play", range=(0, 1)
     )  # conversion is done in the @property
     reset_cv = VirtualParameter("reset", range=(0, 1), conversion_policy=">0")
+    lookahead_cv = VirtualParameter("lookahead", range=(0, 32), default=0)
+    clock_source_cv = VirtualParameter(
+        "clock_source", accepted_values=("internal", "midi"), default="internal"
+    )
 
     # clock outputs we consider the main output_cv as not used
     mul7_cv = VirtualParameter("mul7", range=(0, 1))  # x7
@@ -57,6 +71,9 @@ class Clock(VirtualDevice):
         self.tempo = Decimal(120)
         self._play = 0
         self.reset = 0
+        self.lookahead = 0
+        self.clock_source = "internal"
+        self.midi_steps = {}
         self.tick_min_ms = Decimal(tick_min_ms)
         self.next_tick_time = time.perf_counter()
 
@@ -120,11 +137,16 @@ class Clock(VirtualDevice):
             self.phases[k] = Decimal(0)
 
     def main(self, ctx):
+        if self.clock_source == "midi":
+            yield from self.follow_midi_clock(ctx)
+            return
+
         quarter_note_s = 60 / float(self.tempo)
         tick_s = max(
             float(self.tick_min_ms) / 1000,
             quarter_note_s / float(self.smallest_subdivision),
         )
+        lookahead = int(self.lookahead)
 
         if self.play:
             to_pulse = []
@@ -137,21 +159,64 @@ class Clock(VirtualDevice):
                     to_pulse.append(name)
 
             if to_pulse:
-                pulse_width_ms = min(5, max(1, float(quarter_note_s * 1000 / 128)))
-                outputs = [getattr(self, f"{name}_cv") for name in to_pulse]
-                yield 1, outputs
-                yield from self.sleep(pulse_width_ms, consider_target_time=False)
-                yield 0, outputs
+                # with lookahead, next_tick_time is still ahead of us
+                deadline = self.next_tick_time if lookahead > 0 else None
+                yield from self.pulse(to_pulse, quarter_note_s, ctx, deadline)
 
-        # Plan next tick
+        # Plan next tick, computed lookahead ticks before it's due
         self.next_tick_time += tick_s
-        delay = self.next_tick_time - time.perf_counter()
+        now = time.perf_counter()
+        delay = self.next_tick_time - lookahead * tick_s - now
 
         if delay > 0:
             yield from self.sleep(delay * 1000, consider_target_time=False)
-        else:
+        elif self.next_tick_time < now:
             # We are late, we hurry to compensate
-            self.next_tick_time = time.perf_counter()
+            self.next_tick_time = now
+
+    def follow_midi_clock(self, ctx):
+        tick_s = float(self.tick_min_ms) / 1000
+        source = active_midi_clock()
+        position = source.position() if source else None
+        if source is None or position is None:
+            self.midi_steps.clear()
+        else:
+            quarter_note_s = source.period * PPQN
+            tick_s = max(tick_s, quarter_note_s / float(self.smallest_subdivision))
+            bpm = round(source.bpm, 2)
+            if abs(bpm - float(self.tempo)) >= 0.01:
+                self.tempo = Decimal(str(bpm))
+
+            # the position of the MIDI clock gives the phase of each output
+            to_pulse = []
+            for name, ratio in self.ratios.items():
+                step = math.floor(position * float(ratio))
+                if step != self.midi_steps.get(name):
+                    self.midi_steps[name] = step
+                    to_pulse.append(name)
+            if to_pulse:
+                yield from self.pulse(to_pulse, quarter_note_s, ctx)
+
+        yield from self.sleep(tick_s * 1000, consider_target_time=False)
+
+    def pulse(self, to_pulse, quarter_note_s, ctx, deadline=None):
+        pulse_width_ms = min(5, max(1, float(quarter_note_s * 1000 / 128)))
+        outputs = [getattr(self, f"{name}_cv") for name in to_pulse]
+        if deadline is not None:
+            # the pulse is ahead of time, its end too
+            self.send_pulse(1, outputs, ctx, deadline)
+            self.send_pulse(0, outputs, ctx, deadline + pulse_width_ms / 1000)
+        else:
+            yield 1, outputs
+            yield from self.sleep(pulse_width_ms, consider_target_time=False)
+            yield 0, outputs
+
+    def send_pulse(self, value, outputs, ctx, deadline):
+        # each pulse gets its own context as it's queued by the receivers
+        pulse_ctx = ThreadContext(
+            {"last_values": ctx.last_values, "deadline": deadline}
+        )
+        self.send_out(value, pulse_ctx, selected_outputs=outputs, from_="_default_idle")
 
 
 class BernoulliTrigger(VirtualDevice):
@@ -22,13 +22,13 @@ def convert(path: Path | str):
                 parameter_name,
                 description,
                 cc_msb,
-                _,
+                cc_lsb,
                 cc_min_value,
                 cc_max_value,
-                _,
-                _,
-                _,
-                _,
+                nrpn_msb,
+                nrpn_lsb,
+                nrpn_min_value,
+                nrpn_max_value,
                 orientation,
                 *_,
             ) = row
@@ -46,7 +46,17 @@ def convert(path: Path | str):
                     parameter_name = "_".join(parameter_name_split[1:])
             else:
                 parameter_name = "_".join(parameter_name_split)
-            min, max = int(cc_min_value), int(cc_max_value)
+            if cc_msb:
+                cc = int(cc_msb)
+                min, max = int(cc_min_value), int(cc_max_value)
+                # LSB on CC + 32 is the 14bits CC convention
+                type = "control_change14" if cc_lsb and int(cc_lsb) == cc + 32 else None
+            elif nrpn_msb:
+                cc = (int(nrpn_msb) << 7) | int(nrpn_lsb or 0)
+                min, max = int(nrpn_min_value), int(nrpn_max_value)
+                type = "nrpn"
+            else:
+                continue
             if orientation.lower() == "centered":
                 init = (min - max) // 2
             else:
@@ -54,11 +64,13 @@ def convert(path: Path | str):
             section = "_".join(section_split)
             sections[section][parameter_name] = {
                 "description": description,
-                "cc": int(cc_msb),
-                "min": int(cc_min_value),
-                "max": int(cc_max_value),
+                "cc": cc,
+                "min": min,
+                "max": max,
                 "init": init,
             }
+            if type:
+                sections[section][parameter_name]["type"] = type
     if brand is not None and device is not None:
         return {brand: {device: {**sections}}}
     return {}
@@ -68,7 +80,9 @@ def generate_code(d: dict, out: Path | str):
     out = Path(out)
     brand = next(iter(d))
     device = next(iter(d[brand]))
-    sections = d[brand][device]
+    sections = {**d[brand][device]}
+    # reserved key describing the SysEx bulk dump of the device (see nallely.SysexDump)
+    sysex_dump = sections.pop("sysex_dump", None)
     with out.open("w") as f:
         f.write(f'''"""
 Generated configuration for the {brand} - {device}
@@ -91,16 +105,19 @@ Generated configuration for the {brand} - {device}
                     parameter_code = f"    {parameter_name} = nallely.ModuleParameter(type='program_change')\n"
                 else:
                     cc = config["cc"]
-                    min, max = config.get("min", 0), config.get("max", 127)
+                    type = config.get("type", "control_change")
+                    default_max = 127 if type == "control_change" else 16383
+                    min, max = config.get("min", 0), config.get("max", default_max)
                     init = config.get("init", 0)
                     if init == 0:
                         init = ""
                     else:
                         init = f", init_value={init}"
-                    if min == 0 and max == 127:
+                    if min == 0 and max == default_max:
                         range = ""
                     else:
                         range = f", range=({min}, {max})"
+                    type = "" if type == "control_change" else f", type={type!r}"
                     descr = config.get("description")
                     descr = f", description={descr!r}" if descr else ""
                     accepted_values = config.get("accepted_values")
@@ -109,7 +126,7 @@ Generated configuration for the {brand} - {device}
                         if accepted_values
                         else ""
                     )
-                    parameter_code = f"    {parameter_name} = nallely.ModuleParameter({cc}{range}{init}{descr}{accepted_values})\n"
+                    parameter_code = f"    {parameter_name} = nallely.ModuleParameter({cc}{range}{init}{descr}{accepted_values}{type})\n"
                 f.write(parameter_code)
             f.write("\n\n")
         device_name = device.replace("-", "").replace(" ", "")
@@ -117,6 +134,9 @@ Generated configuration for the {brand} - {device}
         for section in sections:
             f.write(f"    {section}: {section.capitalize()}Section  # type: ignore\n")
         f.write("\n")
+        if sysex_dump:
+            args = ", ".join(f"{k}={v!r}" for k, v in sysex_dump.items())
+            f.write(f"    sysex_dump = nallely.SysexDump({args})\n\n")
         f.write("    def __init__(self, device_name=None, *args, **kwargs):\n")
         f.write("        super().__init__(\n")
         f.write("            *args\n,")
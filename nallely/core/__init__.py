@@ -4,15 +4,27 @@ except ImportError:
     pass
 
 from .bridge_device import Bridge, MIDIBridge
+from .midi_clock import MidiClockPLL, active_midi_clock, midi_clocks
 from .midi_device import (
     MidiDevice,
     Module,
+    ModuleMPE,
     ModulePadsOrKeys,
     ModuleParameter,
     ModulePitchwheel,
 )
-from .parameter_instances import Int, PadOrKey, PadsOrKeysInstance, ParameterInstance
+from .midi_ports import MidiPortRegistry, PortEvent, midi_ports
+from .mpe import MPEVoice, MPEZone
+from .parameter_instances import (
+    Int,
+    MPEInstance,
+    PadOrKey,
+    PadsOrKeysInstance,
+    ParameterInstance,
+)
 from .scaler import Scaler
+from .scheduler import MidiScheduler, midi_scheduler
+from .sysex import SysexDump, SysexStreamer, SysexTransfer
 from .virtual_device import TimeBasedDevice, VirtualDevice, VirtualParameter, VRef, on
 from .world import (
     CallbackRegistryEntry,
@@ -25,6 +37,7 @@ from .world import (
     get_connected_devices,
     get_virtual_device_classes,
     get_virtual_devices,
+    invalidate_schemas,
     midi_device_classes,
     no_registration,
     stop_all_connected_devices,
@@ -48,6 +61,7 @@ __all__ = [
     "get_all_virtual_parameters",
     "get_connected_devices",
     "get_virtual_devices",
+    "invalidate_schemas",
     "stop_all_connected_devices",
     "unbind_all",
     "stop_all_virtual_devices",
@@ -69,4 +83,19 @@ __all__ = [
     "MIDIBridge",
     "Keyboard",
     "VRef",
+    "MidiPortRegistry",
+    "PortEvent",
+    "midi_ports",
+    "MidiScheduler",
+    "midi_scheduler",
+    "MidiClockPLL",
+    "active_midi_clock",
+    "midi_clocks",
+    "SysexDump",
+    "SysexTransfer",
+    "SysexStreamer",
+    "ModuleMPE",
+    "MPEInstance",
+    "MPEVoice",
+    "MPEZone",
 ]
@@ -0,0 +1,141 @@
+from typing import NamedTuple
+
+# parameters whose value is spread over several control changes (14bits values)
+HIGHRES_TYPES = ("control_change14", "nrpn", "rpn")
+HIGHRES_MAX = 16383
+
+NRPN_MSB, NRPN_LSB = 99, 98
+RPN_MSB, RPN_LSB = 101, 100
+DATA_MSB, DATA_LSB = 6, 38
+PARAMETER_NUMBER_CCS = {
+    NRPN_MSB: ("nrpn", 0),
+    NRPN_LSB: ("nrpn", 1),
+    RPN_MSB: ("rpn", 0),
+    RPN_LSB: ("rpn", 1),
+}
+
+
+class HighResMessage(NamedTuple):
+    """Assembled 14bits value, control is the CC (MSB) or the (N)RPN number"""
+
+    type: str
+    channel: int
+    control: int
+    value: int
+    time: float = 0
+
+
+def clamp14(value):
+    value = round(value)
+    return HIGHRES_MAX if value > HIGHRES_MAX else 0 if value < 0 else value
+
+
+class HighResEncoder:
+    """Encodes 14bits values as the minimal sequence of control changes.
+
+    The encoder remembers what was last sent on each channel: the MSB is only
+    sent when it changed (the LSB is always sent after a new MSB as many devices
+    reset it on MSB), and the (N)RPN parameter number is only selected again
+    when it's not the currently selected one.
+    """
+
+    def __init__(self):
+        self.last_sent: dict[tuple[str, int, int], tuple[int, int]] = {}
+        self.selected: dict[int, tuple[str, int]] = {}
+
+    def reset(self):
+        self.last_sent.clear()
+        self.selected.clear()
+
+    def encode(self, type: str, number: int, value: int, channel: int):
+        """Returns the (control, value) pairs to send"""
+        value = clamp14(value)
+        msb, lsb = value >> 7, value & 0x7F
+        key = (type, number, channel)
+        previous = self.last_sent.get(key)
+        pairs = []
+        if type == "control_change14":
+            if previous is None or previous[0] != msb:
+                pairs.append((number, msb))
+            elif previous[1] == lsb:
+                return pairs
+            pairs.append((number + 32, lsb))
+        else:
+            if self.selected.get(channel) != (type, number):
+                number_msb, number_lsb = (
+                    (NRPN_MSB, NRPN_LSB) if type == "nrpn" else (RPN_MSB, RPN_LSB)
+                )
+                pairs.append((number_msb, number >> 7))
+                pairs.append((number_lsb, number & 0x7F))
+                self.selected[channel] = (type, number)
+                previous = None  # we don't rely on data sent for another selection
+            if previous is None or previous[0] != msb:
+                pairs.append((DATA_MSB, msb))
+            elif previous[1] == lsb:
+                return pairs
+            pairs.append((DATA_LSB, lsb))
+        self.last_sent[key] = (msb, lsb)
+        return pairs
+
+
+class HighResDecoder:
+    """Assembles incoming MSB/LSB control changes in a single 14bits value.
+
+    A value is emitted when its LSB is received (the MSB is kept until then),
+    so a MSB/LSB pair produces only one event. Only the CCs of registered
+    parameters are consumed, the others go through the 7bits path: data entry
+    is consumed only while a registered (N)RPN is selected on its channel, and
+    the parameter number CCs are followed but never consumed (a device can
+    also map these CCs as 7bits parameters).
+    """
+
+    def __init__(self):
+        self.cc14: set[int] = set()
+        self.numbers: set[tuple[str, int]] = set()
+        self.msb: dict[tuple[int, int], int] = {}
+        self.number_parts: dict[int, list] = {}
+        self.selected: dict[int, tuple[str, int]] = {}
+
+    def register(self, type: str, number: int):
+        if type == "control_change14":
+            self.cc14.add(number)
+        else:
+            self.numbers.add((type, number))
+
+    def consumes(self, channel: int, control: int) -> bool:
+        if control in self.cc14 or control - 32 in self.cc14:
+            return True
+        if control in (DATA_MSB, DATA_LSB):
+            return self.selected.get(channel) in self.numbers
+        return False
+
+    def follows(self, control: int) -> bool:
+        """True for the (N)RPN parameter number CCs, when (N)RPNs are registered"""
+        return bool(self.numbers) and control in PARAMETER_NUMBER_CCS
+
+    def feed(self, channel: int, control: int, value: int, time=0.0):
+        if control in self.cc14:
+            self.msb[(channel, control)] = value
+            return None
+        if control - 32 in self.cc14:
+            msb = self.msb.get((channel, control - 32), 0)
+            return HighResMessage(
+                "control_change14", channel, control - 32, (msb << 7) | value, time
+            )
+        if control in PARAMETER_NUMBER_CCS:
+            type, position = PARAMETER_NUMBER_CCS[control]
+            parts = self.number_parts.setdefault(channel, [type, 0, 0])
+            if parts[0] != type:
+                parts[:] = [type, 0, 0]
+            parts[1 + position] = value
+            self.selected[channel] = (type, (parts[1] << 7) | parts[2])
+            return None
+        selected = self.selected.get(channel)
+        if selected is None or selected not in self.numbers:
+            return None
+        if control == DATA_MSB:
+            self.msb[(channel, DATA_MSB)] = value
+            return None
+        msb = self.msb.get((channel, DATA_MSB), 0)
+        type, number = selected
+        return HighResMessage(type, channel, number, (msb << 7) | value, time)
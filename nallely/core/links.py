@@ -1,15 +1,19 @@
+import time
 from dataclasses import asdict
 from typing import Literal, cast
 
 from ..utils import get_note_name
 from .parameter_instances import (
     Int,
+    MPEInstance,
     PadOrKey,
     PadsOrKeysInstance,
     ParameterInstance,
     PitchwheelInstance,
 )
+from .routing import FastRoute
 from .scaler import Scaler
+from .scheduler import at_deadline, midi_scheduler
 from .virtual_device import VirtualDevice, VirtualParameter
 from .world import ThreadContext
 
@@ -22,6 +26,7 @@ DEFAULT_VELOCITY = 127
 #   (3) PadsOrKeysInstance -> MIDI device whole pads/keys as one entity
 #   (4) ParameterInstance  -> Virtual device input or output (depending if src or dst)
 #   (5) PitchwheelInstance -> MIDI device pitch wheel
+#   (6) MPEInstance        -> MIDI device MPE zone, all the voices as one entity (src only)
 #
 #  src\dest (1) (2) (3) (4) (5)
 #    (1)     X   X   X   X   X
@@ -29,6 +34,7 @@ DEFAULT_VELOCITY = 127
 #    (3)     X       X   X   X
 #    (4)     X       X   X   X
 #    (5)     X       X   X   X
+#    (6)             X   X
 #
 class Link:
     def __init__(
@@ -81,6 +87,7 @@ class Link:
         ) = src
         self.callback = None
         self.cleanup_callback = None
+        self.route: FastRoute | None = None
 
     def install(self):
         self._install_callback()
@@ -97,6 +104,18 @@ class Link:
     def trigger(self, value, ctx):
         if self.muted:
             return
+        deadline = ctx.get("deadline")
+        dest_device = self.dest.device
+        if (
+            deadline is not None
+            and isinstance(dest_device, VirtualDevice)
+            and not dest_device.computes_ahead
+            and deadline > time.perf_counter()
+        ):
+            # the destination doesn't compute ahead, it gets the value on time
+            on_time_ctx = ThreadContext({**ctx, "deadline": None})
+            midi_scheduler.call_at(deadline, self.trigger, value, on_time_ctx)
+            return None
         ctx.raw_value = value
         if self.chain:
             value = self.chain(value, ctx)
@@ -105,13 +124,22 @@ class Link:
             ctx.velocity = self.velocity
         if self.debug:
             print(f"# {value} -- {self.callback.__qualname__}\n  {ctx}\n")
+        if deadline is not None:
+            # the source computes ahead (lookahead), MIDI messages are scheduled
+            with at_deadline(deadline):
+                result = self._call_callback(value, ctx)
+        else:
+            result = self._call_callback(value, ctx)
+        if self.bouncy:
+            self.dest.device.bounce_link(self.dest, value, ctx)
+        return result
+
+    def _call_callback(self, value, ctx):
         if self.extra_zero == "before":
             self.callback(0, ThreadContext({}))  # type: ignore
         result = self.callback(value, ctx)  # type: ignore
         if self.extra_zero == "after":
             self.callback(0, ThreadContext({}))  # type: ignore
-        if self.bouncy:
-            self.dest.device.bounce_link(self.dest, value, ctx)
         return result
 
     def src_repr(self):
@@ -207,6 +235,7 @@ class Link:
         dest = cast(Int, self.dest)
 
         self.callback = self._compile_Int__Int()
+        self.route = FastRoute.compile(self)
         src.device.bind_link(link=self)
 
     def _compile_Int__Int(self):
@@ -413,6 +442,7 @@ class Link:
         dest = cast(PadOrKey, self.dest)
 
         self.callback = self._compile_PadOrKey__PadOrKey()
+        self.route = FastRoute.compile(self)
         src.device.bind_link(self)
 
     def _compile_PadOrKey__PadOrKey(self):
@@ -457,6 +487,7 @@ class Link:
         dest = cast(PadsOrKeysInstance, self.dest)
 
         self.callback = self._compile_PadsOrKeysInstance__PadsOrKeysInstance()
+        self.route = FastRoute.compile(self)
         src.device.bind_link(self)
 
     def _compile_PadsOrKeysInstance__PadsOrKeysInstance(self):
@@ -826,3 +857,67 @@ class Link:
         return lambda value, ctx: dest.device.pitchwheel(
             value, channel=dest.parameter.channel
         )
+
+    # MIDI MPE zone -> Virtual device input
+    def _install_MPEInstance__ParameterInstance(self):
+        src = cast(MPEInstance, self.src)
+        dest = cast(ParameterInstance, self.dest)
+
+        self.callback = self._compile_MPEInstance__ParameterInstance()
+        src.device.bind_link(self)
+
+    def _compile_MPEInstance__ParameterInstance(self):
+        src = cast(MPEInstance, self.src)
+        dest = cast(ParameterInstance, self.dest)
+
+        # notes are sent as for keys (0 for note off), expressions are sent as
+        # they are, ctx.type tells which is which and ctx.voice is the voice
+        is_blocking_consummer = dest.parameter.consumer
+        if is_blocking_consummer:
+
+            def foo(value, ctx):
+                if ctx.type == "note_off":
+                    value = 0
+                return dest.device.receiving(
+                    value,
+                    on=dest.parameter.name,
+                    ctx=ThreadContext({**ctx, "param": src.parameter.name}),
+                )
+
+            return foo
+        else:
+
+            def foo(value, ctx):
+                if ctx.type == "note_off":
+                    value = 0
+                return dest.device.set_parameter(dest.parameter.name, value, ctx)
+
+            return foo
+
+    # MIDI MPE zone -> MIDI pads/keys
+    def _install_MPEInstance__PadsOrKeysInstance(self):
+        src = cast(MPEInstance, self.src)
+        dest = cast(PadsOrKeysInstance, self.dest)
+
+        self.callback = self._compile_MPEInstance__PadsOrKeysInstance()
+        src.device.bind_link(self)
+
+    def _compile_MPEInstance__PadsOrKeysInstance(self):
+        dest = cast(PadsOrKeysInstance, self.dest)
+
+        self.cleanup_callback = lambda: dest.device.all_notes_off()
+
+        # only the notes of the voices are played, expressions are per voice
+        def foo(value, ctx):
+            if ctx.type not in ("note_on", "note_off"):
+                return
+            if self.extra_zero == "remove-note-off" and ctx.type == "note_off":
+                return
+            return dest.device.note(
+                note=value,
+                velocity=ctx.get("velocity", DEFAULT_VELOCITY),
+                type=ctx.type,
+                channel=dest.parameter.channel,
+            )
+
+        return foo
@@ -0,0 +1,91 @@
+import time
+
+PPQN = 24  # MIDI clock ticks per quarter note
+# We consider a MIDI clock gone if we don't receive any tick for this duration
+CLOCK_TIMEOUT = 0.5
+
+
+class MidiClockPLL:
+    """Phase locked loop over incoming MIDI clock ticks (24 ppqn).
+
+    Each tick corrects the estimated tick time (alpha) and tick period (beta)
+    from the error between the predicted and the actual arrival time, which
+    smoothes the jitter of the incoming clock. Start, stop, continue and song
+    position are handled to keep track of the position in the song.
+
+    tick() is called from the MIDI input callback, it only updates numbers.
+    """
+
+    def __init__(self, name="", alpha=0.2, beta=0.02):
+        self.name = name
+        self.alpha = alpha
+        self.beta = beta
+        self.running = False
+        self.ticks = -1  # number of ticks since the start (-1 = waiting for first tick)
+        self.period = 60 / 120 / PPQN  # 120 BPM until we know more
+        self.tick_time = 0.0  # filtered time of the last tick
+        self.last_arrival = 0.0
+        self.locked = False
+
+    def tick(self, timestamp: float):
+        if self.locked:
+            predicted = self.tick_time + self.period
+            error = timestamp - predicted
+            if -self.period < error < self.period:
+                self.tick_time = predicted + self.alpha * error
+                self.period += self.beta * error
+            else:
+                # missed ticks or tempo jump, we lock again from scratch
+                self.locked = False
+        if not self.locked:
+            interval = timestamp - self.last_arrival
+            if 0 < interval < CLOCK_TIMEOUT:
+                self.period = interval
+                self.locked = True
+            self.tick_time = timestamp
+        self.last_arrival = timestamp
+        if self.running:
+            self.ticks += 1
+
+    def start(self):
+        self.ticks = -1
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def cont(self):
+        self.running = True
+
+    def song_position(self, sixteenths: int):
+        # the next tick will be on the position
+        self.ticks = sixteenths * (PPQN // 4) - 1
+
+    @property
+    def bpm(self) -> float:
+        return 60 / (self.period * PPQN)
+
+    def is_active(self, now: float | None = None) -> bool:
+        now = time.perf_counter() if now is None else now
+        return self.running and now - self.last_arrival < CLOCK_TIMEOUT
+
+    def position(self, now: float | None = None) -> float | None:
+        """Position in quarter notes since the start, None if the clock is not playing"""
+        now = time.perf_counter() if now is None else now
+        if not self.running or self.ticks < 0:
+            return None
+        # we never go further than one tick ahead of the last received tick
+        fraction = min(1.0, max(0.0, (now - self.tick_time) / self.period))
+        return (self.ticks + fraction) / PPQN
+
+
+midi_clocks: list[MidiClockPLL] = []
+
+
+def active_midi_clock(now: float | None = None) -> MidiClockPLL | None:
+    """Returns the MIDI clock input which received a tick most recently"""
+    now = time.perf_counter() if now is None else now
+    clocks = [clock for clock in midi_clocks if clock.is_active(now)]
+    if not clocks:
+        return None
+    return max(clocks, key=lambda clock: clock.last_arrival)
@@ -1,27 +1,49 @@
 import json
 import threading
+import time
 import traceback
 from collections import defaultdict
 from dataclasses import InitVar, asdict, dataclass, field
 from math import isnan
 from pathlib import Path
-from typing import Any, Callable, Counter, Literal, Sequence, Type
+from typing import Any, Callable, ClassVar, Counter, Literal, Sequence, Type
 
 import mido
 
-from .parameter_instances import Int, PadOrKey, PadsOrKeysInstance, PitchwheelInstance
+from .highres import (
+    HIGHRES_TYPES,
+    HighResDecoder,
+    HighResEncoder,
+    HighResMessage,
+    clamp14,
+)
+from .midi_clock import MidiClockPLL, midi_clocks
+from .midi_ports import midi_ports
+from .parameter_instances import (
+    Int,
+    MPEInstance,
+    PadOrKey,
+    PadsOrKeysInstance,
+    PitchwheelInstance,
+)
 from .scaler import Scaler
+from .scheduler import at_deadline, current_deadline, midi_scheduler
+from .sysex import SysexDump, SysexStreamer, SysexTransfer
 from .virtual_device import VirtualParameter
 from .world import (
     DeviceNotFound,
     DeviceSerializer,
     ThreadContext,
     all_links,
+    cached_schema,
     connected_devices,
     midi_device_classes,
 )
 
 NOT_INIT = "uninitialized"
+# Above this delay between the computed arrival time and the processing time of
+# an input message, we consider the reconstructed time drifted and re-anchor it
+MAX_INPUT_LATENCY = 0.1
 
 
 @dataclass
@@ -34,10 +56,14 @@ class ModuleParameter:
     description: str | None = None
     range: tuple[int, int] = (0, 127)
     accepted_values: Sequence[str] = ()
-    type: Literal["program_change", "control_change"] = "control_change"
+    type: Literal[
+        "program_change", "control_change", "control_change14", "nrpn", "rpn"
+    ] = "control_change"
 
     def __post_init__(self):
         self.stream = False
+        if self.type in HIGHRES_TYPES and self.range == (0, 127):
+            self.range = (0, 16383)
 
     @property
     def min_range(self):
@@ -90,30 +116,42 @@ class ModuleParameter:
             feeder.bind(getattr(to_module, self.name))
             return
 
-        accepted_values = self.accepted_values
-        if accepted_values and isinstance(feeder, str):
-            idx = accepted_values.index(feeder)
-            if idx == -1:
-                print(
-                    f"Unknown option {feeder}, accepted values are: {accepted_values}"
-                )
-                return
-            _, upper = self.range
-            feeder = min(upper, idx * ((upper + 1) // (len(accepted_values))))
+        feeder = self.to_raw_value(feeder)
+        if feeder is None:
+            return
 
         if send:
             # Normal case, we set a value through the descriptor, this triggers the send of the message
             if self.type == "control_change":
-                to_module.device.control_change(
+                sent = to_module.device.control_change(
                     self.cc_note, feeder, channel=self.channel
                 )
+            elif self.type in HIGHRES_TYPES:
+                sent = to_module.device.highres_change(
+                    self.type, self.cc_note, feeder, channel=self.channel
+                )
             else:
-                to_module.device.program_change(feeder, channel=self.channel)
+                sent = to_module.device.program_change(feeder, channel=self.channel)
+            if sent:
+                # the device has the value only if it was sent (it could be disconnected)
+                to_module.device.modules.known.add((self.section_name, self.name))
         to_module.state[self.name].update(feeder)
 
+    def to_raw_value(self, value):
+        accepted_values = self.accepted_values
+        if accepted_values and isinstance(value, str):
+            if value not in accepted_values:
+                print(f"Unknown option {value}, accepted values are: {accepted_values}")
+                return None
+            idx = accepted_values.index(value)
+            _, upper = self.range
+            return min(upper, idx * ((upper + 1) // (len(accepted_values))))
+        return value
+
     def basic_set(self, device: "MidiDevice", value):
         # TODO update later when we will deal with multi-channels instruments
         getattr(device.modules, self.section_name).state[self.name].update(value)
+        device.modules.known.add((self.section_name, self.name))
 
     def map2accepted_values(self, value: int):
         accepted_values = self.accepted_values
@@ -214,12 +252,47 @@ class ModulePitchwheel:
     ): ...  # no need to keep state, behavior of pitchwheel is to reset to 0
 
 
+@dataclass
+class ModuleMPE:
+    """MPE zone of a controller, all the voices go through the same links
+
+    Every event of the zone is sent in the range 0..127: the note for the
+    notes, the pressure and the timbre as they are, and the pitchwheel of the
+    voice mapped from -8192..8191 to 0..127 (64 is no bend, as a float to keep
+    the resolution). ctx.type tells the kind of event and ctx.voice has the
+    raw values of the voice.
+    """
+
+    type = "mpe"
+    zone: Literal["lower", "upper"] = "lower"
+    members: int = 15
+    channel: int | None = None
+    section_name: str = NOT_INIT
+    name: str = NOT_INIT
+    cc_note: int = field(init=False, default=-1)
+    range: tuple[int, int] = (0, 127)
+    stream: bool = False
+
+    def __post_init__(self):
+        # the master channel of the zone, it keeps the links of each zone apart
+        self.cc_note = 0 if self.zone == "lower" else 15
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance.state[f"{self.section_name}_mpe_{self.name}"]
+
+    def __set__(self, target, feeder):
+        print(f"[MPE] {self.name} is an input only zone, it cannot be fed")
+
+
 @dataclass
 class MetaModule:
     name: str
     parameters: list[ModuleParameter]
     pads_or_keys: ModulePadsOrKeys | None
     pitchwheels: list[ModulePitchwheel]
+    mpe_zones: list[ModuleMPE] = field(default_factory=list)
 
 
 @dataclass
@@ -236,6 +309,7 @@ class Module:
         parameters = []
         pads = None
         pitchwheels = []
+        mpe_zones = []
         for name, value in vars(cls).items():
             if isinstance(value, ModuleParameter):
                 value.name = name
@@ -246,7 +320,10 @@ class Module:
             if isinstance(value, ModulePitchwheel):
                 value.name = name
                 pitchwheels.append(value)
-        cls.meta = MetaModule(cls.__name__, parameters, pads, pitchwheels)
+            if isinstance(value, ModuleMPE):
+                value.name = name
+                mpe_zones.append(value)
+        cls.meta = MetaModule(cls.__name__, parameters, pads, pitchwheels, mpe_zones)
 
     def __post_init__(self):
         self.meta = self.__class__.meta
@@ -267,6 +344,11 @@ class Module:
             self.state[f"{state_name}_pitch_{pitchwheel.channel or 'default'}"] = (
                 PitchwheelInstance(pitchwheel, self.device)
             )
+        for zone in self.meta.mpe_zones:
+            zone.section_name = self.__class__.state_name
+            self.state[f"{zone.section_name}_mpe_{zone.name}"] = MPEInstance(
+                zone, self.device
+            )
         self._keys_notes = {}
 
     def setup_function(self, control, lfo): ...
@@ -326,6 +408,9 @@ class Module:
 
 class DeviceState:
     def __init__(self, device, modules: dict[str, Type[Module]]):
+        self.device = device
+        # (section, parameter) whose value is known to be the one on the device
+        self.known: set[tuple[str, str]] = set()
         init_modules = {}
         self.program_change = None
         self.possible_bank = None
@@ -338,6 +423,8 @@ class DeviceState:
                 device.reverse_map[(param.type, param.cc_note, param.channel)] = param
                 if param.type == "program_change":
                     self.program_change = param
+                elif param.type in HIGHRES_TYPES:
+                    device.highres_in.register(param.type, param.cc_note)
                 elif param.cc_note == 0:
                     self.possible_bank = param
             if moduleInstance.meta.pads_or_keys:
@@ -347,6 +434,8 @@ class DeviceState:
                 device.reverse_map[(pitchwheel.type, None, pitchwheel.channel)] = (
                     pitchwheel
                 )
+            for zone in moduleInstance.meta.mpe_zones:
+                device.mpe_zones.append(getattr(moduleInstance, zone.name))
         self.modules = init_modules
 
     def __getattr__(self, name):
@@ -373,8 +462,20 @@ class DeviceState:
                 del d[name]
         return d
 
-    def from_dict_patch(self, d):
-        d = {**d}
+    def forget(self):
+        """Forgets which values are known to be on the device (e.g: reconnection)"""
+        self.known.clear()
+
+    def from_dict_patch(self, d, diff=True, ordered=False, interval_ms=0.0):
+        """Applies a preset on the device.
+
+        With diff, the parameters whose value is already known to be the one on
+        the device (sent or received before) are not sent again. With ordered,
+        parameters are sent in the order of their declaration in the device
+        sections instead of the order of the preset, and interval_ms spaces the
+        messages (they are scheduled, the call doesn't block).
+        """
+        d = {name: {**section} for name, section in d.items()}
         if self.program_change:
             try:
                 param = self.program_change
@@ -383,6 +484,8 @@ class DeviceState:
                 value = d[section_name][name]
                 setattr(self.modules[section_name], name, value)
                 del d[section_name][name]
+                # the device loaded one of its programs, we don't know its state anymore
+                self.forget()
             except Exception:
                 pass
         if self.possible_bank:
@@ -395,9 +498,54 @@ class DeviceState:
                 del d[section_name][name]
             except Exception:
                 pass
-        for sec_name, section in d.items():
-            for param, value in section.items():
-                setattr(self.modules[sec_name], param, value)
+        changes = self.patch_changes(d, diff=diff, ordered=ordered)
+        dump = self.device.sysex_dump
+        if dump and self.device.outport:
+            # parameters part of the bulk dump are sent all at once as SysEx
+            dumped = dump.parameters
+            dump_changes = [c for c in changes if f"{c[0]}.{c[1]}" in dumped]
+            for section_name, name, value in dump_changes:
+                module = self.modules[section_name]
+                getattr(type(module), name).__set__(module, value, send=False)
+                self.known.add((section_name, name))
+            if dump_changes:
+                self.device.send_dump()
+                changes = [c for c in changes if f"{c[0]}.{c[1]}" not in dumped]
+        start = time.perf_counter()
+        for i, (section_name, name, value) in enumerate(changes):
+            deadline = start + i * interval_ms / 1000 if interval_ms > 0 else None
+            with at_deadline(deadline):
+                setattr(self.modules[section_name], name, value)
+
+    def patch_changes(self, d, diff=True, ordered=False):
+        """Returns the (section, parameter, value) of the preset to send to the device"""
+        if ordered:
+            entries = [
+                (section_name, param.name, d[section_name][param.name])
+                for section_name, module in self.modules.items()
+                for param in module.meta.parameters
+                if param.name in d.get(section_name, {})
+            ]
+        else:
+            entries = [
+                (section_name, name, value)
+                for section_name, section in d.items()
+                for name, value in section.items()
+            ]
+        if not diff:
+            return entries
+        changes = []
+        for section_name, name, value in entries:
+            module = self.modules.get(section_name)
+            param = getattr(type(module), name, None) if module else None
+            if (
+                isinstance(param, ModuleParameter)
+                and (section_name, name) in self.known
+                and module.state[name] == param.to_raw_value(value)
+            ):
+                continue
+            changes.append((section_name, name, value))
+        return changes
 
     def to_list(self):
         l = []
@@ -430,6 +578,7 @@ class MidiDevice(threading.Thread):
     on_midi_message: (
         Callable[["MidiDevice", mido.Message, ModuleParameter | None], None] | None
     ) = None
+    sysex_dump: ClassVar[SysexDump | None] = None
 
     def __init_subclass__(cls) -> None:
         midi_device_classes.append(cls)
@@ -462,12 +611,21 @@ class MidiDevice(threading.Thread):
         self.links_registry: dict[tuple[str, str], Link] = {}
         if self.modules_descr is None:
             self.modules_descr = self.sections
+        self.highres_in = HighResDecoder()
+        self.highres_out = HighResEncoder()
+        # the CC of a 14-bit value or (N)RPN must not interleave with another one
+        self._highres_lock = threading.Lock()
+        self.mpe_zones: list[MPEInstance] = []
         self.modules = DeviceState(self, self.modules_descr)
         self.listening = False
         self.outport_name = self.device_name
         self.inport_name = self.device_name
         self._retry_input = False
         self._retry_output = False
+        self._last_event_time = None
+        self.clock_input = MidiClockPLL(self.device_name)
+        midi_clocks.append(self.clock_input)
+        self.sysex_streamer = SysexStreamer(self)
         if autoconnect:
             connected = self.try_connection(read_input_only)
             if not connected:
@@ -480,22 +638,14 @@ class MidiDevice(threading.Thread):
         super().start()
 
     def run(self):
-        import time
-
         while self._running:
             time.sleep(1 / 20)
 
     def try_connection(self, read_input_only=False):
-        try:
-            self.outport_name = next(
-                (
-                    dev_name
-                    for dev_name in mido.get_output_names()  # type: ignore
-                    if self.device_name == dev_name or self.device_name in dev_name
-                ),
-            )
-        except StopIteration:
+        outport_name = midi_ports.find_output(self.device_name)
+        if outport_name is None:
             return False
+        self.outport_name = outport_name
         if not read_input_only:
             self.connect()
         self.listen()
@@ -503,6 +653,9 @@ class MidiDevice(threading.Thread):
 
     def connect(self):
         self.outport = mido.open_output(self.outport_name, autoreset=True)  # type: ignore
+        # a new output, nothing we sent before is known to be on the device
+        self.modules.forget()
+        self.highres_out.reset()
 
     def listen(self, start=True):
         if not start:
@@ -513,23 +666,51 @@ class MidiDevice(threading.Thread):
             try:
                 self.inport = mido.open_input(self.inport_name)  # type: ignore
             except OSError:
-                try:
-                    self.inport_name = next(
-                        (
-                            dev_name
-                            for dev_name in mido.get_input_names()  # type: ignore
-                            if self.device_name == dev_name
-                            or self.device_name in dev_name
-                        ),
-                    )
-                    self.inport = mido.open_input(self.inport_name)  # type: ignore
-                except StopIteration:
+                inport_name = midi_ports.find_input(self.device_name)
+                if inport_name is None:
                     raise DeviceNotFound(self.device_name)
-            self.inport.callback = self._sync_state  # type: ignore
+                self.inport_name = inport_name
+                self.inport = mido.open_input(self.inport_name)  # type: ignore
+            self._attach_input_callback(self.inport)
             self.listening = True
 
+    def _attach_input_callback(self, port):
+        port.callback = self._sync_state  # type: ignore
+        rt = getattr(port, "_rt", None)
+        if rt is None:
+            return
+        # rtmidi backend, mido drops the delta time given by the backend, so we
+        # replace its callback by one that keeps track of the arrival time
+        self._last_event_time = None
+        with port._callback_lock:
+            rt.cancel_callback()
+            rt.set_callback(self._rtmidi_callback)
+
+    def _rtmidi_callback(self, msg_data, _):
+        data, delta = msg_data
+        now = time.perf_counter()
+        timestamp = now
+        if self._last_event_time is not None:
+            timestamp = self._last_event_time + delta
+            if timestamp > now or now - timestamp > MAX_INPUT_LATENCY:
+                timestamp = now
+        self._last_event_time = timestamp
+        if data[0] == 0xF8:
+            # clock ticks go directly in the PLL, no message is built
+            self.clock_input.tick(timestamp)
+            return
+        try:
+            msg = mido.Message.from_bytes(data, time=timestamp)
+        except ValueError:
+            return
+        self._sync_state(msg)
+
     def close_out(self):
         if self.outport:
+            outport = self.outport
+            midi_scheduler.cancel_all(
+                lambda fn, _: getattr(fn, "__self__", None) is outport
+            )
             self.outport.close()
             self.outport = None
             self.outport_name = None
@@ -550,7 +731,7 @@ class MidiDevice(threading.Thread):
         if self.inport:
             try:
                 newport = mido.open_input(inname)  # type: ignore
-                newport.callback = self._sync_state  # type: ignore
+                self._attach_input_callback(newport)
                 self.inport = newport
             except OSError:
                 print(f"[MIDI] Reconnection on {inname} failed")
@@ -572,6 +753,8 @@ class MidiDevice(threading.Thread):
                 newport = mido.open_output(outname, autoreset=True)  # type: ignore
                 self.outport.close()
                 self.outport = newport
+                self.modules.forget()
+                self.highres_out.reset()
             except OSError:
                 print(f"[MIDI] Reconnection on {outname} failed")
                 self._retry_output = True
@@ -603,6 +786,9 @@ class MidiDevice(threading.Thread):
         self.links_registry.clear()
         if delete and self in connected_devices:
             connected_devices.remove(self)
+        if self.clock_input in midi_clocks:
+            midi_clocks.remove(self.clock_input)
+        self.sysex_streamer.stop()
 
     stop = close
 
@@ -623,19 +809,38 @@ class MidiDevice(threading.Thread):
                     traceback.print_exc()
 
     def _sync_state(self, msg):
-        if msg.type == "clock":
-            # TODO create special clock/sync hook
+        if msg.is_realtime or msg.type == "songpos":
+            self._sync_clock(msg)
+            return
+        if msg.type == "sysex":
+            self.sysex_streamer.received(msg)
+            return
+        if not hasattr(msg, "channel"):
+            return
+        if self.mpe_zones and self._sync_mpe(msg):
             return
         if self.debug:
             print(msg)
+        # msg.time carries the arrival time (perf_counter) when the backend gives it
+        timestamp = msg.time or time.perf_counter()
         # None marks the device channel
         channel = None if msg.channel == self.channel else msg.channel
+        if msg.type == "control_change":
+            highres = self.highres_in
+            if highres.follows(msg.control):
+                # the (N)RPN selection, the CC also goes through the 7bits path
+                highres.feed(msg.channel, msg.control, msg.value, timestamp)
+            elif highres.consumes(msg.channel, msg.control):
+                self._sync_highres(msg, channel, timestamp)
+                return
         if msg.type == "control_change":
             control = msg.control
             try:
                 for link in self.links.get((msg.type, control, channel), []):
+                    if link.route and link.route.dispatch(msg):
+                        continue
                     value = msg.value
-                    ctx = ThreadContext({"debug": self.debug})
+                    ctx = ThreadContext({"debug": self.debug, "timestamp": timestamp})
                     link.trigger(value, ctx)
                 self._update_state(control, msg.value, msg)
             except:
@@ -645,20 +850,26 @@ class MidiDevice(threading.Thread):
             try:
                 # We look first if there are links at the "global level" for keys
                 for link in self.links.get(("note", -1, channel), []):
+                    if link.route and link.route.dispatch(msg):
+                        continue
                     ctx = ThreadContext(
                         {
                             "debug": self.debug,
                             "type": msg.type,
                             "velocity": msg.velocity,
+                            "timestamp": timestamp,
                         }
                     )
                     link.trigger(note, ctx)
                 for link in self.links.get(("note", note, channel), []):
+                    if link.route and link.route.dispatch(msg):
+                        continue
                     ctx = ThreadContext(
                         {
                             "debug": self.debug,
                             "type": msg.type,
                             "velocity": msg.velocity,
+                            "timestamp": timestamp,
                         }
                     )
                     link.trigger(note, ctx)
@@ -668,6 +879,7 @@ class MidiDevice(threading.Thread):
                             "debug": self.debug,
                             "type": msg.type,
                             "note": note,
+                            "timestamp": timestamp,
                         }
                     )
                     value = msg.velocity
@@ -683,16 +895,148 @@ class MidiDevice(threading.Thread):
             try:
                 for link in self.links.get((msg.type, -1, channel), []):
                     pitch = msg.pitch
-                    ctx = ThreadContext({"debug": self.debug, "type": msg.type})
+                    ctx = ThreadContext(
+                        {"debug": self.debug, "type": msg.type, "timestamp": timestamp}
+                    )
                     link.trigger(pitch, ctx)
             except:
                 traceback.print_exc()
 
+    def _sync_mpe(self, msg):
+        for zone in self.mpe_zones:
+            event = zone.zone.feed(msg)
+            if event is None:
+                continue
+            type, value, voice = event
+            if type == "pitchwheel":
+                # all the events of the zone share the range of the zone (0..127)
+                value = (value + 8192) / 128
+            if self.debug:
+                print(msg)
+            timestamp = msg.time or time.perf_counter()
+            parameter = zone.parameter
+            try:
+                links_key = (parameter.type, parameter.cc_note, parameter.channel)
+                for link in self.links.get(links_key, []):
+                    ctx = ThreadContext(
+                        {
+                            "debug": self.debug,
+                            "type": type,
+                            "velocity": voice.velocity,
+                            "note": voice.note,
+                            "voice": voice,
+                            "timestamp": timestamp,
+                        }
+                    )
+                    link.trigger(value, ctx)
+            except:
+                traceback.print_exc()
+            return True
+        return False
+
+    def _sync_highres(self, msg, channel, timestamp):
+        event = self.highres_in.feed(msg.channel, msg.control, msg.value, timestamp)
+        if event is None:
+            return
+        try:
+            for link in self.links.get((event.type, event.control, channel), []):
+                ctx = ThreadContext({"debug": self.debug, "timestamp": timestamp})
+                link.trigger(event.value, ctx)
+            control = self.reverse_map.get((event.type, event.control, channel))
+            if control:
+                control.basic_set(self, event.value)
+                if self.on_midi_message:
+                    self.on_midi_message(self, event, control)
+        except:
+            traceback.print_exc()
+
+    def _sync_clock(self, msg):
+        clock = self.clock_input
+        match msg.type:
+            case "clock":
+                clock.tick(msg.time or time.perf_counter())
+            case "start":
+                clock.start()
+            case "stop":
+                clock.stop()
+            case "continue":
+                clock.cont()
+            case "songpos":
+                clock.song_position(msg.pos)
+
     def send(self, msg):
         if not self.outport:
             return
+        deadline = current_deadline()
+        if deadline is not None and deadline > time.perf_counter():
+            midi_scheduler.send_at(self.outport, msg, deadline)
+            return
         self.outport.send(msg)
 
+    def send_raw(self, data: list[int]):
+        """Sends raw MIDI bytes, without building a mido message if the backend allows it"""
+        outport = self.outport
+        if not outport:
+            return
+        rt = getattr(outport, "_rt", None)  # rtmidi backend
+        if rt is None or current_deadline() is not None:
+            self.send(mido.Message.from_bytes(data))
+            return
+        with outport._send_lock:  # type: ignore
+            rt.send_message(data)
+
+    def send_sysex(
+        self,
+        messages: list[mido.Message] | list[int],
+        chunk_delay_ms: float = 20,
+        handshake: Sequence[int] | None = None,
+        handshake_timeout_ms: float = 500,
+    ) -> SysexTransfer:
+        """Streams SysEx messages (or the data of a single one) from a dedicated thread.
+
+        Messages are sent one after the other with chunk_delay_ms between them,
+        and if handshake is set, waiting for an inbound SysEx starting with it.
+        """
+        if messages and isinstance(messages[0], int):
+            messages = [mido.Message("sysex", data=messages)]
+        transfer = SysexTransfer(
+            list(messages),  # type: ignore
+            chunk_delay_ms=chunk_delay_ms,
+            handshake=handshake,
+            handshake_timeout_ms=handshake_timeout_ms,
+        )
+        return self.sysex_streamer.submit(transfer)
+
+    def send_dump(self, values: dict[str, int] | None = None) -> SysexTransfer | None:
+        """Sends the current state as a SysEx bulk dump if the device describes one"""
+        dump = self.sysex_dump
+        if not dump:
+            return None
+        return self.send_sysex(
+            dump.messages(self, values),
+            chunk_delay_ms=dump.chunk_delay_ms,
+            handshake=dump.handshake,
+            handshake_timeout_ms=dump.handshake_timeout_ms,
+        )
+
+    def send_at(self, msg, deadline: float):
+        """Sends the message when time.perf_counter() reaches the deadline"""
+        if not self.outport:
+            return
+        midi_scheduler.send_at(self.outport, msg, deadline)
+
+    def scheduled(self, deadline: float | None):
+        """Context manager scheduling all messages sent inside at the deadline"""
+        return at_deadline(deadline)
+
+    def _defer(self, fn, *args) -> bool:
+        """Calls fn at the deadline of the thread if it's ahead, returns True if deferred"""
+        deadline = current_deadline()
+        if deadline is None or deadline <= time.perf_counter():
+            return False
+        midi_scheduler.call_at(deadline, fn, *args)
+        return True
+
     def note(self, type, note, velocity=127 // 2, channel=None):
         channel = channel if channel is not None else self.channel
         getattr(self, type)(note, velocity=velocity, channel=channel)
@@ -700,6 +1044,9 @@ class MidiDevice(threading.Thread):
     def note_on(self, note, velocity=127 // 2, channel=None):
         if not self.outport:
             return
+        # played_notes follows what is really sent
+        if self._defer(self.note_on, note, velocity, channel):
+            return
         channel = channel if channel is not None else self.channel
         note = round(note)
         if note > 127:
@@ -707,7 +1054,7 @@ class MidiDevice(threading.Thread):
         elif note < 0:
             note = 0
         self.played_notes[note] += 1
-        self.outport.send(
+        self.send(
             mido.Message("note_on", channel=channel, note=note, velocity=velocity)
         )
         if self.played_notes[note] > 40:
@@ -717,13 +1064,15 @@ class MidiDevice(threading.Thread):
     def note_off(self, note, velocity=127 // 2, channel=None):
         if not self.outport:
             return
+        if self._defer(self.note_off, note, velocity, channel):
+            return
         channel = channel if channel is not None else self.channel
         note = round(note)
         if note > 127:
             note = 127
         elif note < 0:
             note = 0
-        self.outport.send(
+        self.send(
             mido.Message("note_off", channel=channel, note=note, velocity=velocity)
         )
         if self.played_notes[note]:
@@ -738,9 +1087,10 @@ class MidiDevice(threading.Thread):
             pitch = 8191
         elif pitch < -8192:
             pitch = -8192
-        self.outport.send(mido.Message("pitchwheel", channel=channel, pitch=pitch))
+        self.send(mido.Message("pitchwheel", channel=channel, pitch=pitch))
 
     def all_notes_off(self):
+        midi_scheduler.cancel_all(lambda fn, _: fn == self.note_on)
         for note, occurence in self.played_notes.items():
             for _ in range(occurence):
                 self.note_off(note, velocity=0)
@@ -763,8 +1113,45 @@ class MidiDevice(threading.Thread):
         msg = mido.Message(
             "control_change", channel=channel, control=control, value=value
         )
+        self.send(msg)
         self._update_state(control, value, msg)
-        self.outport.send(msg)
+        return True
+
+    def control_change14(self, control, value=0, channel=None):
+        """Sends a 14bits value on the control (MSB) and control + 32 (LSB)"""
+        self.highres_change("control_change14", control, value, channel)
+
+    def nrpn(self, number, value=0, channel=None):
+        self.highres_change("nrpn", number, value, channel)
+
+    def rpn(self, number, value=0, channel=None):
+        self.highres_change("rpn", number, value, channel)
+
+    def highres_change(self, type, number, value=0, channel=None):
+        if not self.outport:
+            return
+        channel = channel if channel is not None else self.channel
+        value = clamp14(value)
+        with self._highres_lock:
+            for control, data in self.highres_out.encode(type, number, value, channel):
+                self.send(
+                    mido.Message(
+                        "control_change", channel=channel, control=control, value=data
+                    )
+                )
+        control = self.reverse_map.get(
+            (type, number, None if channel == self.channel else channel)
+        ) or self.reverse_map.get((type, number, channel))
+        if control:
+            control.basic_set(self, value)
+            if self.on_midi_message:
+                try:
+                    self.on_midi_message(
+                        self, HighResMessage(type, channel, number, value), control
+                    )
+                except:
+                    traceback.print_exc()
+        return True
 
     def program_change(self, program, channel=None):
         if not self.outport:
@@ -773,7 +1160,8 @@ class MidiDevice(threading.Thread):
         channel = min(max(0, int(channel)), 15)
         program = min(max(0, int(program)), 127)
         msg = mido.Message("program_change", channel=channel, program=program)
-        self.outport.send(msg)
+        self.send(msg)
+        return True
 
     def unbind_all(self):
         for link in self.links_registry.values():
@@ -890,12 +1278,16 @@ class MidiDevice(threading.Thread):
         self,
         file: Path | str | None = None,
         dct: dict[str, dict[str, int]] | None = None,
+        diff=True,
+        ordered=False,
+        interval_ms=0.0,
     ):
+        options = {"diff": diff, "ordered": ordered, "interval_ms": interval_ms}
         if file:
             p = Path(file)
-            self.modules.from_dict_patch(json.loads(p.read_text()))
+            self.modules.from_dict_patch(json.loads(p.read_text()), **options)
         if dct:
-            self.modules.from_dict_patch(dct)
+            self.modules.from_dict_patch(dct, **options)
 
     def to_dict(self, save_defaultvalues=False):
         d = {
@@ -906,12 +1298,16 @@ class MidiDevice(threading.Thread):
                 "output": self.outport.name if self.outport else None,
             },
             "channel": self.channel,
-            "meta": {
-                "name": self.__class__.__name__,
-                "sections": [
-                    asdict(module.meta) for module in self.modules.modules.values()
-                ],
-            },
+            "meta": cached_schema(
+                self.__class__,
+                "schema",
+                lambda: {
+                    "name": self.__class__.__name__,
+                    "sections": [
+                        asdict(module.meta) for module in self.modules.modules.values()
+                    ],
+                },
+            ),
             "config": self.modules.as_dict_patch(
                 with_meta=False, save_defaultvalues=save_defaultvalues
             ),
@@ -0,0 +1,158 @@
+import threading
+import time
+from typing import Callable, NamedTuple
+
+import mido
+
+from .world import connected_devices
+
+
+class PortEvent(NamedTuple):
+    kind: str  # "connected" or "disconnected"
+    direction: str  # "input" or "output"
+    name: str
+
+
+class MidiPortRegistry(threading.Thread):
+    """Enumerates MIDI ports in the background and caches the result.
+
+    Enumerating ports with ALSA/rtmidi is costly, so the command path only reads
+    the cached names. Every change of the port list is turned into PortEvents,
+    which are sent to the registered listeners (used for reconnection and
+    for notifying Trevor).
+    """
+
+    def __init__(self, interval=1.0, min_interval=0.25):
+        super().__init__(daemon=True, name="MidiPortRegistry")
+        self.interval = interval
+        self.min_interval = min_interval
+        self.inputs: list[str] = []
+        self.outputs: list[str] = []
+        self.listeners: list[Callable[[list[PortEvent]], None]] = []
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._enumerated = False
+        self._last_refresh = 0.0
+        self._failing = False
+
+    def ensure_running(self):
+        with self._lock:
+            if not self._last_refresh:
+                self.refresh(force=True)
+            if not self._running:
+                self._running = True
+                self.start()
+
+    def run(self):
+        while self._running:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if not self._running:
+                break
+            if not self.refresh() and retry_pending():
+                reconnect_devices()
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def input_names(self) -> list[str]:
+        self.ensure_running()
+        return list(self.inputs)
+
+    def output_names(self) -> list[str]:
+        self.ensure_running()
+        return list(self.outputs)
+
+    def find_output(self, device_name) -> str | None:
+        return self._find(self.output_names, device_name)
+
+    def find_input(self, device_name) -> str | None:
+        return self._find(self.input_names, device_name)
+
+    def _find(self, names, device_name):
+        # on a miss, the device might just have been plugged, we enumerate again
+        for refresh in (False, True):
+            if refresh:
+                self.refresh()
+            for name in names():
+                if device_name == name or device_name in name:
+                    return name
+        return None
+
+    def request_refresh(self):
+        """Asks the registry thread for an enumeration as soon as possible."""
+        self.ensure_running()
+        self._wakeup.set()
+
+    def add_listener(self, listener: Callable[[list[PortEvent]], None]):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[list[PortEvent]], None]):
+        try:
+            self.listeners.remove(listener)
+        except ValueError:
+            pass
+
+    def refresh(self, force=False) -> list[PortEvent]:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.min_interval:
+                return []
+            self._last_refresh = now
+            try:
+                inputs = list(mido.get_input_names())  # type: ignore
+                outputs = list(mido.get_output_names())  # type: ignore
+            except Exception as e:
+                if not self._failing:
+                    print(f"[MIDI] Cannot enumerate MIDI ports: {e}")
+                self._failing = True
+                return []
+            self._failing = False
+            events = self._diff("input", self.inputs, inputs)
+            events.extend(self._diff("output", self.outputs, outputs))
+            self.inputs = inputs
+            self.outputs = outputs
+            first_enumeration = not self._enumerated
+            self._enumerated = True
+        if events and not first_enumeration:
+            self._notify(events)
+        return events
+
+    @staticmethod
+    def _diff(direction, old, new):
+        events = [PortEvent("disconnected", direction, n) for n in old if n not in new]
+        events.extend(PortEvent("connected", direction, n) for n in new if n not in old)
+        return events
+
+    def _notify(self, events: list[PortEvent]):
+        for event in events:
+            print(f"[MIDI] {event.direction.capitalize()} {event.name!r} {event.kind}")
+        for listener in list(self.listeners):
+            try:
+                listener(events)
+            except Exception as e:
+                print(f"[MIDI] Error in port listener {listener}: {e}")
+
+
+def retry_pending():
+    return any(
+        getattr(device, "_retry_input", False)
+        or getattr(device, "_retry_output", False)
+        for device in connected_devices
+    )
+
+
+def reconnect_devices(events=None):
+    inputs, outputs = midi_ports.inputs, midi_ports.outputs
+    for device in list(connected_devices):
+        if device.should_reconnect_output(outputs):
+            device.reconnect_output(exact=True)
+        if device.should_reconnect_input(inputs):
+            device.reconnect_input(exact=True)
+
+
+midi_ports = MidiPortRegistry()
+midi_ports.add_listener(reconnect_devices)
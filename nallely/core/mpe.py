@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Literal
+
+# per-note expressions carried by the member channels of a zone
+MPE_EXPRESSIONS = ("pitchwheel", "pressure", "timbre")
+TIMBRE_CC = 74
+MCM_RPN = 6  # MPE Configuration Message
+
+
+@dataclass(slots=True)
+class MPEVoice:
+    """State of the voice playing on a member channel.
+
+    The same instance is updated in place and passed in the context of each
+    event of the voice, neurons can keep a reference on it.
+    """
+
+    channel: int
+    note: int = -1
+    velocity: int = 0
+    pitch: int = 0
+    pressure: int = 0
+    timbre: int = 64
+    active: bool = False
+
+
+class MPEZone:
+    """Decodes the messages of an MPE zone in per-voice events.
+
+    A lower zone uses channel 0 as master channel and the following channels as
+    member channels, an upper zone uses channel 15 and the channels below. Each
+    member channel carries one voice at a time: its note, pitchwheel, channel
+    pressure and timbre (CC74). The number of member channels follows the MPE
+    configuration messages (RPN 6) received on the master channel.
+    """
+
+    def __init__(self, zone: Literal["lower", "upper"] = "lower", members=15):
+        self.zone = zone
+        self.master = 0 if zone == "lower" else 15
+        self._rpn = [127, 127]
+        self.configure(members)
+
+    def configure(self, members: int):
+        members = max(0, min(15, members))
+        if self.zone == "lower":
+            channels = range(1, members + 1)
+        else:
+            channels = range(14, 14 - members, -1)
+        self.members = list(channels)
+        self.voices = {channel: MPEVoice(channel) for channel in self.members}
+
+    def feed(self, msg) -> tuple[str, int, MPEVoice] | None:
+        """Returns (event type, value, voice) if the message is a voice event"""
+        voice = self.voices.get(msg.channel)
+        if voice is None:
+            if msg.channel == self.master and msg.type == "control_change":
+                self._configuration(msg.control, msg.value)
+            return None
+        match msg.type:
+            case "note_on" if msg.velocity > 0:
+                voice.note = msg.note
+                voice.velocity = msg.velocity
+                voice.active = True
+                return "note_on", msg.note, voice
+            case "note_on" | "note_off":
+                if voice.note != msg.note:
+                    return None
+                voice.active = False
+                return "note_off", msg.note, voice
+            case "pitchwheel":
+                voice.pitch = msg.pitch
+                return "pitchwheel", msg.pitch, voice
+            case "aftertouch":
+                voice.pressure = msg.value
+                return "pressure", msg.value, voice
+            case "control_change" if msg.control == TIMBRE_CC:
+                voice.timbre = msg.value
+                return "timbre", msg.value, voice
+        return None
+
+    def _configuration(self, control, value):
+        if control == 101:
+            self._rpn[0] = value
+        elif control == 100:
+            self._rpn[1] = value
+        elif control == 6 and self._rpn == [0, MCM_RPN]:
+            self.configure(value)
@@ -7,6 +7,7 @@ from .world import ThreadContext, all_devices
 if TYPE_CHECKING:
     from .midi_device import (
         MidiDevice,
+        ModuleMPE,
         ModulePadsOrKeys,
         ModuleParameter,
         ModulePitchwheel,
@@ -341,6 +342,60 @@ class PitchwheelInstance:
         return links
 
 
+class MPEInstance:
+    """Whole MPE zone of a device as one entity, its links carry all the voices"""
+
+    def __init__(self, parameter: "ModuleMPE", device: "MidiDevice"):
+        from .mpe import MPEZone
+
+        self.parameter = parameter
+        self.device = device
+        self.zone = MPEZone(parameter.zone, parameter.members)
+
+    def repr(self):
+        return (
+            f"{self.device.uuid}::{self.parameter.section_name}::{self.parameter.name}"
+        )
+
+    def bind(self, target):
+        from .links import Link
+
+        return Link.create(self, target)
+
+    def __isub__(self, other):
+        other.device.unbind_link(other, self)
+
+    @property
+    def voices(self):
+        return self.zone.voices
+
+    def scale(
+        self,
+        min: int | float | None = None,
+        max: int | float | None = None,
+        method: Literal["lin", "log", "asinh", "pow"] = "lin",
+        as_int: bool = False,
+    ):
+        return Scaler(
+            data=self,
+            to_min=min,
+            to_max=max,
+            method=method,
+            as_int=as_int,
+            auto=min is None and max is None,
+        )
+
+    @property
+    def outgoing_links(self):
+        links = []
+        self_repr = self.repr()
+        for (src, _), link in self.device.links_registry.items():
+            if src == self_repr:
+                links.append(link)
+
+        return links
+
+
 class padproperty(property):
     def __set__(self, instance, inner_function, owner=""):
         ...  # This would be called if function binding is reactivated (currently removed)
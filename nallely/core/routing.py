@@ -0,0 +1,143 @@
+import traceback
+from typing import TYPE_CHECKING
+
+import mido
+
+if TYPE_CHECKING:
+    from .links import Link
+    from .midi_device import MidiDevice
+
+
+DEFAULT_VELOCITY = 127
+
+# (src class, dest class) -> kind of fast route
+ROUTE_KINDS = {
+    ("Int", "Int"): "cc",
+    ("PadOrKey", "PadOrKey"): "key",
+    ("PadsOrKeysInstance", "PadsOrKeysInstance"): "keys",
+}
+
+
+def clamp7(value):
+    value = round(value)
+    return 127 if value > 127 else 0 if value < 0 else value
+
+
+class FastRoute:
+    """Compiled MIDI device -> MIDI device route.
+
+    The route rewrites the incoming message directly in the input callback
+    (channel remap, CC remap, note transpose, velocity) and sends the raw bytes
+    to the destination port. Scalers are compiled as a 128 entries lookup table.
+    When the link needs Python logic (bouncy, debug, extra zero), the route
+    declines and the link goes through the normal Link.trigger path.
+    """
+
+    __slots__ = ("link", "kind", "lut", "lut_key")
+
+    def __init__(self, link: "Link", kind: str):
+        self.link = link
+        self.kind = kind
+        self.lut: list[int] | None = None
+        self.lut_key = None
+
+    @classmethod
+    def compile(cls, link: "Link") -> "FastRoute | None":
+        kind = ROUTE_KINDS.get(
+            (link.src.__class__.__name__, link.dest.__class__.__name__)
+        )
+        if kind is None:
+            return None
+        if kind == "cc" and (
+            link.src.parameter.type != "control_change"  # type: ignore
+            or link.dest.parameter.type != "control_change"  # type: ignore
+        ):
+            return None
+        route = cls(link, kind)
+        if kind != "key" and not route.compile_lut():
+            return None
+        return route
+
+    def _chain_key(self):
+        chain = self.link.chain
+        if chain is None:
+            return None
+        return (chain, chain.to_min, chain.to_max, chain.method, chain.as_int)
+
+    def compile_lut(self):
+        chain = self.link.chain
+        self.lut_key = self._chain_key()
+        try:
+            if chain is None:
+                self.lut = list(range(128))
+            else:
+                self.lut = [clamp7(chain(i)) for i in range(128)]
+        except Exception:
+            self.lut = None
+            return False
+        return True
+
+    def dispatch(self, msg) -> bool:
+        """Returns False if the message needs to go through the slow path"""
+        link = self.link
+        if link.muted:
+            return True
+        if link.bouncy or link.debug or link.extra_zero != "none":
+            return False
+        if self.kind != "key" and self._chain_key() != self.lut_key:
+            # the scaler has been modified since the compilation
+            if not self.compile_lut():
+                return False
+        dest = link.dest
+        device: "MidiDevice" = dest.device  # type: ignore
+        if not device.outport:
+            return True
+        parameter = dest.parameter
+        channel = parameter.channel
+        if channel is None:
+            channel = device.channel
+        try:
+            if self.kind == "cc":
+                return self._send_cc(device, parameter, channel, msg)
+            if self.kind == "key":
+                note = parameter.cc_note
+            else:
+                note = self.lut[msg.note]  # type: ignore
+            velocity = link.velocity or msg.velocity
+            return self._send_note(device, msg.type, note, velocity, channel)
+        except Exception:
+            traceback.print_exc()
+            return True
+
+    def _send_cc(self, device: "MidiDevice", parameter, channel, msg):
+        value = self.lut[msg.value]  # type: ignore
+        parameter.basic_set(device, value)
+        if device.on_midi_message:
+            out = mido.Message(
+                "control_change",
+                channel=channel,
+                control=parameter.cc_note,
+                value=value,
+            )
+            try:
+                device.on_midi_message(device, out, parameter)
+            except:
+                traceback.print_exc()
+        device.send_raw([0xB0 | channel, parameter.cc_note, value])
+        return True
+
+    @staticmethod
+    def _send_note(device: "MidiDevice", type, note, velocity, channel):
+        played_notes = device.played_notes
+        if type == "note_on":
+            if played_notes[note] >= 40:
+                # too many hanging notes, the slow path cleans them
+                return False
+            played_notes[note] += 1
+            status = 0x90
+        else:
+            if played_notes[note]:
+                played_notes[note] -= 1
+            status = 0x80
+        device.send_raw([status | channel, note, velocity])
+        return True
@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable
+
+_local = threading.local()
+
+
+def current_deadline() -> float | None:
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def at_deadline(deadline: float | None):
+    """Every MIDI message sent by this thread inside the context manager will be
+    scheduled for the perf_counter() deadline instead of being sent right away.
+    """
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+class MidiScheduler(threading.Thread):
+    """Dispatches MIDI messages (or any callable) at a perf_counter() deadline.
+
+    The dispatcher sleeps until it is close to the next deadline, then spins for
+    the last part (spin_ms) to avoid the imprecision of time.sleep.
+    """
+
+    def __init__(self, spin_ms=1.5):
+        super().__init__(daemon=True, name="MidiScheduler")
+        self.spin_s = spin_ms / 1000
+        self.events: list[tuple[float, int, Callable, tuple]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self.late_count = 0
+
+    def ensure_running(self):
+        with self._condition:
+            if not self._running:
+                self._running = True
+                self.start()
+
+    def call_at(self, deadline: float, fn: Callable, *args: Any):
+        self.ensure_running()
+        with self._condition:
+            heapq.heappush(self.events, (deadline, next(self._counter), fn, args))
+            if self.events[0][0] == deadline:
+                self._condition.notify()
+
+    def send_at(self, outport, msg, deadline: float):
+        self.call_at(deadline, outport.send, msg)
+
+    def cancel_all(self, fn_filter: Callable[[Callable, tuple], bool] | None = None):
+        with self._condition:
+            if fn_filter is None:
+                self.events.clear()
+            else:
+                self.events = [e for e in self.events if not fn_filter(e[2], e[3])]
+                heapq.heapify(self.events)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def run(self):
+        perf_counter = time.perf_counter
+        while self._running:
+            with self._condition:
+                while self._running and not self.events:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                deadline = self.events[0][0]
+                remaining = deadline - perf_counter()
+                if remaining > self.spin_s:
+                    # a new event might be pushed before the current head
+                    self._condition.wait(remaining - self.spin_s)
+                    continue
+            while perf_counter() < deadline:
+                pass
+            with self._condition:
+                due = []
+                now = perf_counter()
+                while self.events and self.events[0][0] <= now:
+                    due.append(heapq.heappop(self.events))
+            for deadline, _, fn, args in due:
+                if now - deadline > 0.001:
+                    self.late_count += 1
+                try:
+                    fn(*args)
+                except Exception as e:
+                    print(f"[SCHEDULER] Error while dispatching {fn}: {e}")
+
+
+midi_scheduler = MidiScheduler()
@@ -0,0 +1,186 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from queue import Empty, Queue
+from typing import TYPE_CHECKING, Literal, Sequence
+
+import mido
+
+if TYPE_CHECKING:
+    from .midi_device import MidiDevice
+
+
+@dataclass
+class SysexDump:
+    """Declarative description of the SysEx bulk dump of a device.
+
+    The layout is the list of data bytes of the dump, each entry is either a
+    constant byte or a "section.parameter" reference whose 7bits value is taken
+    from the device state. When packet_size is set, the data are split in
+    several SysEx messages, each one wrapped with the header/footer (and its
+    checksum). For address based devices (e.g., Roland DT1), address is the
+    start address of the dump (7bits bytes, most significant first), it's put
+    after the header and advanced by the size of each packet; the Roland
+    checksum covers the address and the data. Messages are streamed with
+    chunk_delay_ms between them and, if handshake is set, waiting for an
+    inbound SysEx starting with these bytes.
+    """
+
+    header: Sequence[int]
+    layout: Sequence[int | str]
+    footer: Sequence[int] = ()
+    address: Sequence[int] = ()
+    checksum: Literal["none", "roland"] = "none"
+    packet_size: int | None = None
+    chunk_delay_ms: float = 20
+    handshake: Sequence[int] | None = None
+    handshake_timeout_ms: float = 500
+
+    @property
+    def parameters(self) -> list[str]:
+        return [entry for entry in self.layout if isinstance(entry, str)]
+
+    def encode(self, device: "MidiDevice", values: dict[str, int] | None = None):
+        """Returns the data bytes of the dump, values override the device state"""
+        values = values or {}
+        data = []
+        for entry in self.layout:
+            if isinstance(entry, str):
+                value = values.get(entry)
+                if value is None:
+                    section_name, parameter_name = entry.split(".")
+                    section = getattr(device.modules, section_name)
+                    value = getattr(section, parameter_name)
+                data.append(int(value) & 0x7F)
+            else:
+                data.append(entry & 0x7F)
+        return data
+
+    def messages(self, device: "MidiDevice", values: dict[str, int] | None = None):
+        data = self.encode(device, values)
+        size = self.packet_size or len(data) or 1
+        offsets = range(0, len(data), size) or [0]
+        messages = []
+        for offset in offsets:
+            body = [*self.address_at(offset), *data[offset : offset + size]]
+            messages.append(
+                mido.Message(
+                    "sysex",
+                    data=[*self.header, *body, *self._checksum(body), *self.footer],
+                )
+            )
+        return messages
+
+    def address_at(self, offset: int) -> list[int]:
+        """The address of the data at offset in the dump"""
+        if not self.address:
+            return []
+        value = 0
+        for byte in self.address:
+            value = (value << 7) | (byte & 0x7F)
+        value += offset
+        return [(value >> (7 * i)) & 0x7F for i in reversed(range(len(self.address)))]
+
+    def _checksum(self, body):
+        if self.checksum == "roland":
+            return [(128 - sum(body) % 128) % 128]
+        return []
+
+
+@dataclass
+class SysexTransfer:
+    messages: list[mido.Message]
+    chunk_delay_ms: float = 20
+    handshake: Sequence[int] | None = None
+    handshake_timeout_ms: float = 500
+    done: threading.Event = field(default_factory=threading.Event)
+    sent: int = 0
+    error: str | None = None
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class SysexStreamer(threading.Thread):
+    """Streams SysEx transfers for a device without blocking the neurons threads.
+
+    Transfers are sent one after the other, message by message, with a delay
+    between messages (or waiting for an acknowledgement from the device) to
+    avoid overflowing the buffers of the MIDI interfaces.
+    """
+
+    def __init__(self, device: "MidiDevice"):
+        super().__init__(daemon=True, name=f"SysexStreamer-{device.device_name}")
+        self.device = device
+        self.transfers: Queue[SysexTransfer | None] = Queue()
+        self.acks: Queue[list[int]] = Queue()
+        self._running = False
+        self._stopped = False
+        self.current: SysexTransfer | None = None
+
+    def submit(self, transfer: SysexTransfer):
+        if self._stopped:
+            transfer.error = "Streamer stopped"
+            transfer.done.set()
+            return transfer
+        if not self._running:
+            self._running = True
+            self.start()
+        self.transfers.put(transfer)
+        return transfer
+
+    def received(self, msg):
+        if self.current and self.current.handshake:
+            self.acks.put(list(msg.data))
+
+    def stop(self):
+        self._stopped = True
+        self._running = False
+        self.transfers.put(None)
+
+    def run(self):
+        while self._running:
+            transfer = self.transfers.get()
+            if transfer is None:
+                break
+            self.current = transfer
+            try:
+                self._stream(transfer)
+            except Exception as e:
+                transfer.error = str(e)
+                print(f"[SYSEX] Transfer to {self.device.device_name} failed: {e}")
+            finally:
+                self.current = None
+                transfer.done.set()
+
+    def _stream(self, transfer: SysexTransfer):
+        handshake = list(transfer.handshake) if transfer.handshake else None
+        while not self.acks.empty():
+            self.acks.get_nowait()
+        for i, msg in enumerate(transfer.messages):
+            if not self._running:
+                return
+            self.device.send(msg)
+            transfer.sent += 1
+            if i == len(transfer.messages) - 1:
+                break
+            if handshake is not None:
+                if not self._wait_ack(handshake, transfer.handshake_timeout_ms):
+                    transfer.error = f"No acknowledgement after message {i}"
+                    print(f"[SYSEX] {transfer.error}, transfer aborted")
+                    return
+            if transfer.chunk_delay_ms > 0:
+                time.sleep(transfer.chunk_delay_ms / 1000)
+
+    def _wait_ack(self, handshake, timeout_ms):
+        end = time.perf_counter() + timeout_ms / 1000
+        while True:
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                return False
+            try:
+                data = self.acks.get(timeout=remaining)
+            except Empty:
+                return False
+            if data[: len(handshake)] == handshake:
+                return True
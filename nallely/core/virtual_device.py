@@ -17,13 +17,16 @@ from ..utils import (
     round_cv_property,
     sup0_cv_property,
 )
+from .midi_clock import active_midi_clock
 from .parameter_instances import ParameterInstance
 from .scaler import Scaler
 from .world import (
     DeviceSerializer,
     ThreadContext,
     all_links,
+    cached_schema,
     get_all_virtual_parameters,
+    invalidate_schemas,
     no_registration,
     register_virtual_device_class,
     virtual_devices,
@@ -170,6 +173,16 @@ def on(
     return wrapper
 
 
+def event_time(ctx=None) -> float:
+    """Returns when the event carried by ctx happened (perf_counter time).
+
+    MIDI inputs stamp their context with the arrival time of the message, other
+    events fall back on the time they are processed.
+    """
+    timestamp = ctx.get("timestamp") if ctx else None
+    return timestamp if timestamp is not None else time.perf_counter()
+
+
 @dataclass
 class VRef(object):
     cls: Type
@@ -202,6 +215,9 @@ class VRef(object):
 
 class VirtualDevice(threading.Thread):
     _devices_count: dict[str, int] = defaultdict(int)
+    # Devices that react right away to their inputs can receive values ahead of
+    # time (clock lookahead), their outputs keep the deadline of the input
+    computes_ahead = False
     output_cv = VirtualParameter(name="output", range=(0, 127))
 
     # We use a consumer to bypass the input queue
@@ -358,6 +374,7 @@ class VirtualDevice(threading.Thread):
             self.__class__.output_cv = VirtualParameter(
                 name="output", range=(0, 127), hidden=True, cv_name="output_cv"
             )
+            invalidate_schemas()
 
     def setup(self) -> ThreadContext:
         return ThreadContext()
@@ -398,6 +415,9 @@ class VirtualDevice(threading.Thread):
             self.input_queues[param].put_nowait(
                 (value, previous, ctx or ThreadContext())
             )
+            if self.observers:
+                for observer in list(self.observers):
+                    observer.received(param, value, ctx)
         except Full:
             print(
                 f"Warning: input_queue full for {self.uid()}[{param}] — dropping message {value}"
@@ -903,8 +923,14 @@ class VirtualDevice(threading.Thread):
 
     @classmethod
     def schema_as_dict(cls):
-        virtual_parameters = cls.all_parameters()
-        return cls._schema_as_dict(cls.__name__, virtual_parameters, cls.__doc__)
+        # the schema is shared by all the snapshots, it must not be modified
+        return cached_schema(
+            cls,
+            "schema",
+            lambda: cls._schema_as_dict(
+                cls.__name__, cls.all_parameters(), cls.__doc__
+            ),
+        )
 
     @classmethod
     def _schema_as_dict(cls, name, parameters, doc):
@@ -922,7 +948,13 @@ class VirtualDevice(threading.Thread):
 
     @classmethod
     def all_parameters(cls) -> list[VirtualParameter]:
-        return list(get_all_virtual_parameters(cls).values())
+        return list(
+            cached_schema(
+                cls,
+                "parameters",
+                lambda: list(get_all_virtual_parameters(cls).values()),
+            )
+        )
 
     def current_preset(self, save_defaultvalues=True, **_):
         d = {}
@@ -1073,6 +1105,9 @@ class TimeBasedDevice(VirtualDevice):
         "sampling_rate", range=(0.001, None), default=50
     )
     auto_srate_cv = VirtualParameter("auto_srate", accepted_values=("ON", "OFF"))
+    clock_source_cv = VirtualParameter(
+        "clock_source", accepted_values=("internal", "midi"), default="internal"
+    )
 
     def __init__(
         self,
@@ -1093,6 +1128,7 @@ class TimeBasedDevice(VirtualDevice):
         self.last_sync_time = time.perf_counter()
         self.sync_intervals = deque(maxlen=self.window_size)
         self._subdiv = "1/1"
+        self.clock_source = "internal"
         super().__init__(target_cycle_time=1 / self._sampling_rate, **kwargs)
 
     @property
@@ -1140,7 +1176,7 @@ class TimeBasedDevice(VirtualDevice):
 
     @on(sync_cv, edge="rising")
     def on_sync(self, value, ctx):
-        now = time.perf_counter()
+        now = event_time(ctx)
 
         subdivision_factor = SUBDIVISIONS[self.subdiv]
 
@@ -1163,10 +1199,24 @@ class TimeBasedDevice(VirtualDevice):
         # print(f"Set freq={self.speed} for estimated bpm={ctx.sync_bpm}")
         self.last_sync_time = now
 
+    def midi_clock_t(self):
+        # t follows the position of the MIDI clock, None if there is no MIDI clock
+        source = active_midi_clock()
+        position = source.position() if source else None
+        if position is None:
+            return None
+        subdivision_factor = Decimal(SUBDIVISIONS[self.subdiv])
+        speed = Decimal(source.bpm / 60) * subdivision_factor
+        if abs(speed - self.speed) > Decimal("0.001"):
+            self.speed = speed
+        return (Decimal(position) * subdivision_factor + Decimal(self.phase)) % 1
+
     def main(self, ctx: ThreadContext):
-        # Compute t using measured time
-        elapsed = Decimal(time.perf_counter() - self.last_sync_time)
-        t = (self.speed * elapsed + Decimal(self.phase)) % 1
+        t = self.midi_clock_t() if self.clock_source == "midi" else None
+        if t is None:
+            # Compute t using measured time
+            elapsed = Decimal(time.perf_counter() - self.last_sync_time)
+            t = (self.speed * elapsed + Decimal(self.phase)) % 1
         generated_value = self.generate_value(t, ctx.ticks)
         ctx.ticks += 1
         ctx.t = t
@@ -2,8 +2,6 @@ import json
 from decimal import Decimal
 from typing import TYPE_CHECKING, Any, Callable, Type
 
-import mido
-
 if TYPE_CHECKING:
     from .links import Link
     from .midi_device import MidiDevice, ModulePadsOrKeys, ModuleParameter
@@ -15,6 +13,25 @@ virtual_devices: list["VirtualDevice"] = []
 connected_devices: list["MidiDevice"] = []
 midi_device_classes: list[Type] = []
 virtual_device_classes: dict[str, Type] = {}
+# bumped when device classes change at runtime, invalidates the cached schemas
+schema_generation = 0
+
+
+def invalidate_schemas():
+    global schema_generation
+    schema_generation += 1
+
+
+def cached_schema(cls, key: str, build: Callable[[], Any]):
+    """Returns the value cached on the class itself (not its parents) for key,
+    built again if the classes changed since it was cached"""
+    attribute = f"__{key}_cache__"
+    cached = cls.__dict__.get(attribute)
+    if cached is not None and cached[0] == schema_generation:
+        return cached[1]
+    value = build()
+    setattr(cls, attribute, (schema_generation, value))
+    return value
 
 
 def no_registration(cls):
@@ -164,8 +181,10 @@ class DeviceSerializer(json.JSONEncoder):
 
 class DeviceNotFound(Exception):
     def __init__(self, device_name):
+        from .midi_ports import midi_ports
+
         super().__init__(
             f"MIDI port {device_name!r} couldn't be found, known devices are:\n"
-            f"  input: {mido.get_output_names()}\n"  # type: ignore
-            f"  outputs: {mido.get_input_names()}"  # type: ignore
+            f"  input: {midi_ports.input_names()}\n"
+            f"  outputs: {midi_ports.output_names()}"
         )
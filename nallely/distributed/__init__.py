@@ -2,6 +2,7 @@ from functools import lru_cache
 
 from ..core import VirtualDevice
 from ..utils import generate_acronym, get_my_ip
+from .discovery import Peer, PeerBeacon, system_load
 from .remote_ws_connector import NallelyService, NallelyWebsocketBus
 
 NAME_LIMIT = 5
@@ -88,10 +89,20 @@ class NeuronExposer:
         for output in outputs:
             service.send(output.name, value)
 
+    def received(self, parameter, value, ctx):
+        # only the outputs are exposed
+        pass
+
     def dispose(self):
         self.neuron.unregister_observer(self)
         if self.service:
             self.service.dispose()
 
 
-__all__ = ["NallelyWebsocketBus", "NallelyService", "NeuronExposer"]
+__all__ = [
+    "NallelyWebsocketBus",
+    "NallelyService",
+    "NeuronExposer",
+    "Peer",
+    "PeerBeacon",
+]
@@ -0,0 +1,214 @@
+import json
+import os
+import select
+import socket
+import struct
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+BEACON_PORT = 6790
+BEACON_INTERVAL = 2.0
+# ioctl giving the broadcast address of an interface, on Linux
+SIOCGIFBRDADDR = 0x8919
+
+
+@dataclass
+class Peer:
+    id: str
+    ip: str
+    name: str
+    ports: dict[str, int]
+    load: float | None = None
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+def broadcast_addresses() -> list[str]:
+    """Broadcast address of each IPv4 network of the host (e.g: 192.168.1.255).
+
+    The interfaces are listed with psutil if it's installed, from the kernel
+    on Linux otherwise. Returns an empty list if they can't be listed.
+    """
+    try:
+        import psutil
+
+        return sorted(
+            {
+                address.broadcast
+                for addresses in psutil.net_if_addrs().values()
+                for address in addresses
+                if address.family == socket.AF_INET and address.broadcast
+            }
+        )
+    except ModuleNotFoundError:
+        ...
+    try:
+        import fcntl
+    except ModuleNotFoundError:
+        return []  # not on Windows
+    found = set()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        for _, name in socket.if_nameindex():
+            request = struct.pack("256s", name.encode()[:15])
+            try:
+                reply = fcntl.ioctl(s.fileno(), SIOCGIFBRDADDR, request)
+            except OSError:
+                continue  # no IPv4 address
+            address = socket.inet_ntoa(reply[20:24])
+            if address != "0.0.0.0":  # no broadcast, e.g: the loopback
+                found.add(address)
+    return sorted(found)
+
+
+def system_load() -> float | None:
+    try:
+        return round(os.getloadavg()[0] / (os.cpu_count() or 1), 2)
+    except (AttributeError, OSError):
+        return None  # not on Windows
+
+
+class PeerBeacon(threading.Thread):
+    """Announces this Nallely instance on the local network, and lists the others.
+
+    Every interval seconds a small JSON datagram (name, ports, load) is
+    broadcast on a UDP port every instance listens to (several instances of a
+    host share it). By default, it's sent to the broadcast address of each
+    network of the host: "<broadcast>" (255.255.255.255) only goes out by the
+    interface of the default route on most systems. The beacons received fill
+    the table of peers, a peer is forgotten when it didn't announce itself for
+    timeout seconds. A beacon is sent back when a new peer appears, so it knows
+    about us right away instead of at our next beacon. The instance sees its
+    own beacons: it's in its peers.
+    """
+
+    def __init__(
+        self,
+        announce: Callable[[], dict[str, Any]],
+        port=BEACON_PORT,
+        address="<broadcast>",
+        interval=BEACON_INTERVAL,
+        timeout: float | None = None,
+        on_change: Callable[[dict[str, Peer]], None] | None = None,
+    ):
+        super().__init__(daemon=True, name="NallelyBeacon")
+        self.announce = announce
+        self.port = port
+        self.address = address
+        self.interval = interval
+        self.timeout = timeout if timeout is not None else interval * 3
+        self.on_change = on_change
+        self.id = uuid.uuid4().hex
+        self.peers: dict[str, Peer] = {}
+        self.sent = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self.socket = self._open()
+        # wakes the thread up when it's stopped
+        self._wake_read, self._wake_write = socket.socketpair()
+
+    def _open(self):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        s.bind(("", self.port))
+        return s
+
+    def ensure_running(self):
+        if not self._running:
+            self._running = True
+            self.start()
+
+    def stop(self):
+        if not self._running:
+            self._close()
+            return
+        self._running = False
+        try:
+            self._wake_write.send(b"\0")
+        except OSError:
+            pass  # the thread was already leaving, and closed it
+
+    def _close(self):
+        self.socket.close()
+        self._wake_read.close()
+        self._wake_write.close()
+
+    def snapshot(self) -> dict[str, Peer]:
+        """The peers seen recently, by id"""
+        with self._lock:
+            return dict(self.peers)
+
+    def beacon(self) -> bytes:
+        return json.dumps({"nallely": self.id, **self.announce()}).encode()
+
+    def targets(self) -> list[str]:
+        if self.address != "<broadcast>":
+            return [self.address]
+        # listed at each beacon, the networks come and go (e.g: wifi)
+        return broadcast_addresses() or [self.address]
+
+    def send_beacon(self):
+        beacon = self.beacon()
+        for address in self.targets():
+            try:
+                self.socket.sendto(beacon, (address, self.port))
+                self.sent += 1
+            except OSError as e:
+                print(f"[Beacon] Couldn't announce on {address}:{self.port}: {e}")
+
+    def receive(self, data: bytes, ip: str) -> bool:
+        """Updates the table with a beacon, True if it's a new peer"""
+        try:
+            beacon = json.loads(data)
+            id = beacon["nallely"]
+            peer = Peer(
+                id=id,
+                ip=ip,
+                name=beacon.get("name") or ip,
+                ports=beacon.get("ports", {}),
+                load=beacon.get("load"),
+            )
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return False  # not a beacon
+        with self._lock:
+            new = id not in self.peers
+            self.peers[id] = peer
+        return new
+
+    def expire(self, now: float) -> bool:
+        with self._lock:
+            lost = [
+                id
+                for id, peer in self.peers.items()
+                if now - peer.last_seen > self.timeout
+            ]
+            for id in lost:
+                del self.peers[id]
+        return bool(lost)
+
+    def run(self):
+        next_beacon = 0.0
+        while self._running:
+            now = time.monotonic()
+            if now >= next_beacon:
+                self.send_beacon()
+                next_beacon = now + self.interval
+            changed = self.expire(now)
+            readable, _, _ = select.select(
+                [self.socket, self._wake_read], [], [], max(0.0, next_beacon - now)
+            )
+            if self.socket in readable and self._running:
+                try:
+                    data, (ip, _) = self.socket.recvfrom(4096)
+                except OSError:
+                    continue
+                if self.receive(data, ip):
+                    changed = True
+                    self.send_beacon()
+            if changed and self.on_change:
+                self.on_change(self.snapshot())
+        self._close()
@@ -3,7 +3,7 @@ import random
 from collections import deque
 
 from nallely import VirtualDevice, VirtualParameter, on
-from nallely.core.world import ThreadContext
+from nallely.core.world import ThreadContext, invalidate_schemas
 
 MAX_ABS = 1e6  # valeur max avant clamp
 
@@ -758,10 +758,14 @@ class Integrator(VirtualDevice):
     @property
     def range(self):
         if self.limits == "-1..1" or self.limits == "leakage":
-            self.input_cv.parameter.range = (-1.0, 1.0)
-            return (-1.0, 1.0)
-        self.input_cv.parameter.range = (None, None)
-        return (None, None)
+            range = (-1.0, 1.0)
+        else:
+            range = (None, None)
+        if self.input_cv.parameter.range != range:
+            # the schema of the class changes, it has to be built again
+            self.input_cv.parameter.range = range
+            invalidate_schemas()
+        return range
 
     def __post_init__(self, **kwargs):
         self.value = self.initial
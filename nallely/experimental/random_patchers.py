@@ -11,6 +11,7 @@ from nallely import (
     get_virtual_device_classes,
     virtual_devices,
 )
+from nallely.core.world import invalidate_schemas
 from nallely.trevor import TrevorAPI, TrevorBus
 
 
@@ -71,8 +72,12 @@ class RandomPatcher(VirtualDevice):
             "--",
             *(list(d.__class__.__name__ for d in all_devices())),
         ]
-        self.exclude_device_cv.parameter.accepted_values = accepted_values
-        self.exclude_device_cv.parameter.range = (0, len(accepted_values))
+        parameter = self.exclude_device_cv.parameter
+        if list(parameter.accepted_values) != accepted_values:
+            # the schema of the class changes, it has to be built again
+            parameter.accepted_values = accepted_values
+            parameter.range = (0, len(accepted_values))
+            invalidate_schemas()
 
         if self.trigger == 1:
             self.trigger = 0
@@ -92,7 +97,7 @@ class RandomPatcher(VirtualDevice):
             device.random_preset()
 
         encoded_parameters = [
-            f"{d}::{p.section_name}::{getattr(p, "cv_name", p.name)}"
+            f"{d}::{p.section_name}::{getattr(p, 'cv_name', p.name)}"
             for d, p in all_parameters
         ]
         inputs = [e for e in encoded_parameters if "output" not in e]
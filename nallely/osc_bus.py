@@ -7,7 +7,7 @@ from pythonosc.osc_server import ThreadingOSCUDPServer
 from pythonosc.udp_client import SimpleUDPClient
 
 from .core.virtual_device import VirtualDevice, VirtualParameter
-from .core.world import ThreadContext, no_registration
+from .core.world import ThreadContext, invalidate_schemas, no_registration
 from .websocket_bus import WebSocketBus
 
 # We monkey patch to make it polymorphic at the moment
@@ -49,6 +49,7 @@ class OSCBus(WebSocketBus):
         for key, value in list(self.__class__.__dict__.items()):
             if isinstance(value, VirtualParameter):
                 delattr(self.__class__, key)
+        invalidate_schemas()
         VirtualDevice.stop(self, clear_queues)
 
     def receiving(self, value, on, ctx: ThreadContext):
@@ -0,0 +1,253 @@
+import threading
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Callable, Hashable
+
+from websockets import ConnectionClosed, ConnectionClosedError
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+DEFLATE_WINDOW_BITS = 15
+DEFLATE_LEVEL = 6
+
+
+def deflate(window_bits=DEFLATE_WINDOW_BITS, level=DEFLATE_LEVEL):
+    """Extensions of the websocket servers negotiating permessage-deflate.
+
+    The states are repetitive JSON, the window of the server is larger than the
+    4KiB of websockets' default so the entries of a state (and the patches)
+    find the previous ones to refer to. The messages of the clients are small,
+    they keep a small window.
+    """
+    return [
+        ServerPerMessageDeflateFactory(
+            server_max_window_bits=window_bits,
+            client_max_window_bits=12,
+            compress_settings={"level": level, "memLevel": 5},
+        )
+    ]
+
+
+class ClientWriter(threading.Thread):
+    """Bounded outbound queue of a websocket client, drained by its own thread.
+
+    Control messages (states, commands, notifications) are never dropped, if
+    more than max_pending of them are waiting the client is too slow and it's
+    disconnected. Values are sent once the control messages are out: values
+    with a key are coalesced (only the last value of a key is sent), the others
+    are dropped oldest first when more than max_values are waiting.
+    """
+
+    def __init__(
+        self,
+        client,
+        name="client",
+        max_pending=1024,
+        max_values=256,
+        on_close: Callable[[Any, str], None] | None = None,
+    ):
+        super().__init__(daemon=True, name=f"ClientWriter-{name}")
+        self.client = client
+        self.max_pending = max_pending
+        self.max_values = max_values
+        self.on_close = on_close
+        self.control: deque = deque()
+        self.values: deque = deque(maxlen=max_values)
+        self.latest: OrderedDict[Hashable, Any] = OrderedDict()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.high_water = 0
+        self.closed = False
+        self.reason: str | None = None
+        self._condition = threading.Condition()
+
+    @property
+    def pending(self):
+        return len(self.control) + len(self.values) + len(self.latest)
+
+    def send(self, message):
+        """Queues a control message, returns False if the client is gone"""
+        with self._condition:
+            if self.closed:
+                return False
+            self.control.append(message)
+            if len(self.control) > self.max_pending:
+                self._disconnect("too slow")
+            self._queued()
+        return True
+
+    def send_value(
+        self,
+        message,
+        key: Hashable | None = None,
+        merge: Callable[[Any, Any], Any] | None = None,
+    ):
+        """Queues a value, replacing the pending value with the same key.
+
+        With merge, the pending value is replaced by merge(pending, message),
+        for values only carrying what changed since the previous one.
+        """
+        with self._condition:
+            if self.closed:
+                return False
+            if key is None:
+                if len(self.values) == self.max_values:
+                    self.dropped += 1
+                self.values.append(message)
+            elif key in self.latest:
+                self.coalesced += 1
+                pending = self.latest[key]
+                self.latest[key] = merge(pending, message) if merge else message
+            else:
+                if len(self.latest) >= self.max_values:
+                    self.latest.popitem(last=False)
+                    self.dropped += 1
+                self.latest[key] = message
+            self._queued()
+        return True
+
+    def discard_value(self, key: Hashable):
+        """Removes the pending value of a key, if any"""
+        with self._condition:
+            self.latest.pop(key, None)
+
+    def _queued(self):
+        self.high_water = max(self.high_water, self.pending)
+        self._wake()
+
+    def _wake(self):
+        self._condition.notify()
+
+    def _disconnect(self, reason):
+        self.reason = reason
+        self.closed = True
+        self._wake()
+
+    def stop(self):
+        with self._condition:
+            self.closed = True
+            self._wake()
+
+    def _next(self):
+        """Next message to send, called with the condition held"""
+        if self.control:
+            return self.control.popleft()
+        if self.latest:
+            return self.latest.popitem(last=False)[1]
+        return self.values.popleft()
+
+    def _failed(self, e: Exception, message):
+        if isinstance(e, (ConnectionClosed, TimeoutError)):
+            with self._condition:
+                self._disconnect(
+                    "crashed"
+                    if isinstance(e, (ConnectionClosedError, TimeoutError))
+                    else "disconnected"
+                )
+        else:
+            print(f"[{self.name}] Couldn't send {message!r:.80}: {e}")
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self.closed and not self.pending:
+                    self._condition.wait()
+                if self.closed:
+                    break
+                message = self._next()
+            try:
+                self.client.send(message)
+                self.sent += 1
+            except Exception as e:
+                self._failed(e, message)
+        self._finish()
+
+    def _finish(self):
+        with self._condition:
+            self.control.clear()
+            self.values.clear()
+            self.latest.clear()
+        if self.reason is None:
+            return
+        try:
+            self.client.close()
+        except Exception:
+            pass
+        if self.on_close:
+            self.on_close(self.client, self.reason)
+
+    def metrics(self):
+        return {
+            "pending": self.pending,
+            "control": len(self.control),
+            "values": len(self.values) + len(self.latest),
+            "high_water": self.high_water,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+class ClientWriters:
+    """Writers of the clients connected to a bus, created on first use"""
+
+    def __init__(
+        self, name, on_close: Callable[[Any, str], None] | None = None, **options
+    ):
+        self.name = name
+        self.on_close = on_close
+        self.options = options
+        self.writers: dict[Any, ClientWriter] = {}
+        # clients gone, a late broadcast must not give them a new writer
+        self.removed: weakref.WeakSet = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.writers)
+
+    def for_client(self, client) -> ClientWriter:
+        with self._lock:
+            writer = self.writers.get(client)
+            if writer is None and client in self.removed:
+                # the messages are dropped, as by the writer that was stopped
+                writer = ClientWriter(client, self.name)
+                writer.closed = True
+            elif writer is None:
+                # clients can come with their own kind of writer (e.g. asyncio)
+                writer_class = getattr(client, "writer_class", ClientWriter)
+                writer = writer_class(
+                    client, self.name, on_close=self._closed, **self.options
+                )
+                self.writers[client] = writer
+                writer.start()
+            return writer
+
+    def _closed(self, client, reason):
+        with self._lock:
+            self.writers.pop(client, None)
+            self.removed.add(client)
+        if self.on_close:
+            self.on_close(client, reason)
+
+    def remove(self, client):
+        with self._lock:
+            writer = self.writers.pop(client, None)
+            self.removed.add(client)
+        if writer:
+            writer.stop()
+
+    def clear(self):
+        with self._lock:
+            writers = list(self.writers.values())
+            self.removed.update(self.writers)
+            self.writers.clear()
+        for writer in writers:
+            writer.stop()
+
+    def metrics(self):
+        with self._lock:
+            writers = list(self.writers.items())
+        return {
+            str(getattr(client, "remote_address", None) or id(client)): writer.metrics()
+            for client, writer in writers
+        }
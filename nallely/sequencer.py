@@ -43,6 +43,8 @@ class Sequencer(VirtualDevice):
     category: sequencer
     """
 
+    computes_ahead = True
+
     trigger_cv = VirtualParameter(
         name="trigger", range=(0.0, 1.0), conversion_policy=">0"
     )
@@ -171,6 +173,8 @@ class Sequencer8(VirtualDevice):
     category: sequencer
     """
 
+    computes_ahead = True
+
     input_cv = VirtualParameter(name="input", range=(0.0, 127.0))
     write_cv = VirtualParameter(name="write", range=(0.0, 1.0), conversion_policy=">0")
     prev_edit_step_cv = VirtualParameter(
@@ -412,6 +416,8 @@ class EuclidianSequencer(VirtualDevice):
     meta: disable default output
     """
 
+    computes_ahead = True
+
     clock_cv = VirtualParameter(name="clock", range=(0, 1), conversion_policy=">0")
     length_cv = VirtualParameter(
         name="length", range=(0, 128), conversion_policy="round", default=8
@@ -10,7 +10,6 @@ from inspect import getmodule
 from pathlib import Path
 from typing import Type
 
-import mido
 from dulwich import porcelain
 from dulwich.notes import get_note_path
 from dulwich.repo import Repo
@@ -23,9 +22,11 @@ from ..core import (
     connected_devices,
     get_virtual_device_classes,
     midi_device_classes,
+    midi_ports,
     virtual_devices,
 )
 from ..core.world import (
+    invalidate_schemas,
     register_virtual_device_class,
     unregister_virtual_device_class,
     virtual_device_classes,
@@ -34,7 +35,13 @@ from ..newmodule import create_class
 from ..osc_bus import OSCBus
 from ..trevor import TrevorAPI
 from ..trevor.meta_trevor_api import MetaTrevorAPI
-from ..utils import StateEncoder, find_class, load_modules, longest_common_substring
+from ..utils import (
+    StateEncoder,
+    compile_cached,
+    find_class,
+    load_modules,
+    longest_common_substring,
+)
 from ..websocket_bus import WebSocketBus
 from .metadata import SessionMetadata
 from .utils import address2path, universe_path
@@ -388,21 +395,14 @@ playground_code={infos["playground_code"]}
                     continue
                 vdevs.extend(dev)
 
+        # ports are enumerated in background by the registry, which also takes
+        # care of reconnecting the devices when a port comes back
         midi_inputs = [
-            name
-            for name in mido.get_input_names()  # type: ignore type issue with mido
-            if "RtMidi" not in name
+            name for name in midi_ports.input_names() if "RtMidi" not in name
         ]
         midi_outputs = [
-            name
-            for name in mido.get_output_names()  # type: ignore type issue with mido
-            if "RtMidi" not in name
+            name for name in midi_ports.output_names() if "RtMidi" not in name
         ]
-        for device in connected_devices:
-            if device.should_reconnect_output(midi_outputs):
-                device.reconnect_output(exact=True)
-            if device.should_reconnect_input(midi_inputs):
-                device.reconnect_input(exact=True)
 
         return {
             "input_ports": midi_inputs,
@@ -550,7 +550,7 @@ original_file={read_from}
             )
             device_name = f"t_{device_name}"
         filename = filename if filename else f"<mem {device_name}>"
-        co = compile(device_code, filename=filename, mode="exec")
+        co = compile_cached(device_code, filename)
         env = env if env else {}
 
         import nallely
@@ -584,6 +584,7 @@ original_file={read_from}
         except AttributeError:
             ...
         globals()[device_name] = cls
+        invalidate_schemas()
         return cls
 
     def create_new_vdev(self, name, setup_callback=None):
@@ -1,10 +1,13 @@
 import bisect
 import math
 import random
+import time
 from decimal import Decimal
 
+from .core.mpe import MPE_EXPRESSIONS
 from .core.scaler import Scaler
-from .core.virtual_device import VirtualDevice, VirtualParameter, on
+from .core.virtual_device import VirtualDevice, VirtualParameter, event_time, on
+from .core.world import ThreadContext
 
 
 class PitchShifter(VirtualDevice):
@@ -84,6 +87,8 @@ class Arpegiator(VirtualDevice):
         "direction", accepted_values=("free", "up", "down", "up-down", "random")
     )
     reset_cv = VirtualParameter("reset", range=(0, 1))
+    # number of steps computed before they are due (0 = off)
+    lookahead_cv = VirtualParameter("lookahead", range=(0, 32), default=0)
 
     @property
     def range(self):
@@ -97,25 +102,38 @@ class Arpegiator(VirtualDevice):
         self.direction = "free"
         self._incr = +1
         self.bpm = 320
+        self.lookahead = 0
+        self.next_step_time = None
         super().__init__(**kwargs)
 
+    def output_on_step(self, value, ctx):
+        """Sends the value at the time of the next step if it's ahead, else returns it"""
+        deadline = self.next_step_time
+        if deadline is None or deadline <= time.perf_counter():
+            return value
+        step_ctx = ThreadContext({"last_values": ctx.last_values, "deadline": deadline})
+        self.send_out(
+            value, step_ctx, selected_outputs=[self.output_cv], from_="_default_idle"
+        )
+        return None
+
     @on(reset_cv, edge="rising")
     def on_reset(self, value, ctx):
         self.notes.clear()
-        return 0
+        return self.output_on_step(0, ctx)
 
     @on(input_cv, edge="any")
     def on_input(self, value, ctx):
         if value == 0:
             self.notes.clear()
-            return 0
+            return self.output_on_step(0, ctx)
         if value in self.notes:
             self.notes.remove(value)
             if len(self.notes) == 0:
-                return 0
+                return self.output_on_step(0, ctx)
         else:
             self.notes.append(value)
-            return value
+            return self.output_on_step(value, ctx)
 
     def main(self, ctx):
         if len(self.notes) == 0:
@@ -134,8 +152,24 @@ class Arpegiator(VirtualDevice):
             self.index = 0
             self._incr = 1
 
-        yield sorted_notes[self.index]
-        yield from self.sleep(60_000 / self.bpm)
+        lookahead = int(self.lookahead)
+        if lookahead > 0:
+            # the step is computed ahead, its MIDI messages are scheduled on time
+            step_s = 60 / self.bpm
+            now = time.perf_counter()
+            if self.next_step_time is None or self.next_step_time < now:
+                self.next_step_time = now
+            note = self.output_on_step(sorted_notes[self.index], ctx)
+            if note is not None:
+                yield note
+            self.next_step_time += step_s
+            delay = self.next_step_time - lookahead * step_s - time.perf_counter()
+            if delay > 0:
+                yield from self.sleep(delay * 1000, consider_target_time=False)
+        else:
+            self.next_step_time = None
+            yield sorted_notes[self.index]
+            yield from self.sleep(60_000 / self.bpm)
 
         if self.direction == "up":
             self.index += 1
@@ -221,7 +255,7 @@ class Looper(VirtualDevice):
         self.recording = True
         self.playing = False
         self.loop.clear()
-        self.loop_start = self.current_time_ms()
+        self.loop_start = self.current_time_ms(ctx)
         self.current_index = 0
 
     @on(record_cv, edge="falling")
@@ -229,7 +263,7 @@ class Looper(VirtualDevice):
         if self.debug:
             print("+ STOP RECORDING")
         self.recording = False
-        now = self.current_time_ms()
+        now = self.current_time_ms(ctx)
 
         if self.loop:
             self.loop_duration = now - self.loop_start
@@ -265,9 +299,9 @@ class Looper(VirtualDevice):
             return
 
         if len(self.loop) == 0:
-            self.loop_start = self.current_time_ms()
+            self.loop_start = self.current_time_ms(ctx)
 
-        timestamp = self.current_time_ms() - self.loop_start
+        timestamp = self.current_time_ms(ctx) - self.loop_start
 
         if value in self.active_notes:
             channel = self.active_notes[value]
@@ -295,10 +329,9 @@ class Looper(VirtualDevice):
         if self.debug:
             print(f"  NOTE ON {value=} assigned to {channel=} at {timestamp}ms")
 
-    def current_time_ms(self):
-        import time
-
-        return int(time.monotonic() * 1000)
+    def current_time_ms(self, ctx=None):
+        # we use the time of the event when we have it, not the time we process it
+        return int(event_time(ctx) * 1000)
 
     def main(self, ctx):
         if self._stopping:
@@ -812,6 +845,9 @@ class VoiceAllocator(VirtualDevice):
 
     @on(input_cv, edge="any")
     def on_input_any(self, value, ctx):
+        if ctx.get("type") in MPE_EXPRESSIONS:
+            # MPE per-voice expressions, the voices are only allocated on notes
+            return
         raw_value = ctx.raw_value
         if raw_value in self.allocated:
             # if one of the voice already has the value (note off)
@@ -0,0 +1,178 @@
+import asyncio
+import queue
+import threading
+import traceback
+from typing import TYPE_CHECKING
+
+from websockets import ConnectionClosed
+from websockets.asyncio.server import ServerConnection, serve
+
+from ..outbound import ClientWriter
+
+if TYPE_CHECKING:
+    from .trevor_bus import TrevorBus
+
+
+class AsyncClientWriter(ClientWriter):
+    """Outbound queue of an asyncio client, drained by a task of the event loop.
+
+    The queue policies are the ones of ClientWriter, only the draining changes:
+    sends are awaited on the loop instead of blocking a thread per client.
+    """
+
+    def __init__(self, client: "AsyncClient", *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self.loop = client.loop
+        self._event = asyncio.Event()
+
+    def start(self):
+        self.loop.call_soon_threadsafe(self.loop.create_task, self.drain())
+
+    def _wake(self):
+        self.loop.call_soon_threadsafe(self._event.set)
+
+    async def drain(self):
+        connection = self.client.connection
+        while True:
+            await self._event.wait()
+            self._event.clear()
+            while True:
+                with self._condition:
+                    if self.closed or not self.pending:
+                        break
+                    message = self._next()
+                try:
+                    await connection.send(message)
+                    self.sent += 1
+                except Exception as e:
+                    self._failed(e, message)
+            if self.closed:
+                break
+        # _finish() closes the connection and calls back the bus from a thread
+        await asyncio.to_thread(self._finish)
+
+
+class AsyncClient:
+    """Client of the asyncio server, seen by the bus as a websocket client"""
+
+    writer_class = AsyncClientWriter
+
+    def __init__(self, connection: ServerConnection, loop):
+        self.connection = connection
+        self.loop = loop
+        self.request = connection.request
+        self.remote_address = connection.remote_address
+
+    def send(self, message):
+        asyncio.run_coroutine_threadsafe(self.connection.send(message), self.loop)
+
+    def close(self, code=1000, reason=""):
+        asyncio.run_coroutine_threadsafe(self.connection.close(code, reason), self.loop)
+
+    def __repr__(self):
+        return f"<AsyncClient {self.remote_address}>"
+
+
+class AsyncTrevorServer:
+    """Trevor websocket server running all the connections on one event loop.
+
+    The loop only reads and writes the sockets. The commands (connections,
+    messages, disconnections) are handed to a single worker thread through a
+    queue, which is the only thread touching the session. At most queue_size
+    commands can wait in the queue, when it's full the loop stops reading the
+    sockets until the worker frees a slot (first come, first served).
+    """
+
+    def __init__(
+        self,
+        bus: "TrevorBus",
+        host="0.0.0.0",
+        port=6788,
+        queue_size=256,
+        extensions=None,
+    ):
+        self.bus = bus
+        self.host = host
+        self.port = port
+        self.extensions = extensions
+        self.queue_size = queue_size
+        self.commands: queue.SimpleQueue[tuple | None] = queue.SimpleQueue()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.worker = threading.Thread(
+            target=self._process_commands, daemon=True, name="TrevorCommands"
+        )
+        self._stop: asyncio.Event | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self.ready = threading.Event()
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    def shutdown(self):
+        if self.loop and self._stop:
+            self.loop.call_soon_threadsafe(self._stop.set)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self.worker.start()
+        try:
+            async with serve(
+                self._handler,
+                self.host,
+                self.port,
+                compression=None,
+                extensions=self.extensions,
+            ):
+                self.ready.set()
+                await self._stop.wait()
+        finally:
+            self.commands.put(None)
+
+    async def _submit(self, command):
+        # backpressure, the client isn't read while there is no free slot
+        await self._slots.acquire()  # type: ignore
+        self.commands.put(command)
+
+    async def _handler(self, connection: ServerConnection):
+        client = AsyncClient(connection, self.loop)
+        await self._submit(("connect", client, None))
+        try:
+            async for message in connection:
+                await self._submit(("message", client, message))
+        except ConnectionClosed:
+            pass
+        finally:
+            await self._submit(("disconnect", client, None))
+
+    def _release(self, count):
+        for _ in range(count):
+            self._slots.release()  # type: ignore
+
+    def _process_commands(self):
+        while True:
+            # the commands are taken by batch, so the slots are released (and
+            # the loop woken up) once per batch instead of once per command
+            batch = [self.commands.get()]
+            while len(batch) < self.queue_size:
+                try:
+                    batch.append(self.commands.get_nowait())
+                except queue.Empty:
+                    break
+            for command in batch:
+                if command is None:
+                    return
+                self._process(*command)
+            self.loop.call_soon_threadsafe(self._release, len(batch))  # type: ignore
+
+    def _process(self, kind, client, message):
+        try:
+            if kind == "message":
+                self.bus.handleMessage(client, message)
+            elif kind == "connect":
+                self.bus.client_connected(client)
+            else:
+                self.bus.client_disconnected(client)
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,57 @@
+import threading
+import time
+import traceback
+from typing import Callable
+
+
+class UpdateBroadcaster(threading.Thread):
+    """Coalesces state update requests and sends at most one per frame.
+
+    mark_dirty() only flags the state as changed, the broadcaster thread calls
+    send() at most once every interval seconds. A request arriving while an
+    update is being built triggers another one, so the last state is always
+    delivered.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[], None],
+        interval: float = 1 / 30,
+        name="TrevorUpdateBroadcaster",
+    ):
+        super().__init__(daemon=True, name=name)
+        self.send = send
+        self.interval = interval
+        self.sent = 0
+        self._dirty = threading.Event()
+        self._running = False
+
+    def ensure_running(self):
+        if not self._running:
+            self._running = True
+            self.start()
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    def stop(self):
+        self._running = False
+        self._dirty.set()
+
+    def run(self):
+        next_time = 0.0
+        while True:
+            self._dirty.wait()
+            if not self._running:
+                break
+            remaining = next_time - time.perf_counter()
+            if remaining > 0:
+                # more requests can arrive meanwhile, they're sent together
+                time.sleep(remaining)
+            self._dirty.clear()
+            try:
+                self.send()
+            except Exception:
+                traceback.print_exc()
+            self.sent += 1
+            next_time = time.perf_counter() + self.interval
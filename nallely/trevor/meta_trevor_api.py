@@ -1,7 +1,8 @@
 import inspect
 from collections import ChainMap
 
-from ..utils import get_source
+from ..core.world import invalidate_schemas
+from ..utils import compile_cached, get_source
 
 
 class MetaTrevorAPI:
@@ -35,22 +36,26 @@ class MetaTrevorAPI:
         }
 
     def compile_inject(self, device, method_name: str, method_code: str):
-        filename = f"<mem {device.__class__.__name__}>"
+        cls = device.__class__
+        current = cls.__dict__.get(method_name)
+        if getattr(current, "__source__", None) == method_code:
+            return  # already this code
+        filename = f"<mem {cls.__name__}>"
 
-        bytecode = compile(
-            source=method_code.replace(
-                "super()", f"super({device.__class__.__name__}, self)"
-            ),
-            filename=filename,
-            mode="exec",
+        bytecode = compile_cached(
+            method_code.replace("super()", f"super({cls.__name__}, self)"),
+            filename,
         )
         ctx_copy = ChainMap(self.exec_context)
 
         glob = device.__class__.__env__
         exec(bytecode, glob, ctx_copy)
         compiled_method = ctx_copy[method_name]
-        setattr(device.__class__, method_name, compiled_method)
+        setattr(cls, method_name, compiled_method)
         compiled_method.__source__ = method_code
+        # the class isn't its compiled code anymore
+        cls.__compiled_from__ = None
+        invalidate_schemas()
 
     def object_centric_compile_inject(
         self,
@@ -84,6 +89,11 @@ class MetaTrevorAPI:
             replace_name = device_name
             final_code = class_code
 
+        if not filename and current_cls.__dict__.get("__compiled_from__") == final_code:
+            # the same patch applied again (e.g., on reconnect), the device
+            # keeps running with its current class instead of being migrated
+            print(f"[META] {device_name} didn't change, nothing to compile")
+            return
         env = inspect.getmodule(current_cls)
         print(f"[META] Compiling first version of {device_name} considering {filename}")
         cls = self.session.compile_device(
@@ -110,7 +120,10 @@ class MetaTrevorAPI:
             cls.__tmp__ = (
                 tmp_class if tmp_class else {"name": current_cls, "path": current_path}
             )
+            cls.__compiled_from__ = final_code
         self.session.migrate_instance(device, cls, temporary=True)
+        # the class could have been renamed after its compilation
+        invalidate_schemas()
 
     def compile_save_new_class(
         self, device, class_code: str, force_name: str | None = None, commit=False
@@ -0,0 +1,50 @@
+DEVICE_LISTS = ("midi_devices", "virtual_devices")
+
+
+class SchemaTable:
+    """Class schemas of a state, sent once per class instead of once per device.
+
+    Device entries lose their "meta" for a "class" and a "schema_version"
+    referring to state["schemas"][class][version]. A class keeps its version
+    while its schema stays the same, a hot-patched class gets a new one (the
+    instances of the previous class keep referring to the previous version).
+    Proxies of external services keep their own schema inline.
+    """
+
+    def __init__(self):
+        # class name -> [(schema, version)], of the schemas seen in the last state
+        self.versions: dict[str, list[tuple[dict, int]]] = {}
+
+    def version(self, schema: dict) -> int:
+        known = self.versions.setdefault(schema["name"], [])
+        for i, (known_schema, version) in enumerate(known):
+            if known_schema is schema:
+                return version
+            if known_schema == schema:
+                # rebuilt after an invalidation, but nothing changed
+                known[i] = (schema, version)
+                return version
+        version = max((version for _, version in known), default=0) + 1
+        known.append((schema, version))
+        return version
+
+    def normalize(self, state: dict) -> dict:
+        """Moves the schemas of the devices of the state in its schemas table"""
+        schemas: dict[str, dict[str, dict]] = {}
+        for key in DEVICE_LISTS:
+            for device in state.get(key, []):
+                if device.get("proxy") or "meta" not in device:
+                    continue
+                schema = device.pop("meta")
+                version = self.version(schema)
+                device["class"] = schema["name"]
+                device["schema_version"] = version
+                schemas.setdefault(schema["name"], {})[str(version)] = schema
+        # versions not used anymore are forgotten
+        self.versions = {
+            name: [entry for entry in known if str(entry[1]) in schemas.get(name, {})]
+            for name, known in self.versions.items()
+            if name in schemas
+        }
+        state["schemas"] = schemas
+        return state
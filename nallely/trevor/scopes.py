@@ -0,0 +1,267 @@
+import itertools
+import struct
+import threading
+import time
+from typing import Any, Callable, Literal
+
+DECIMATION_MODES = ("last", "minmax", "mean")
+SCOPE_FRAME = 2
+MAX_RATE = 1000
+_HEADER = struct.Struct("<BH")
+_ENTRY = struct.Struct("<Hff")
+
+
+def encode_scope_frame(entries: list[tuple[int, float, float]]) -> bytes:
+    """Binary frame: type (u8), count (u16), then count times id (u16) + low (f32) + high (f32)"""
+    frame = bytearray(_HEADER.size + _ENTRY.size * len(entries))
+    _HEADER.pack_into(frame, 0, SCOPE_FRAME, len(entries))
+    offset = _HEADER.size
+    for entry in entries:
+        _ENTRY.pack_into(frame, offset, *entry)
+        offset += _ENTRY.size
+    return bytes(frame)
+
+
+def decode_scope_frame(frame: bytes) -> list[tuple[int, float, float]]:
+    _, count = _HEADER.unpack_from(frame)
+    return [
+        _ENTRY.unpack_from(frame, _HEADER.size + i * _ENTRY.size) for i in range(count)
+    ]
+
+
+class ScopeSubscription:
+    """Aggregates the values of a parameter between two frames.
+
+    Depending on the mode, a frame carries the last value, the min/max envelope
+    or the mean of the values received since the previous frame (low and high
+    are the same value for "last" and "mean").
+    """
+
+    __slots__ = (
+        "id",
+        "client",
+        "device_id",
+        "parameter",
+        "mode",
+        "interval",
+        "next_time",
+        "count",
+        "total",
+        "low",
+        "high",
+        "last",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        client: Any,
+        device_id: int,
+        parameter: str,
+        rate: float = 30,
+        mode: Literal["last", "minmax", "mean"] = "last",
+    ):
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f"Unknown decimation mode {mode!r}")
+        self.id = id
+        self.client = client
+        self.device_id = device_id
+        self.parameter = parameter
+        self.mode = mode
+        self.interval = 1 / max(0.1, min(MAX_RATE, rate))
+        self.next_time = time.perf_counter() + self.interval
+        self.count = 0
+        self.total = 0.0
+        self.low = self.high = self.last = 0.0
+
+    def add(self, value: float):
+        self.last = value
+        if self.count == 0:
+            self.low = self.high = self.total = value
+        else:
+            self.total += value
+            if value < self.low:
+                self.low = value
+            elif value > self.high:
+                self.high = value
+        self.count += 1
+
+    def take(self) -> tuple[int, float, float] | None:
+        """Aggregated values since the last call, None if nothing was received"""
+        if self.count == 0:
+            return None
+        if self.mode == "minmax":
+            entry = (self.id, self.low, self.high)
+        elif self.mode == "mean":
+            mean = self.total / self.count
+            entry = (self.id, mean, mean)
+        else:
+            entry = (self.id, self.last, self.last)
+        self.count = 0
+        return entry
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "device_id": self.device_id,
+            "parameter": self.parameter,
+            "mode": self.mode,
+            "rate": 1 / self.interval,
+        }
+
+
+class ScopeHub(threading.Thread):
+    """Subscriptions of the clients to parameters values, sent at their own rate.
+
+    Values are fed from the hot path only for the watched devices (a device is
+    watched as long as one subscription targets it), and only aggregated there.
+    The hub thread sends, for each client, one frame with the subscriptions that
+    are due, and sleeps when there is no subscription.
+    """
+
+    def __init__(
+        self,
+        send_frame: Callable[[Any, bytes], None],
+        on_watch: Callable[[int, bool], None] | None = None,
+    ):
+        super().__init__(daemon=True, name="TrevorScopes")
+        self.send_frame = send_frame
+        self.on_watch = on_watch
+        self.subscriptions: dict[int, ScopeSubscription] = {}
+        # device id -> parameter -> subscriptions, read from the hot path
+        self.watched: dict[int, dict[str, list[ScopeSubscription]]] = {}
+        self._ids = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+
+    def ensure_running(self):
+        if not self._running:
+            self._running = True
+            self.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    def subscribe(self, client, device_id, parameter, rate=30, mode="last"):
+        device_id = int(device_id)
+        with self._condition:
+            subscription = ScopeSubscription(
+                self._next_id(), client, device_id, parameter, rate, mode
+            )
+            self.subscriptions[subscription.id] = subscription
+            parameters = self.watched.get(device_id)
+            first = parameters is None
+            parameters = dict(parameters or {})
+            parameters[parameter] = [*parameters.get(parameter, []), subscription]
+            self.watched[device_id] = parameters
+            self._condition.notify()
+        if first and self.on_watch:
+            self.on_watch(device_id, True)
+        return subscription
+
+    def _next_id(self):
+        """Next id not in use, ids are u16 in the frames and 0 is never used"""
+        if len(self.subscriptions) >= 0xFFFF:
+            raise ValueError("too many scopes")
+        while True:
+            id = next(self._ids) % 0xFFFF + 1
+            if id not in self.subscriptions:
+                return id
+
+    def unsubscribe(self, subscription_id, client=None):
+        with self._condition:
+            subscription = self.subscriptions.get(subscription_id)
+            if subscription is None or (client and subscription.client is not client):
+                return None
+            del self.subscriptions[subscription_id]
+            parameters = dict(self.watched[subscription.device_id])
+            remaining = [
+                s for s in parameters[subscription.parameter] if s is not subscription
+            ]
+            if remaining:
+                parameters[subscription.parameter] = remaining
+            else:
+                del parameters[subscription.parameter]
+            last = not parameters
+            if last:
+                del self.watched[subscription.device_id]
+            else:
+                self.watched[subscription.device_id] = parameters
+        if last and self.on_watch:
+            self.on_watch(subscription.device_id, False)
+        return subscription
+
+    def remove_client(self, client):
+        for subscription in list(self.subscriptions.values()):
+            if subscription.client is client:
+                self.unsubscribe(subscription.id)
+
+    def remove_device(self, device_id):
+        for subscription in list(self.subscriptions.values()):
+            if subscription.device_id == device_id:
+                self.unsubscribe(subscription.id)
+
+    def feed(self, device_id: int, parameter: str, value):
+        parameters = self.watched.get(device_id)
+        if not parameters:
+            return
+        subscriptions = parameters.get(parameter)
+        if not subscriptions:
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        for subscription in subscriptions:
+            subscription.add(value)
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._running and not self.subscriptions:
+                    self._condition.wait()
+                if not self._running:
+                    break
+                now = time.perf_counter()
+                frames: dict[Any, list] = {}
+                next_time = now + 1
+                for subscription in self.subscriptions.values():
+                    if subscription.next_time <= now:
+                        subscription.next_time += subscription.interval
+                        if subscription.next_time <= now:
+                            # we are late, no need to catch up
+                            subscription.next_time = now + subscription.interval
+                        entry = subscription.take()
+                        if entry is not None:
+                            frames.setdefault(subscription.client, []).append(entry)
+                    next_time = min(next_time, subscription.next_time)
+            for client, entries in frames.items():
+                try:
+                    self.send_frame(client, encode_scope_frame(entries))
+                except Exception as e:
+                    print(f"[SCOPES] Couldn't send frame to {client}: {e}")
+            with self._condition:
+                remaining = next_time - time.perf_counter()
+                if remaining > 0 and self._running:
+                    self._condition.wait(remaining)
+
+
+class ScopeObserver:
+    """Feeds the input and output values of a watched virtual device to the hub"""
+
+    def __init__(self, hub: ScopeHub, device):
+        self.hub = hub
+        self.device = device
+
+    def triggered(self, value, ctx, outputs, from_):
+        for output in outputs or ():
+            self.hub.feed(self.device.uuid, output.name, value)
+
+    def received(self, parameter, value, ctx):
+        self.hub.feed(self.device.uuid, parameter, value)
+
+    def dispose(self):
+        self.device.unregister_observer(self)
+        self.hub.remove_device(self.device.uuid)
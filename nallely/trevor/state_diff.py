@@ -0,0 +1,165 @@
+import threading
+from typing import Any
+
+from ..utils import from_json, to_json
+
+
+def escape(key) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def diff(old, new, path="", ops=None) -> list[dict]:
+    """Computes JSON-patch (RFC 6902) operations turning old into new.
+
+    Dicts are compared key by key, lists index by index (items are added or
+    removed at the end), everything else is replaced when it changed.
+    """
+    if ops is None:
+        ops = []
+    if old is new:
+        # an item reused by VersionedState, it didn't change
+        return ops
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{escape(key)}"})
+        for key, value in new.items():
+            key_path = f"{path}/{escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": key_path, "value": value})
+            else:
+                diff(old[key], value, key_path, ops)
+    elif isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for i in range(common):
+            diff(old[i], new[i], f"{path}/{i}", ops)
+        for i in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+        for i in reversed(range(common, len(old))):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+    elif type(old) is not type(new) or old != new:
+        ops.append({"op": "replace", "path": path, "value": new})
+    return ops
+
+
+_MISSING = object()
+
+
+class VersionedState:
+    """Last state sent to the clients, with its version.
+
+    update() computes the patch from the last state to the new one and bumps the
+    version, clients apply the patches in order and ask for a resync if the
+    base version of a patch is not the one they have.
+
+    The items of the top-level lists and dicts of the state (a device, a link,
+    the schemas of a class) are kept with their JSON: an item which didn't
+    change is the same object in the next state, diff() skips it right away
+    and encode() splices its JSON instead of encoding it again.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.state = None
+        self.lock = threading.RLock()
+        # JSON of the items of the last state -> item, and id of an item -> JSON
+        self.items: dict[str, Any] = {}
+        self.encoded: dict[int, str] = {}
+
+    def normalize(self, state) -> tuple[dict, dict[str, Any], dict[int, str]]:
+        """The state as the clients will see it once decoded, with its items.
+
+        Each item is first compared (==) with the item at the same place in the
+        last state, only the ones that changed are encoded: a value equal in
+        Python (1, 1.0, True) keeps its previous JSON. The items whose JSON
+        didn't change since the last state are reused.
+        """
+        previous = self.state or {}
+        items, encoded = {}, {}
+
+        def item(value, old=None):
+            data = self.encoded.get(id(old))
+            if data is not None and old == value:
+                if data not in items:
+                    items[data] = old
+                    encoded[id(old)] = data
+                return items[data]
+            data = to_json(value)
+            if data not in items:
+                if data in self.items:
+                    items[data] = self.items[data]
+                else:
+                    items[data] = from_json(data)
+                encoded[id(items[data])] = data
+            return items[data]
+
+        normalized = {}
+        for key, value in state.items():
+            old = previous.get(key, _MISSING)
+            if isinstance(value, (list, tuple)):
+                if not isinstance(old, list):
+                    old = []
+                normalized[key] = [
+                    item(v, old[i] if i < len(old) else None)
+                    for i, v in enumerate(value)
+                ]
+            elif isinstance(value, dict) and all(isinstance(k, str) for k in value):
+                if not isinstance(old, dict):
+                    old = {}
+                normalized[key] = {k: item(v, old.get(k)) for k, v in value.items()}
+            elif old is not _MISSING and old == value:
+                normalized[key] = old
+            else:
+                normalized[key] = from_json(to_json(value))
+        return normalized, items, encoded
+
+    def _set(self, normalized):
+        self.state, self.items, self.encoded = normalized
+        self.version += 1
+
+    def full(self, state=None):
+        """Full state message, from a new state or the last state sent"""
+        with self.lock:
+            if state is not None:
+                self._set(self.normalize(state))
+            return {**(self.state or {}), "version": self.version}
+
+    def update(self, state):
+        """Patch message from the last state to this one, None if nothing changed"""
+        with self.lock:
+            normalized = self.normalize(state)
+            if self.state is None:
+                self._set(normalized)
+                return None
+            ops = diff(self.state, normalized[0])
+            if not ops:
+                return None
+            self._set(normalized)
+            return {
+                "command": "state_patch",
+                "base": self.version - 1,
+                "version": self.version,
+                "patch": ops,
+            }
+
+    def encode(self, message: dict) -> str:
+        """JSON of a message built from the last state, e.g. full()"""
+        with self.lock:
+            fragments = []
+            for key, value in message.items():
+                if isinstance(value, list):
+                    data = ",".join(self._fragment(v) for v in value)
+                    data = f"[{data}]"
+                elif isinstance(value, dict):
+                    data = ",".join(
+                        f"{to_json(k)}:{self._fragment(v)}" for k, v in value.items()
+                    )
+                    data = f"{{{data}}}"
+                else:
+                    data = to_json(value)
+                fragments.append(f"{to_json(key)}:{data}")
+            return f"{{{','.join(fragments)}}}"
+
+    def _fragment(self, item) -> str:
+        data = self.encoded.get(id(item))
+        return data if data is not None else to_json(item)
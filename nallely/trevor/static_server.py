@@ -0,0 +1,202 @@
+import email.utils
+import gzip
+import hashlib
+import http.server
+import re
+import socketserver
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# vite names the files of the build "assets/<name>-<hash>.<ext>"
+HASHED_ASSET = re.compile(r"^assets/.+-[\w-]{8,}\.\w+(\.map)?$")
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg")
+
+
+@dataclass
+class StaticFile:
+    data: bytes
+    gzipped: bytes | None
+    content_type: str
+    etag: str
+    modified: int
+    cache_control: str
+    stamp: tuple[int, int]
+
+
+class StaticFileCache:
+    """Files of the UI kept in memory, with their gzipped variant.
+
+    The gzipped variant is the ".gz" file built alongside when there is one,
+    otherwise the file is compressed once here if it's worth it. An entry is
+    reloaded when the modification time or the size of its file change, files
+    bigger than max_file_size are not cached.
+    """
+
+    def __init__(self, directory: Path, max_file_size=16 * 1024 * 1024):
+        self.directory = directory.resolve()
+        self.max_file_size = max_file_size
+        self.files: dict[Path, StaticFile] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, content_type: str) -> StaticFile | None:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if stat.st_size > self.max_file_size:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self.files.get(path)
+        if entry is None or entry.stamp != stamp:
+            try:
+                entry = self.load(path, content_type, stat)
+            except OSError:
+                return None
+            with self._lock:
+                self.files[path] = entry
+        return entry
+
+    def load(self, path: Path, content_type: str, stat) -> StaticFile:
+        data = path.read_bytes()
+        gz_path = path.with_suffix(f"{path.suffix}.gz")
+        if gz_path.is_file():
+            gzipped = gz_path.read_bytes()
+        elif len(data) > 1024 and content_type.startswith(COMPRESSIBLE):
+            gzipped = gzip.compress(data, mtime=0)
+        else:
+            gzipped = None
+        relative = path.relative_to(self.directory).as_posix()
+        if HASHED_ASSET.match(relative):
+            # the name changes with the content
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "no-cache"
+        return StaticFile(
+            data=data,
+            gzipped=gzipped,
+            content_type=content_type,
+            etag=hashlib.blake2b(data, digest_size=12).hexdigest(),
+            modified=int(stat.st_mtime),
+            cache_control=cache_control,
+            stamp=(stat.st_mtime_ns, stat.st_size),
+        )
+
+
+class SilentHandler(http.server.SimpleHTTPRequestHandler):
+    # the browsers keep their connection for the next assets, the headers and
+    # the body are sent right away instead of waiting for the ACK of the client
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    timeout = 30
+    cache_control = "no-cache"
+
+    def __init__(self, *args, cache: StaticFileCache, **kwargs):
+        self.cache = cache
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        self.send_header("Cache-Control", self.cache_control)
+        super().end_headers()
+
+    def do_GET(self):
+        if not self.send_cached(head=False):
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self.send_cached(head=True):
+            super().do_HEAD()
+
+    def send_cached(self, head) -> bool:
+        """Sends the file from the cache, False if it's not a cached file"""
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            if not urlsplit(self.path).path.endswith("/"):
+                return False  # redirected by SimpleHTTPRequestHandler
+            path = path / "index.html"
+        entry = self.cache.get(path, self.guess_type(path))
+        if entry is None:
+            return False
+        gzipped = entry.gzipped is not None and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        )
+        etag = f'"{entry.etag}-gz"' if gzipped else f'"{entry.etag}"'
+        body = b""
+        if self.not_modified(entry):
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            body = entry.gzipped if gzipped else entry.data
+            self.send_header("Content-Type", entry.content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", etag)
+        self.send_header(
+            "Last-Modified", email.utils.formatdate(entry.modified, usegmt=True)
+        )
+        self.send_header("Vary", "Accept-Encoding")
+        self.cache_control = entry.cache_control
+        try:
+            self.end_headers()
+        finally:
+            self.cache_control = SilentHandler.cache_control
+        if body and not head:
+            self.wfile.write(body)
+        return True
+
+    def not_modified(self, entry: StaticFile) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return bool(tags & {"*", f'"{entry.etag}"', f'"{entry.etag}-gz"'})
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and entry.modified <= since.timestamp()
+
+
+class ReusableTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    # a thread per connection, a slow download doesn't hold the other ones
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class HTTPServerThread:
+    def __init__(self, directory: Path, port: int = 3000):
+        self.directory = directory
+        self.port = port
+        self.httpd = None
+        self.thread = None
+        self.cache = StaticFileCache(directory)
+
+    def start(self):
+        handler = lambda *args, **kwargs: SilentHandler(
+            *args, directory=str(self.directory.resolve()), cache=self.cache, **kwargs
+        )
+        self.httpd = ReusableTCPServer(("0.0.0.0", self.port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def shutdown(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def join(self):
+        if self.thread:
+            self.thread.join()
+
+    def stop(self):
+        self.shutdown()
+        self.join()
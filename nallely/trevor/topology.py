@@ -0,0 +1,176 @@
+from typing import Any
+
+from .state_diff import VersionedState, diff
+
+DEVICE_LISTS = (("midi", "midi_devices"), ("virtual", "virtual_devices"))
+PAGE_KINDS = ("midi_devices", "virtual_devices", "connections")
+
+
+def device_entry(device: dict, kind: str) -> dict:
+    return {
+        "id": device["id"],
+        "repr": device.get("repr"),
+        "kind": kind,
+        "class": device.get("class") or device.get("meta", {}).get("name"),
+        "schema_version": device.get("schema_version"),
+        "paused": device.get("paused", False),
+    }
+
+
+def link_entry(link: dict) -> dict:
+    return {
+        "id": link["id"],
+        "src": link["src"]["device"],
+        "src_parameter": link["src"]["parameter"].get("name"),
+        "dst": link["dest"]["device"],
+        "dst_parameter": link["dest"]["parameter"].get("name"),
+        "muted": link.get("muted", False),
+    }
+
+
+def index(state: dict) -> tuple[dict, dict]:
+    """Devices and links of a state by id (as strings, as JSON keys are)"""
+    devices = {
+        str(device["id"]): (kind, device)
+        for kind, key in DEVICE_LISTS
+        for device in state.get(key, [])
+    }
+    links = {str(link["id"]): link for link in state.get("connections", [])}
+    return devices, links
+
+
+def topology(devices: dict, links: dict, schemas: dict) -> dict:
+    """Lightweight index of the session: devices, and the endpoints of the links"""
+    return {
+        "schemas": schemas,
+        "devices": {
+            id: device_entry(device, kind) for id, (kind, device) in devices.items()
+        },
+        "links": {id: link_entry(link) for id, link in links.items()},
+    }
+
+
+def page(state: dict, kind: str, offset=0, limit=100) -> dict:
+    if kind not in PAGE_KINDS:
+        raise ValueError(f"Unknown kind {kind}, expected one of {PAGE_KINDS}")
+    items = state.get(kind, [])
+    return {
+        "kind": kind,
+        "offset": offset,
+        "total": len(items),
+        "items": items[offset : offset + limit],
+    }
+
+
+class LazyClients:
+    """Clients receiving the topology of the session instead of its full state.
+
+    They get the topology index once, then its patches (as for the full
+    state), and the details of a device or a link only on demand or when it
+    changes while it's in their viewport (devices already sent are patched).
+    The index is maintained only while there are lazy clients. All the methods
+    are called under the lock of the full state, with the last state sent.
+    """
+
+    def __init__(self):
+        self.topology = VersionedState()
+        self.viewports: dict[Any, set[str]] = {}
+        self.devices: dict[str, tuple[str, dict]] = {}
+        self.links: dict[str, dict] = {}
+
+    def __contains__(self, client):
+        return client in self.viewports
+
+    def add_client(self, client, state: dict) -> dict:
+        if not self.viewports:
+            # the index was not maintained without lazy clients
+            self.devices, self.links = index(state)
+            self.topology.full(
+                topology(self.devices, self.links, state.get("schemas", {}))
+            )
+        self.viewports.setdefault(client, set())
+        return {"command": "topology", **self.topology.full()}
+
+    def remove_client(self, client):
+        self.viewports.pop(client, None)
+
+    def set_viewport(self, client, device_ids) -> list[dict]:
+        """Changes the devices displayed by a client, returns the details it misses"""
+        viewport = {str(id) for id in device_ids}
+        shown = viewport - self.viewports.get(client, set())
+        self.viewports[client] = viewport
+        return [
+            *(self.device_update(id) for id in sorted(shown) if id in self.devices),
+            *(
+                self.link_update(id)
+                for id, link in self.links.items()
+                if self.touches(link, shown)
+            ),
+        ]
+
+    def details(self, state: dict, device_ids=(), link_ids=()) -> dict:
+        devices, links = (self.devices, self.links) if self.viewports else index(state)
+        return {
+            "devices": [devices[str(id)][1] for id in device_ids if str(id) in devices],
+            "links": [links[str(id)] for id in link_ids if str(id) in links],
+        }
+
+    def update(self, state: dict) -> tuple[dict | None, dict[Any, list[dict]]]:
+        """Topology patch, and details updates per client, from the new state"""
+        devices, links = index(state)
+        patch = self.topology.update(topology(devices, links, state.get("schemas", {})))
+        if patch is not None:
+            patch["command"] = "topology_patch"
+        changed_devices = self.changed(self.devices, devices)
+        changed_links = self.changed(self.links, links)
+        old_devices, old_links = self.devices, self.links
+        self.devices, self.links = devices, links
+        device_messages = {}  # computed once for all the clients
+        updates = {}
+        for client, viewport in self.viewports.items():
+            messages = []
+            for id in changed_devices:
+                if id not in viewport:
+                    continue
+                if id not in device_messages:
+                    device_messages[id] = self.device_change(id, old_devices)
+                messages.append(device_messages[id])
+            messages.extend(
+                self.link_update(id)
+                for id in changed_links
+                if self.touches(links.get(id) or old_links[id], viewport)
+            )
+            if messages:
+                updates[client] = messages
+        return patch, updates
+
+    @staticmethod
+    def changed(old: dict, new: dict) -> list[str]:
+        return [
+            *(id for id, entry in new.items() if old.get(id) != entry),
+            *(id for id in old if id not in new),
+        ]
+
+    @staticmethod
+    def touches(link: dict, device_ids: set[str]) -> bool:
+        return (
+            str(link["src"]["device"]) in device_ids
+            or str(link["dest"]["device"]) in device_ids
+        )
+
+    def device_change(self, id: str, old_devices: dict) -> dict:
+        old, new = old_devices.get(id), self.devices.get(id)
+        if old is None or new is None or old[0] != new[0]:
+            return self.device_update(id)
+        return {"command": "device_patch", "id": id, "patch": diff(old[1], new[1])}
+
+    def device_update(self, id: str) -> dict:
+        entry = self.devices.get(id)
+        return {
+            "command": "device_update",
+            "id": id,
+            "device": entry[1] if entry else None,
+        }
+
+    def link_update(self, id: str) -> dict:
+        return {"command": "link_update", "id": id, "link": self.links.get(id)}
@@ -1,3 +1,4 @@
+import re
 import threading
 from decimal import Decimal
 from itertools import chain
@@ -21,9 +22,39 @@ from ..core.world import (
     get_virtual_devices,
     virtual_device_classes,
 )
+from ..utils import compile_cached
+
+# link properties set by the link commands
+LINK_PROPERTIES = {
+    "make_link_bouncy": "bouncy",
+    "mute_link": "muted",
+    "set_link_velocity": "velocity",
+    "set_link_extrazero": "extra_zero",
+}
+
+# "$2" or "$2::__virtual__::output_cv" refers to the result of the 3rd operation
+BATCH_REFERENCE = re.compile(r"^\$(\d+)(?=::|$)")
+
+
+class BatchError(Exception):
+    def __init__(self, index, command, error):
+        super().__init__(f"Batch operation {index} ({command}) failed: {error}")
+        self.index = index
+        self.command = command
+        self.error = error
 
 
 class TrevorAPI:
+    batch_commands = {
+        "create_device",
+        "associate_parameters",
+        "create_scaler",
+        "set_scaler_parameter",
+        "set_virtual_value",
+        "set_parameter_value",
+        *LINK_PROPERTIES,
+    }
+
     @staticmethod
     def get_device_instance(device_id) -> VirtualDevice | MidiDevice:
         return next(
@@ -36,13 +67,13 @@ class TrevorAPI:
         device.random_preset()
 
     def execute_code(self, code, exec_context):
-        bytecode = compile(source=code, filename="<string>", mode="exec")
+        bytecode = compile_cached(code, "<string>")
         exec(bytecode, globals(), exec_context)
 
     def execute_code_threaded(self, code, exec_context, on_done):
         def runner():
             try:
-                bytecode = compile(code, "<string>", "exec")
+                bytecode = compile_cached(code, "<string>")
                 exec(bytecode, {}, exec_context)
             finally:
                 if on_done:
@@ -92,21 +123,28 @@ class TrevorAPI:
         setattr(dest, to_parameter, src)
         return None
 
-    def set_scaler_parameter(self, scaler_id, parameter, value):
+    def find_scaler(self, scaler_id):
         for device in chain(connected_devices, virtual_devices):
             for entry in device.links_registry.values():
                 if id(entry.chain) == scaler_id:
-                    scaler = entry.chain
-                    setattr(scaler, parameter, value)
-                    return scaler
+                    return entry.chain
         return None
 
+    def set_scaler_parameter(self, scaler_id, parameter, value):
+        scaler = self.find_scaler(scaler_id)
+        if scaler is not None:
+            setattr(scaler, parameter, value)
+        return scaler
+
+    def get_link(self, from_parameter, to_parameter):
+        from_device, _, _ = from_parameter.split("::")
+        src_device = self.get_device_instance(from_device)
+        return src_device.links_registry.get((from_parameter, to_parameter))
+
     def set_link_property(
         self, from_parameter, to_parameter, property_name, property_value
     ):
-        from_device, _, _ = from_parameter.split("::")
-        src_device = self.get_device_instance(from_device)
-        link = src_device.links_registry.get((from_parameter, to_parameter))
+        link = self.get_link(from_parameter, to_parameter)
         if link:
             setattr(link, property_name, property_value)
 
@@ -328,3 +366,126 @@ class TrevorAPI:
             suicide=suicide,
         )
         return cloned_dev
+
+    def batch(self, operations, on_created=None):
+        """Applies the operations in order, all or nothing.
+
+        Each operation is a command with its parameters, as sent by the
+        clients. The result of an operation can be referenced in the parameters
+        of the next ones with "$<index>": the uuid of a created device, the id
+        of the scaler of a link (for set_scaler_parameter).
+        If an operation fails, the ones already applied are reverted in reverse
+        order and a BatchError is raised.
+        """
+        for index, operation in enumerate(operations):
+            command = operation.get("command")
+            if command not in self.batch_commands:
+                raise BatchError(index, command, "cannot be used in a batch")
+        results = []
+        reverts = []
+        try:
+            for index, operation in enumerate(operations):
+                params = dict(operation)
+                command = params.pop("command")
+                params = {
+                    name: self._resolve_reference(value, results)
+                    for name, value in params.items()
+                }
+                revert = self._prepare_revert(command, params)
+                if command == "create_device":
+                    instance = self.create_device(**params)
+                    if on_created:
+                        on_created(instance)
+                    revert = instance.stop
+                    results.append(instance.uuid)
+                elif command == "associate_parameters":
+                    link = self.associate_parameters(**params)
+                    results.append(self._scaler_id(link.chain if link else None))
+                elif command == "create_scaler":
+                    results.append(self._scaler_id(self.manage_scaler(**params)))
+                else:
+                    getattr(self, command)(**params)
+                    results.append(None)
+                reverts.append(revert)
+        except Exception as e:
+            for revert in reversed(reverts):
+                try:
+                    revert()
+                except Exception as revert_error:
+                    print(
+                        f"[TrevorAPI] Couldn't revert a batch operation: {revert_error}"
+                    )
+            raise BatchError(index, command, e) from e
+        return results
+
+    @staticmethod
+    def _scaler_id(scaler):
+        return id(scaler) if isinstance(scaler, Scaler) else None
+
+    @staticmethod
+    def _resolve_reference(value, results):
+        if not isinstance(value, str):
+            return value
+        match = BATCH_REFERENCE.match(value)
+        if not match:
+            return value
+        index = int(match.group(1))
+        if index >= len(results) or results[index] is None:
+            raise ValueError(f"{value} doesn't refer to a previous result")
+        if match.end() == len(value):
+            return results[index]
+        return f"{results[index]}{value[match.end():]}"
+
+    def _prepare_revert(self, command, params):
+        """Captures what is needed to revert the operation, before applying it"""
+        if command in LINK_PROPERTIES:
+            link = self.get_link(params["from_parameter"], params["to_parameter"])
+            name = LINK_PROPERTIES[command]
+            previous = getattr(link, name, None)
+            return lambda: link and setattr(link, name, previous)
+        if command in ("associate_parameters", "create_scaler"):
+            from_parameter, to_parameter = (
+                params["from_parameter"],
+                params["to_parameter"],
+            )
+            link = self.get_link(from_parameter, to_parameter)
+            return lambda: self._restore_link(from_parameter, to_parameter, link)
+        if command == "set_scaler_parameter":
+            scaler = self.find_scaler(params["scaler_id"])
+            name = params["parameter"]
+            previous = getattr(scaler, name, None)
+            return lambda: scaler and setattr(scaler, name, previous)
+        if command == "set_virtual_value":
+            device = self.get_device_instance(params["device_id"])
+            previous = getattr(device, params["parameter"], None)
+            return lambda: previous is not None and self.set_virtual_value(
+                params["device_id"], params["parameter"], previous
+            )
+        if command == "set_parameter_value":
+            device = self.get_device_instance(params["device_id"])
+            section = getattr(device, params["section_name"])
+            previous = getattr(section, params["parameter_name"])
+            return lambda: setattr(section, params["parameter_name"], previous)
+        return lambda: None
+
+    def _restore_link(self, from_parameter, to_parameter, link):
+        if self.get_link(from_parameter, to_parameter):
+            self.associate_parameters(from_parameter, to_parameter, unbind=True)
+        if link is None:
+            return
+        scaler = link.chain
+        with_scaler = (
+            {"to_min": scaler.to_min, "to_max": scaler.to_max, "as_int": scaler.as_int}
+            if isinstance(scaler, Scaler)
+            else False
+        )
+        restored = self.associate_parameters(
+            from_parameter, to_parameter, with_scaler=with_scaler
+        )
+        if restored is None:
+            return
+        for name in LINK_PROPERTIES.values():
+            setattr(restored, name, getattr(link, name))
+        if isinstance(scaler, Scaler) and isinstance(restored.chain, Scaler):
+            restored.chain.method = scaler.method
+            restored.chain.auto = scaler.auto
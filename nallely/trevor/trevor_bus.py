@@ -1,29 +1,34 @@
-import base64
-import http.server
 import io
 import json
 import os
 import queue
-import socket
-import socketserver
 import sys
 import textwrap
 import threading
 import time
 import traceback
-from collections import ChainMap, defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from collections import ChainMap, defaultdict, deque
 from contextlib import contextmanager
+from dataclasses import dataclass
 from inspect import isfunction
 from itertools import zip_longest
 from pathlib import Path
 from reprlib import Repr
 from textwrap import indent
+from typing import Any, Literal
+from urllib.parse import parse_qs, urlsplit
 
 from websockets import ConnectionClosed, ConnectionClosedError, InvalidMessage
 from websockets.sync.server import serve
 
-from nallely.distributed import NAME_LIMIT, NallelyWebsocketBus, NeuronExposer, name_me
+from nallely.distributed import (
+    NAME_LIMIT,
+    NallelyWebsocketBus,
+    NeuronExposer,
+    PeerBeacon,
+    name_me,
+    system_load,
+)
 from nallely.osc_bus import OSCBus
 
 from ..core import (
@@ -37,46 +42,159 @@ from ..core import (
     get_virtual_device_classes,
     get_virtual_devices,
     midi_device_classes,
+    midi_ports,
     no_registration,
     stop_all_connected_devices,
     virtual_devices,
 )
 from ..core.midi_device import MidiDevice, ModuleParameter
-from ..utils import StateEncoder, force_off_everywhere, get_my_ip, load_modules
+from ..outbound import ClientWriters, deflate
+from ..utils import (
+    StateEncoder,
+    force_off_everywhere,
+    from_json,
+    get_my_ip,
+    load_modules,
+    to_json,
+)
 from ..websocket_bus import (  # noqa, we keep it so it's loaded in this namespace
     WebSocketBus,
 )
-from .trevor_api import TrevorAPI
+from .async_server import AsyncTrevorServer
+from .broadcaster import UpdateBroadcaster
+from .schemas import SchemaTable
+from .scopes import ScopeHub, ScopeObserver
+from .state_diff import VersionedState
+from .static_server import HTTPServerThread
+from .topology import LazyClients, page
+from .trevor_api import BatchError, TrevorAPI
+from .value_stream import ControlValueStream, merge_frames
+
+# key of the CC values frames in the outbound queues
+CC_VALUES_KEY = "cc_values"
 
 _SYSTEM_STDOUT = sys.stdout
 _SYSTEM_STDERR = sys.stderr
 _SYSTEM_STDIN = sys.stdin
 
-TIMEOUT = 2
-PORTS = [6788]
-
 
 class IOCapture(io.StringIO):
-    def __init__(self, send_message):
+    """stdout, stderr and stdin of the playground and of the debugged devices.
+
+    write() only appends to the buffer of the writing thread (an execution), a
+    background thread sends the buffers as a single "stdout" message every
+    interval seconds, or as soon as flush_size characters are waiting. At most
+    max_pending characters are kept, the oldest are dropped (a marker tells how
+    many), so the code printing never waits for the UI. The batches are sent as
+    control messages: the output is already bounded here, a batch lost in the
+    outbound queue would go unnoticed.
+    """
+
+    def __init__(
+        self,
+        send_message,
+        interval=1 / 30,
+        flush_size=4096,
+        max_pending=64 * 1024,
+    ):
         super().__init__()
         self.send_message = send_message
+        self.interval = interval
+        self.flush_size = flush_size
+        self.max_pending = max_pending
         self.locals = threading.local()
         self.queues = {}
-        self._lock = threading.RLock()
+        # thread id -> chunks written and not sent yet
+        self.buffers: dict[int, deque[str]] = {}
+        self.pending = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        # keeps the batches in order between the flusher and send_output()
+        self._send_lock = threading.Lock()
+        self._written = threading.Event()
+        self._full = threading.Event()
+        self._stopped = threading.Event()
+        self.flusher = threading.Thread(
+            target=self._flush_output, daemon=True, name="IOCaptureFlusher"
+        )
+        self.flusher.start()
 
     def write(self, data):
+        if not data:
+            return 0
+        ident = threading.get_ident()
+        with self._lock:
+            if not self.pending:
+                self._written.set()
+            chunks = self.buffers.get(ident)
+            if chunks is None:
+                chunks = self.buffers[ident] = deque()
+            chunks.append(data)
+            self.pending += len(data)
+            if self.pending > self.max_pending:
+                self._truncate()
+            if self.pending >= self.flush_size and not self._full.is_set():
+                self._full.set()
+        return len(data)
+
+    def flush(self):
+        # print(..., flush=True) only hurries the flusher
+        self._full.set()
+
+    def _truncate(self):
+        """Drops the oldest chunks, called with the lock held"""
+        for ident, chunks in list(self.buffers.items()):
+            while chunks and self.pending > self.max_pending:
+                excess = self.pending - self.max_pending
+                chunk = chunks[0]
+                if len(chunk) <= excess:
+                    chunks.popleft()
+                    dropped = len(chunk)
+                else:
+                    chunks[0] = chunk[excess:]
+                    dropped = excess
+                self.pending -= dropped
+                self.dropped += dropped
+            if not chunks:
+                del self.buffers[ident]
+            if self.pending <= self.max_pending:
+                break
+
+    def _take_output(self):
         with self._lock:
-            self.send_line_to_websocket(data)
-            return super().write(data)
+            buffers, self.buffers = self.buffers, {}
+            dropped, self.dropped = self.dropped, 0
+            self.pending = 0
+        output = "".join("".join(chunks) for chunks in buffers.values())
+        if dropped:
+            output = f"[... {dropped} characters dropped ...]\n{output}"
+        return output
+
+    def _flush_output(self):
+        while not self._stopped.is_set():
+            self._written.wait()
+            self._full.wait(self.interval)
+            self._written.clear()
+            self._full.clear()
+            self.send_output()
+        # what was written while stopping is not lost
+        self.send_output()
+
+    def stop(self, timeout=1.0):
+        """Stops the flusher thread, the pending output is sent on the way out"""
+        self._stopped.set()
+        self._written.set()
+        self._full.set()
+        self.flusher.join(timeout)
+
+    def send_output(self):
+        """Sends the pending output now, e.g: before an error is reported"""
+        with self._send_lock:
+            output = self._take_output()
+            if output:
+                self.send_line_to_websocket(output)
 
     def send_line_to_websocket(self, line):
-        # if "<mem" in line:
-        #     self.send_message(
-        #         {
-        #             "command": "stdout",
-        #             "line": "INTERACTIVE DEBUG MODE!\nTODO=>IMPLEMENT ME\n",
-        #         }
-        #     )
         self.send_message({"command": "stdout", "line": line})
 
     def _ensure_queue(self):
@@ -101,9 +219,14 @@ class IOCapture(io.StringIO):
         # self.send_message(
         #     {"arg": threading.get_ident(), "command": "RuntimeAPI::addStdinWait"}
         # )
-        self.send_message(
-            {"command": "stdout", "line": f"<stdin:{threading.get_ident()}>"}
-        )
+        # the output waiting (e.g. the prompt of input()) goes before the marker
+        with self._send_lock:
+            self.send_message(
+                {
+                    "command": "stdout",
+                    "line": f"{self._take_output()}<stdin:{threading.get_ident()}>",
+                }
+            )
         return q.get(block=True)
 
     def start_capture(self):
@@ -130,33 +253,101 @@ class IOCapture(io.StringIO):
             sys.stderr = _SYSTEM_STDERR
 
 
-def make_ccvalues():
-    return defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
+@dataclass
+class CommandResult:
+    """Result of a command, sent in the acknowledgement of its request"""
+
+    value: Any
 
 
 @no_registration
 class TrevorBus(VirtualDevice):
     forever = True
-
-    def __init__(self, host="0.0.0.0", port=6788, **kwargs):
+    # commands which receive the client that sent them
+    client_commands = {
+        "subscribe_scope",
+        "unsubscribe_scope",
+        "batch",
+        "subscribe_topology",
+        "unsubscribe_topology",
+        "set_viewport",
+        "full_state",
+    }
+    # commands answering their request themselves, they get the requestId
+    answering_commands = {"completion_request", "subscribe_scope", "batch"}
+
+    def __init__(
+        self,
+        host="0.0.0.0",
+        port=6788,
+        update_fps=30,
+        cc_values_fps=60,
+        server: Literal["threaded", "async"] = "threaded",
+        compression=True,
+        discovery=True,
+        **kwargs,
+    ):
         from ..session import Session
 
         super().__init__(target_cycle_time=10, **kwargs)
+        self.port = port
         self.connected = defaultdict(list)
-        self.server = serve(self.handler, host=host, port=port)
+        # each client has its own outbound queue and writer thread
+        self.writers = ClientWriters("TrevorBus", on_close=self.client_closed)
+        # permessage-deflate, if the client asks for it (browsers do)
+        self.compression = compression
+        extensions = deflate() if compression else None
+        if server == "async":
+            # all the clients on one event loop, commands run on a single worker
+            self.server = AsyncTrevorServer(
+                self, host=host, port=port, extensions=extensions
+            )
+        else:
+            self.server = serve(
+                self.handler,
+                host=host,
+                port=port,
+                compression=None,
+                extensions=extensions,
+            )
         self.exec_context = ChainMap(globals())
         self.trevor = TrevorAPI()
         self.session = Session(self, meta_env=self.exec_context)
         self.redirector = IOCapture(self.send_message)
-        self.cc_update_interval = int(0.05e9)  # every X ns
-        self.next_cc_update_time = time.perf_counter_ns() + self.cc_update_interval
-        self.cc_update_package = defaultdict(make_ccvalues)
-        self.refresh_websocket_bus(WebSocketBus())
+        # MIDI parameters values are sent as binary frames, at most cc_values_fps per second
+        self.cc_values = ControlValueStream()
+        # set when devices are killed, their values are forgotten by the next flush
+        self.cc_values_outdated = False
+        self.cc_values_flusher = UpdateBroadcaster(
+            self.flush_control_values, interval=1 / cc_values_fps, name="TrevorCCValues"
+        )
+        self.refresh_websocket_bus(WebSocketBus(compression=self.compression))
         self.refresh_osc_bus(OSCBus())
-        self.current_scan = None
+        # the other instances on the network announce themselves, no more scan
+        self.beacon = None
+        if discovery:
+            try:
+                self.beacon = PeerBeacon(self.announce, on_change=self.peers_changed)
+                self.beacon.ensure_running()
+            except OSError as e:
+                print(f"[TrevorBus] Couldn't start the discovery of friends: {e}")
         self.external_bus_register = {}
         self.external_services_register = {}
         self.fs = None
+        # last state broadcasted to the clients, updates are sent as patches
+        self.states = VersionedState()
+        # the class schemas are sent once per class, not once per device
+        self.schemas = SchemaTable()
+        # clients receiving the topology and the details they display only
+        self.lazy = LazyClients()
+        # state updates are built and sent from their own thread, at most update_fps per second
+        self.broadcaster = UpdateBroadcaster(self.flush_update, interval=1 / update_fps)
+        self.broadcaster.ensure_running()
+        # decimated values of the parameters watched by the clients
+        self.scopes = ScopeHub(self.send_scope_frame, on_watch=self.watch_device)
+        self.scope_observers = {}
+        self.cc_values_flusher.ensure_running()
+        midi_ports.add_listener(self.on_midi_ports_change)
 
     def refresh_websocket_bus(self, ws=None):
         self.ws: WebSocketBus = self._refresh_bus(WebSocketBus, bus=ws)  # type: ignore
@@ -179,19 +370,13 @@ class TrevorBus(VirtualDevice):
 
     @staticmethod
     def to_json(obj, **kwargs):
-        return json.dumps(obj, cls=StateEncoder, **kwargs)
+        if kwargs:
+            return json.dumps(obj, cls=StateEncoder, **kwargs)
+        return to_json(obj)
 
     def handler(self, client):
-        path = client.request.path
-        service_name = path.split("/")[1]
-        connected_clients = self.connected[service_name]
-        connected_clients.append(client)
-        print(
-            f"[TrevorBus] Connected on {service_name} [{len(connected_clients)} clients]"
-        )
         try:
-            # Send first full state with default values
-            client.send(self.to_json(self.full_state(with_defaultvalues=True)))
+            self.client_connected(client)
             for message in client:
                 self.handleMessage(client, message)
         except (ConnectionClosed, TimeoutError) as e:
@@ -202,22 +387,116 @@ class TrevorBus(VirtualDevice):
             )
             print(f"[TrevorBus] Client {client} on trevor {kind}")
         finally:
-            print("[TrevorBus] Disconnecting", client)
-            try:
-                connected_clients.remove(client)
-                print(
-                    f"[TrevorBus] Connected on {service_name} [{len(connected_clients)} clients]"
+            self.client_disconnected(client)
+
+    @staticmethod
+    def service_name(client):
+        return urlsplit(client.request.path).path.split("/")[1]
+
+    def client_connected(self, client):
+        service_name = self.service_name(client)
+        connected_clients = self.connected[service_name]
+        # /trevor?lazy=1 starts with the topology instead of the full state
+        lazy = "lazy" in parse_qs(urlsplit(client.request.path).query)
+        with self.states.lock:
+            # the other clients are brought to the current state, the new
+            # one starts from it, then everybody follows the same patches
+            self.flush_update()
+            if lazy:
+                message = self.to_json(
+                    self.lazy.add_client(client, self.states.state or {})
                 )
-            except ValueError:
-                pass
+            else:
+                # the JSON of the devices that didn't change is reused
+                message = self.states.encode(self.states.full())
+            self.writers.for_client(client).send(message)
+            connected_clients.append(client)
+        print(
+            f"[TrevorBus] Connected on {service_name} [{len(connected_clients)} clients]"
+        )
 
-    def brodcast_full_state(self):
-        for service_name, connected_clients in self.connected.items():
+    def client_disconnected(self, client):
+        print("[TrevorBus] Disconnecting", client)
+        # out of the broadcasts first, then its writer can go
+        connected_clients = self.connected[self.service_name(client)]
+        try:
+            connected_clients.remove(client)
             print(
-                f"[TrevorBus] Brodcasting full state on /{service_name} for {len(connected_clients)} clients"
+                f"[TrevorBus] Connected on {self.service_name(client)} [{len(connected_clients)} clients]"
+            )
+        except ValueError:
+            pass
+        self.writers.remove(client)
+        self.scopes.remove_client(client)
+        with self.states.lock:
+            self.lazy.remove_client(client)
+
+    def brodcast_full_state(self):
+        with self.states.lock:
+            message = self.states.encode(self.states.full(self.current_state(True)))
+            for service_name, connected_clients in self.connected.items():
+                print(
+                    f"[TrevorBus] Brodcasting full state on /{service_name} for {len(connected_clients)} clients"
+                )
+                for client in list(connected_clients):
+                    if client not in self.lazy:
+                        self.writers.for_client(client).send(message)
+            self.send_lazy_updates()
+
+    def resync(self):
+        """Sends the full state to all clients, when a client lost track of the patches"""
+        self.brodcast_full_state()
+
+    def full_state(self, client):
+        """Sends the full state to the client only, with the version of the last patch
+
+        The pending update is sent first, so the other clients keep following
+        the versions of the state.
+        """
+        with self.states.lock:
+            self.flush_update()
+            message = self.states.encode(self.states.full())
+        self.writers.for_client(client).send(message)
+
+    def subscribe_topology(self, client):
+        """The client receives the topology and the details of its viewport only.
+
+        Also used by lazy clients to get the topology again when they lost
+        track of its patches.
+        """
+        with self.states.lock:
+            self.flush_update()
+            message = self.lazy.add_client(client, self.states.state or {})
+            self.writers.for_client(client).send(self.to_json(message))
+
+    def unsubscribe_topology(self, client):
+        """The client goes back to the full state and its patches"""
+        with self.states.lock:
+            self.flush_update()
+            self.lazy.remove_client(client)
+            self.writers.for_client(client).send(self.states.encode(self.states.full()))
+
+    def set_viewport(self, client, device_ids):
+        with self.states.lock:
+            if client not in self.lazy:
+                return
+            writer = self.writers.for_client(client)
+            for message in self.lazy.set_viewport(client, device_ids):
+                writer.send(self.to_json(message))
+
+    def get_details(self, device_ids=(), link_ids=()):
+        with self.states.lock:
+            self.flush_update()
+            return CommandResult(
+                self.lazy.details(self.states.state or {}, device_ids, link_ids)
+            )
+
+    def get_page(self, kind, offset=0, limit=100):
+        with self.states.lock:
+            self.flush_update()
+            return CommandResult(
+                page(self.states.state or {}, kind, int(offset), int(limit))
             )
-            for client in connected_clients:
-                client.send(self.to_json(self.full_state(with_defaultvalues=True)))
 
     def setup(self):
         try:
@@ -229,45 +508,147 @@ class TrevorBus(VirtualDevice):
         return super().setup()
 
     def stop(self, clear_queues=False):
+        midi_ports.remove_listener(self.on_midi_ports_change)
+        self.broadcaster.stop()
+        self.cc_values_flusher.stop()
+        self.scopes.stop()
+        if self.beacon:
+            self.beacon.stop()
+        # the last output goes out before the writers are closed
+        self.redirector.stop()
+        self.writers.clear()
         if self.running and self.server:
             self.server.shutdown()
         self.umount_nallelyfs()
         super().stop(clear_queues)
 
     def handleMessage(self, client, message):
-        message = json.loads(message)
+        message = from_json(message)
         cmd = message["command"]
         del message["command"]
         params = message
-        res = getattr(self, cmd)(**params)
-        if res:
-            self.send_message(res)
+        if cmd in self.client_commands:
+            params["client"] = client
+        request_id = None
+        if cmd not in self.answering_commands:
+            request_id = params.pop("requestId", None)
+        if request_id is None:
+            # fire and forget, only the message returned is broadcasted
+            res = self.run_command(cmd, params)
+            if res and not isinstance(res, CommandResult):
+                self.send_message(res)
+            return
+        ack = {"command": "ack", "requestId": request_id}
+        try:
+            res = self.run_command(cmd, params)
+            if isinstance(res, CommandResult):
+                ack["result"] = res.value
+            elif res:
+                self.send_message(res)
+        except Exception as e:
+            traceback.print_exc()
+            ack["error"] = f"{type(e).__name__}: {e}"
+        # the acknowledgements follow the order of the requests of the client
+        self.writers.for_client(client).send(self.to_json(ack))
+
+    def run_command(self, cmd, params):
+        # the broadcaster snapshots the session under the states lock, it never
+        # sees a command half way through its changes
+        with self.states.lock:
+            return getattr(self, cmd)(**params)
 
     def send_message(self, message):
-        connected_devices = self.connected["trevor"]
-        for client in list(connected_devices):
+        self._broadcast(self.to_json(message))
+
+    def send_value(self, message, key=None):
+        """Sends a message of a value stream, they can be dropped for slow clients"""
+        self._broadcast(self.to_json(message), value=True, key=key)
+
+    def client_closed(self, client, reason):
+        self.scopes.remove_client(client)
+        with self.states.lock:
+            self.lazy.remove_client(client)
+        for service_name, connected_clients in self.connected.items():
             try:
-                client.send(self.to_json(message))
-            except (ConnectionClosed, TimeoutError) as e:
-                try:
-                    connected_devices.remove(client)
-                    kind = (
-                        "crashed"
-                        if isinstance(e, (ConnectionClosedError, TimeoutError))
-                        else "disconnected"
-                    )
-                    print(
-                        f"[TrevorBus] Client {client} on trevor {kind} [{len(connected_devices)} clients]"
-                    )
-                except Exception:
-                    pass
+                connected_clients.remove(client)
+            except ValueError:
+                continue
+            print(
+                f"[TrevorBus] Client {client} on {service_name} {reason} [{len(connected_clients)} clients]"
+            )
+
+    def subscribe_scope(
+        self, client, device_id, parameter, rate=30, mode="last", requestId=None
+    ):
+        try:
+            device = self.trevor.get_device_instance(device_id)
+            if isinstance(device, VirtualDevice):
+                # consumers bypass the input queue, their values are not observed
+                port = next(
+                    (p for p in device.all_parameters() if p.name == parameter), None
+                )
+                if port is None or port.consumer:
+                    raise ValueError("no such observable parameter")
+            subscription = self.scopes.subscribe(
+                client, device_id, parameter, rate, mode
+            )
+        except (StopIteration, ValueError) as e:
+            message = (
+                f"Cannot watch {parameter} on {device_id}: {e or 'unknown device'}"
+            )
+            self.writers.for_client(client).send(
+                self.to_json(
+                    {"status": "error", "message": message, "command": "notification"}
+                )
+            )
+            return
+        self.scopes.ensure_running()
+        self.writers.for_client(client).send(
+            self.to_json(
+                {
+                    "command": "scopeSubscribed",
+                    "requestId": requestId,
+                    "arg": subscription.as_dict(),
+                }
+            )
+        )
+
+    def unsubscribe_scope(self, client, scope_id):
+        self.scopes.unsubscribe(int(scope_id), client)
+
+    def send_scope_frame(self, client, frame):
+        self.writers.for_client(client).send_value(frame)
+
+    def watch_device(self, device_id, watched):
+        # only virtual devices need an observer, MIDI values are fed on reception
+        if watched:
+            device = self.trevor.get_device_instance(device_id)
+            if isinstance(device, VirtualDevice):
+                observer = ScopeObserver(self.scopes, device)
+                self.scope_observers[device_id] = observer
+                device.register_observer(observer)
+        else:
+            observer = self.scope_observers.pop(device_id, None)
+            if observer:
+                observer.device.unregister_observer(observer)
+
+    def queue_metrics(self):
+        return {"command": "queueMetrics", "arg": self.writers.metrics()}
 
     def send_notification(self, status, message):
         self.send_message(
             {"status": status, "message": message, "command": "notification"}
         )
 
-    def full_state(self, with_defaultvalues=False):
+    def on_midi_ports_change(self, events):
+        for event in events:
+            status = "ok" if event.kind == "connected" else "warning"
+            self.send_notification(
+                status, f"MIDI {event.direction} {event.name!r} {event.kind}"
+            )
+        self.send_update()
+
+    def current_state(self, with_defaultvalues=False):
         snapshot = self.session.snapshot(
             spread_registered_services=True, save_defaultvalues=with_defaultvalues
         )
@@ -284,11 +665,14 @@ class TrevorBus(VirtualDevice):
         for device, friend_ip in self.external_services_register.keys():
             exposed_services[device].append((name_me(friend_ip), friend_ip))
         snapshot["myname"] = name_me()
-        return snapshot
+        # [device id, device, section, parameter] of the indices used by the CC values frames
+        snapshot["cc_indices"] = self.cc_values.table()
+        with self.states.lock:
+            return self.schemas.normalize(snapshot)
 
     def random_preset(self, device_id):  # type: ignore
         self.trevor.random_preset(device_id)
-        return self.full_state()
+        return self.send_update()
 
     def completion_request(self, requestId, expression):
         options = []
@@ -334,7 +718,7 @@ class TrevorBus(VirtualDevice):
 
     def save_code(self, code):
         self.session.save_code(code)
-        return self.full_state()
+        return self.send_update()
 
     def execute_code(self, code):
         # with self.redirector.capture():
@@ -346,6 +730,7 @@ class TrevorBus(VirtualDevice):
             )
         except SyntaxError as err:
             print(err, file=sys.stderr)
+            self.redirector.send_output()
             self.send_message(
                 {
                     "command": "error",
@@ -359,6 +744,7 @@ class TrevorBus(VirtualDevice):
             )
         except Exception as err:
             print(err, file=sys.stderr)
+            self.redirector.send_output()
             _, _, tb = sys.exc_info()
             exc_info = traceback.extract_tb(tb)[-1]
             self.send_message(
@@ -372,12 +758,32 @@ class TrevorBus(VirtualDevice):
                     },
                 }
             )
-        return self.full_state()
+        return self.send_update()
+
+    def batch(self, client, operations, requestId=None):
+        """Applies a list of operations all or nothing, with a single update.
+
+        The states lock is held during the whole batch, so no intermediate
+        state is sent, the update is flushed before answering the client.
+        """
+        reply = {"command": "batchResult", "requestId": requestId}
+        with self.states.lock:
+            try:
+                reply["results"] = self.trevor.batch(
+                    operations, on_created=self._setup_created_instance
+                )
+            except BatchError as e:
+                print(f"[TrevorBus] {e}")
+                reply["error"] = str(e)
+                reply["index"] = e.index
+            self.flush_update()
+        self.writers.for_client(client).send(self.to_json(reply))
 
     def create_device(self, name):
         instance = self.trevor.create_device(name)
         self._setup_created_instance(instance)
-        return self.full_state()
+        self.send_update()
+        return CommandResult(instance.uuid)
 
     def _setup_created_instance(self, instance):
         instance.to_update = self
@@ -390,7 +796,7 @@ class TrevorBus(VirtualDevice):
         message = f"Exception caught on {device}: {exception}"
         print(f"[ERROR] {message}\n[ERROR] pausing device")
         self.send_notification(status="error", message=message)
-        self.send_message(self.full_state())
+        self.send_update()
 
     def send_control_value_update(
         self, device: MidiDevice, msg, control: ModuleParameter | None
@@ -398,80 +804,121 @@ class TrevorBus(VirtualDevice):
         if not control:
             # If we are here, the control is not bind in the system, so we don't send updates
             return
-        current_parameter = self.cc_update_package[device.uuid][device.uid()][
-            control.section_name
-        ]
-        if msg.value != current_parameter[control.name]:
-            current_parameter[control.name] = msg.value
-        if time.perf_counter_ns() > self.next_cc_update_time:
-            self.send_message(
-                {"command": "RuntimeAPI::updateCCValues", "arg": self.cc_update_package}
+        self.cc_values.update(
+            (device.uuid, device.uid(), control.section_name, control.name), msg.value
+        )
+        self.cc_values_flusher.mark_dirty()
+        if device.uuid in self.scopes.watched:
+            self.scopes.feed(
+                device.uuid, f"{control.section_name}.{control.name}", msg.value
             )
-            self.cc_update_package.clear()
-            self.next_cc_update_time = time.perf_counter_ns() + self.cc_update_interval
+
+    def forget_control_values(self):
+        self.cc_values_outdated = True
+        self.cc_values_flusher.mark_dirty()
+
+    def prune_control_values(self):
+        alive = {device.uuid for device in all_devices()}
+        if self.cc_values.retain(lambda key: key[0] in alive):
+            # the frames waiting to be sent use the previous indices
+            for client in list(self.connected["trevor"]):
+                self.writers.for_client(client).discard_value(CC_VALUES_KEY)
+
+    def flush_control_values(self):
+        if self.cc_values_outdated:
+            self.cc_values_outdated = False
+            self.prune_control_values()
+        if self.cc_values.unpublished():
+            # the clients need the new indices before the frame using them
+            self.flush_update()
+        frame = self.cc_values.frame()
+        if frame is not None:
+            # frames carry deltas, one waiting for a slow client is merged with the next
+            self._broadcast(frame, value=True, key=CC_VALUES_KEY, merge=merge_frames)
 
     def send_update(self, device=None):
-        connected_devices = self.connected["trevor"]
-        for client in list(connected_devices):
-            try:
-                client.send(self.to_json(self.full_state()))
-            except (ConnectionClosed, TimeoutError) as e:
-                try:
-                    connected_devices.remove(client)
-                    kind = (
-                        "crashed"
-                        if isinstance(e, (ConnectionClosedError, TimeoutError))
-                        else "disconnected"
-                    )
-                    print(
-                        f"[TrevorBus] Client {client} on trevor {kind} [{len(connected_devices)} clients]"
-                    )
-                except Exception:
-                    pass
+        """Requests a state update, it will be sent with the next frame"""
+        self.broadcaster.mark_dirty()
+
+    def flush_update(self):
+        """Builds and sends the state update right away"""
+        with self.states.lock:
+            patch = self.states.update(self.current_state(with_defaultvalues=True))
+            if patch is None:
+                return
+            message = self.to_json(patch)
+            for client in list(self.connected["trevor"]):
+                if client not in self.lazy:
+                    self.writers.for_client(client).send(message)
+            self.send_lazy_updates()
+
+    def send_lazy_updates(self):
+        if not self.lazy.viewports:
+            return
+        patch, updates = self.lazy.update(self.states.state or {})
+        if patch is not None:
+            message = self.to_json(patch)
+            for client in list(self.lazy.viewports):
+                self.writers.for_client(client).send(message)
+        for client, messages in updates.items():
+            writer = self.writers.for_client(client)
+            for message in messages:
+                writer.send(self.to_json(message))
+
+    def _broadcast(self, message, value=False, key=None, merge=None):
+        for client in list(self.connected["trevor"]):
+            writer = self.writers.for_client(client)
+            if value:
+                writer.send_value(message, key, merge)
+            else:
+                writer.send(message)
 
     def create_scaler(self, from_parameter, to_parameter, create):
-        self.trevor.manage_scaler(from_parameter, to_parameter, create)
-        return self.full_state()
+        scaler = self.trevor.manage_scaler(from_parameter, to_parameter, create)
+        self.send_update()
+        return CommandResult(id(scaler) if scaler else None)
 
     def set_scaler_parameter(self, scaler_id, parameter, value):
         self.trevor.set_scaler_parameter(scaler_id, parameter, value)
-        return self.full_state()
+        return self.send_update()
 
     def make_link_bouncy(self, from_parameter, to_parameter, bouncy):
         self.trevor.make_link_bouncy(from_parameter, to_parameter, bouncy)
-        return self.full_state()
+        return self.send_update()
 
     def mute_link(self, from_parameter, to_parameter, muted):
         self.trevor.mute_link(from_parameter, to_parameter, muted)
-        return self.full_state()
+        return self.send_update()
 
     def set_link_velocity(self, from_parameter, to_parameter, velocity):
         self.trevor.set_link_velocity(from_parameter, to_parameter, velocity)
-        return self.full_state()
+        return self.send_update()
 
     def set_link_extrazero(self, from_parameter, to_parameter, extra_zero):
         self.trevor.set_link_extrazero(from_parameter, to_parameter, extra_zero)
-        return self.full_state()
+        return self.send_update()
 
     def reset_all(self):
         cleaner = self.trevor.reset_all()
-        self.send_message(self.full_state())
+        self.send_update()
         cleaner.join()
-        self.refresh_websocket_bus(WebSocketBus())
+        self.forget_control_values()
+        self.refresh_websocket_bus(WebSocketBus(compression=self.compression))
         self.refresh_osc_bus(OSCBus())
-        # return self.full_state()
+        # return self.send_update()
 
     def associate_parameters(
         self, from_parameter, to_parameter, unbind, with_scaler=True
     ):
-        self.trevor.associate_parameters(
+        link = self.trevor.associate_parameters(
             from_parameter, to_parameter, unbind, with_scaler
         )
-        return self.full_state()
+        self.send_update()
+        return CommandResult(link.uuid if link else None)
 
     def associate_midi_port(self, device, port, direction):
         self.trevor.associate_midi_port(device, port, direction)
-        return self.full_state()
+        return self.send_update()
 
     def list_patches(self):
         cwd = Path.cwd()
@@ -490,7 +937,8 @@ class TrevorBus(VirtualDevice):
             self.send_message({"errors": errors})
         self.refresh_websocket_bus()
         self.refresh_osc_bus()
-        return self.full_state()
+        self.forget_control_values()
+        return self.send_update()
 
     def save_all(self, name, save_defaultvalues=False):
         file = self.session.save_all(name, save_defaultvalues=save_defaultvalues)
@@ -511,7 +959,7 @@ class TrevorBus(VirtualDevice):
             self.send_message({"errors": errors})
         self.refresh_websocket_bus()
         self.refresh_osc_bus()
-        return self.full_state()
+        return self.send_update()
 
     def clear_address(self, address, universe="memory"):
         self.session.clear_address(address, universe=universe)
@@ -531,11 +979,11 @@ class TrevorBus(VirtualDevice):
 
     def resume_device(self, device_id, start):
         self.trevor.resume_device(device_id, start)
-        return self.full_state()
+        return self.send_update()
 
     def pause_device(self, device_id, start):
         self.trevor.pause_device(device_id, start)
-        return self.full_state()
+        return self.send_update()
 
     def set_virtual_value(self, device_id, parameter, value):
         if parameter == "set_pause":
@@ -544,19 +992,20 @@ class TrevorBus(VirtualDevice):
             else:
                 return self.resume_device(device_id, None)
         self.trevor.set_virtual_value(device_id, parameter, value)
-        return self.full_state()
+        return self.send_update()
 
     def delete_all_connections(self):
         self.trevor.delete_all_connections()
-        return self.full_state()
+        return self.send_update()
 
     def kill_device(self, device_id):
         self.trevor.kill_device(device_id)
-        return self.full_state()
+        self.forget_control_values()
+        return self.send_update()
 
     def force_note_off(self, device_id):
         self.trevor.force_note_off(device_id)
-        return self.full_state()
+        return self.send_update()
 
     def start_capture_io(self, device_or_link=None):
         if device_or_link:
@@ -604,6 +1053,7 @@ class TrevorBus(VirtualDevice):
             self.send_message(
                 {"arg": class_code, "command": "RuntimeAPI::setClassCode"}
             )
+            return CommandResult(class_code)
         except Exception:
             print(f"[TrevorBus] Couldn't find {device_id}")
 
@@ -627,7 +1077,7 @@ class TrevorBus(VirtualDevice):
                 f"Error while compiling/injecting {device.__class__.__name__}",
             )
             print(e)
-        return self.full_state()
+        return self.send_update()
 
     def compile_inject_save(self, device_id, class_code, force_name=None, commit=False):
         try:
@@ -651,22 +1101,22 @@ class TrevorBus(VirtualDevice):
                 f"Error while compiling/injecting {device.__class__.__name__}",
             )
             print(e)
-        return self.full_state()
+        return self.send_update()
 
     def create_new_vdev(self, name):
         instance = self.session.create_new_vdev(
             name, setup_callback=self._setup_created_instance
         )
         self.get_class_code(instance.uuid)
-        return self.full_state()
+        return self.send_update()
 
     def set_parameter_value(self, device_id, section_name, parameter_name, value):
         self.trevor.set_parameter_value(device_id, section_name, parameter_name, value)
-        return self.full_state(with_defaultvalues=True)
+        return self.send_update()
 
     def set_device_channel(self, device_id, channel):
         self.trevor.set_device_channel(device_id, channel)
-        return self.full_state()
+        return self.send_update()
 
     def fetch_path_infos(self, filename):
         details = self.session.extract_infos(filename)
@@ -684,7 +1134,8 @@ class TrevorBus(VirtualDevice):
             instance.to_update = self
             if isinstance(instance, MidiDevice):
                 instance.on_midi_message = self.send_control_value_update
-        return self.full_state()
+        self.send_update()
+        return CommandResult([instance.uuid for instance in devices])
 
     def unregister_service(self, bus_id, service_name):
         try:
@@ -694,79 +1145,43 @@ class TrevorBus(VirtualDevice):
                 unregister_service(service_name)
         except Exception:
             print(f"[TrevorBus] Couldn't find bus {bus_id}")
-        return self.full_state()
+        return self.send_update()
 
     def scan_for_friends(self, force=False):
-        if self.current_scan is not None:
-            return
-
-        self.current_scan = {}
+        """The friends announced by their beacon, by ip: (name, Trevor port)"""
+        friends = self.friends()
+        self.send_message({"command": "GeneralAPI::setOnlineFriends", "arg": friends})
+        if force:
+            return friends
+
+    def friends(self):
+        if self.beacon is None:
+            return {}
+        friends = {}
+        # the UI knows one instance per host, the one on the lowest port
+        peers = sorted(
+            self.beacon.snapshot().values(),
+            key=lambda peer: peer.ports.get("trevor", 0),
+            reverse=True,
+        )
+        for peer in peers:
+            friends[peer.ip] = (peer.name, peer.ports.get("trevor"))
+        return friends
 
-        def check_port(ip, port):
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(TIMEOUT)
-                    if s.connect_ex((ip, port)) == 0:
-                        pseudo_key = base64.b64encode(os.urandom(16)).decode("utf-8")
-                        header = (
-                            f"GET / HTTP/1.1\r\n"
-                            f"Host: {ip}\r\n"
-                            f"Upgrade: websocket\r\n"
-                            f"Connection: Upgrade\r\n"
-                            f"Sec-WebSocket-Key: {pseudo_key}\r\n"
-                            f"Sec-WebSocket-Version: 13\r\n"
-                            f"\r\n"
-                        )
-                        s.sendall(header.encode("utf-8"))
-                        response = s.recv(1024)
-                        if b"101" not in response:
-                            return
-                        # Send a masked WebSocket close frame (status 1000)
-                        mask = os.urandom(4)
-                        payload = b"\x03\xe8"  # status 1000
-                        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
-                        s.sendall(b"\x88\x82" + mask + masked)
-                        try:
-                            s.recv(128)
-                        except Exception:
-                            pass
-                        print(f"[TrevorBus] Friend found: {ip}:{port}")
-                        assert self.current_scan is not None
-                        self.current_scan[ip] = (name_me(ip), port)
-                        # self.current_scan[name_me(ip)] = (ip, port)
-            except Exception as e:
-                print("[TrevorBus] Error while scanning friends", e)
+    def announce(self):
+        return {
+            "name": name_me(),
+            "ports": {
+                "trevor": self.port,
+                "websocket": self.ws.port if self.ws else None,
+            },
+            "load": system_load(),
+        }
 
-        my_ip = get_my_ip()
-        if my_ip is None:
-            self.send_message({"command": "GeneralAPI::setOnlineFriends", "arg": []})
-            if force:
-                return []
-        else:
-            prefix = ".".join(my_ip.split(".")[:-1])
-            try:
-                with ThreadPoolExecutor(max_workers=100) as executor:
-                    for i in range(1, 255):
-                        ip = f"{prefix}.{i}"
-                        for port in PORTS:
-                            if ip == my_ip:
-                                print(
-                                    f"[TrevorBus] Friend found: {ip}:{port}  (This is us!)"
-                                )
-                                self.current_scan[ip] = (name_me(ip), port)
-                                continue
-                            executor.submit(check_port, ip, port)
-                    # for port in PORTS:
-                    #     executor.submit(check_port, "localhost", port)
-            except Exception:
-                pass
-            result = self.current_scan
-            self.current_scan = None
-            self.send_message(
-                {"command": "GeneralAPI::setOnlineFriends", "arg": result}
-            )
-            if force:
-                return result
+    def peers_changed(self, peers):
+        self.send_message(
+            {"command": "GeneralAPI::setOnlineFriends", "arg": self.friends()}
+        )
 
     def expose_neuron(self, device_id, friend_ip):
         try:
@@ -776,7 +1191,7 @@ class TrevorBus(VirtualDevice):
             )
         except Exception:
             print(f"[TrevorBus] Couldn't find {device_id}")
-            return self.full_state()
+            return self.send_update()
 
         if friend_ip not in self.external_bus_register:
             # We hardcode the port at the moment, later it will be dynamic and allocated by the session
@@ -811,7 +1226,7 @@ class TrevorBus(VirtualDevice):
             print(f"[TrevorBus] {msg}")
             return
 
-        return self.full_state()
+        return self.send_update()
 
     def unexpose_neuron(self, device_id, friend_ip):
         try:
@@ -821,17 +1236,17 @@ class TrevorBus(VirtualDevice):
             )
         except Exception:
             print(f"[TrevorBus] Couldn't find {device_id}")
-            return self.full_state()
+            return self.send_update()
 
         service_key = (device.uuid, friend_ip)
         if service_key not in self.external_services_register:
-            return self.full_state()
+            return self.send_update()
 
         service = self.external_services_register[service_key]
         service.dispose()
         del self.external_services_register[service_key]
 
-        return self.full_state()
+        return self.send_update()
 
     def clone_device(
         self,
@@ -841,14 +1256,15 @@ class TrevorBus(VirtualDevice):
         with_links=True,
         suicide=False,
     ):
-        self.trevor.clone_device(
+        clone = self.trevor.clone_device(
             device_id,
             pause_device=pause_device,
             start_clone=start_clone,
             with_links=with_links,
             suicide=suicide,
         )
-        return self.full_state()
+        self.send_update()
+        return CommandResult(clone.uuid)
 
     def mount_nallelyfs(self, mountpoint):
         if mountpoint is None:
@@ -884,67 +1300,6 @@ def resource_path(relative_path):
     return base_path / relative_path
 
 
-class SilentHandler(http.server.SimpleHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass
-
-    def end_headers(self):
-        self.send_header("Cache-Control", "no-cache")
-        super().end_headers()
-
-    def do_GET(self):
-        accept = self.headers.get("Accept-Encoding", "")
-        path = Path(self.translate_path(self.path))
-        gz_path = path.with_suffix(f"{path.suffix}.gz")
-
-        if "gzip" in accept and gz_path.exists():
-            ctype = self.guess_type(path)
-            data = gz_path.read_bytes()
-            self.send_response(200)
-            self.send_header("Content-Encoding", "gzip")
-            self.send_header("Content-Type", ctype)
-            self.send_header("Content-Length", str(len(data)))
-            self.end_headers()
-            self.wfile.write(data)
-            return
-
-        super().do_GET()
-
-
-class ReusableTCPServer(socketserver.TCPServer):
-    allow_reuse_address = True
-
-
-class HTTPServerThread:
-    def __init__(self, directory: Path, port: int = 3000):
-        self.directory = directory
-        self.port = port
-        self.httpd = None
-        self.thread = None
-
-    def start(self):
-        handler = lambda *args, **kwargs: SilentHandler(
-            *args, directory=str(self.directory.resolve()), **kwargs
-        )
-        self.httpd = ReusableTCPServer(("0.0.0.0", self.port), handler)
-        self.thread = threading.Thread(target=self.httpd.serve_forever)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def shutdown(self):
-        if self.httpd:
-            self.httpd.shutdown()
-            self.httpd.server_close()
-
-    def join(self):
-        if self.thread:
-            self.thread.join()
-
-    def stop(self):
-        self.shutdown()
-        self.join()
-
-
 def trevor_infos(header, loaded_paths, init_script, ui):
     info = f"{header}\n"
     if ui:
@@ -975,6 +1330,8 @@ def start_trevor(
     serve_ui=None,
     include_experimental=None,
     address=None,
+    server="threaded",
+    compression=True,
 ):
     httpserver = None
     try:
@@ -999,7 +1356,7 @@ def start_trevor(
             code = init_script.read_text(encoding="utf-8")
             exec(code)
 
-        trevor = TrevorBus()
+        trevor = TrevorBus(server=server, compression=compression)
         trevor.start()
         if init_script and init_script.suffix == ".nly":
             # trevor.session.load_all(init_script)
@@ -1116,7 +1473,7 @@ def _trevor_menu(loaded_paths, init_script, trevor_bus=None, trevor_ui=None):
                         print("There is no friend around :(")
                         return
                     print("There is some friends here!")
-                    for friend_name, (friend_ip, friend_port) in friends.items():
+                    for friend_ip, (friend_name, friend_port) in friends.items():
                         local_us = friend_ip == "localhost"
                         us = get_my_ip() == friend_ip
                         flag = (
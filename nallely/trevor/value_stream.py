@@ -0,0 +1,104 @@
+import struct
+import threading
+from typing import Callable, Hashable
+
+CC_VALUES_FRAME = 1
+_HEADER = struct.Struct("<BH")
+_ENTRY = struct.Struct("<Hf")
+
+
+def encode_frame(values: dict[int, float], frame_type=CC_VALUES_FRAME) -> bytes:
+    """Binary frame: type (u8), count (u16), then count times index (u16) + value (f32)"""
+    frame = bytearray(_HEADER.size + _ENTRY.size * len(values))
+    _HEADER.pack_into(frame, 0, frame_type, len(values))
+    offset = _HEADER.size
+    for index, value in values.items():
+        _ENTRY.pack_into(frame, offset, index, value)
+        offset += _ENTRY.size
+    return bytes(frame)
+
+
+def merge_frames(pending: bytes, frame: bytes) -> bytes:
+    """Single frame with the values of both, the ones of frame win"""
+    frame_type, values = decode_frame(pending)
+    values.update(decode_frame(frame)[1])
+    return encode_frame(values, frame_type)
+
+
+def decode_frame(frame: bytes) -> tuple[int, dict[int, float]]:
+    frame_type, count = _HEADER.unpack_from(frame)
+    values = {}
+    for i in range(count):
+        index, value = _ENTRY.unpack_from(frame, _HEADER.size + i * _ENTRY.size)
+        values[index] = value
+    return frame_type, values
+
+
+class ControlValueStream:
+    """Last values of the watched parameters, sent as binary frames.
+
+    Each parameter key gets an index the first time one of its values is seen,
+    the table of the keys (the position in the table is the index) is part of
+    the state sent to the clients. update() is called for each incoming value
+    and only stores it, frame() returns the values that changed since the
+    previous frame, or None if nothing changed. Frames only carry deltas, a
+    frame not sent yet must be merged with the next one, not replaced.
+    """
+
+    def __init__(self):
+        self.indices: dict[Hashable, int] = {}
+        self.keys: list[Hashable] = []
+        self.current: list[float] = []
+        self.last: list[float | None] = []
+        self.published = 0
+        self.lock = threading.Lock()
+
+    def update(self, key: Hashable, value: float):
+        # retain() swaps the indices and the values, both are read under the lock
+        with self.lock:
+            index = self.indices.get(key)
+            if index is None:
+                self.keys.append(key)
+                self.current.append(value)
+                self.indices[key] = len(self.keys) - 1
+            else:
+                self.current[index] = value
+
+    def retain(self, keep: Callable[[Hashable], bool]) -> bool:
+        """Forgets the keys not kept, returns True if some were forgotten.
+
+        The indices of the remaining keys change: the table must be published
+        again, and the next frame carries all the values.
+        """
+        with self.lock:
+            keys = [key for key in self.keys if keep(key)]
+            if len(keys) == len(self.keys):
+                return False
+            self.current = [self.current[self.indices[key]] for key in keys]
+            self.indices = {key: index for index, key in enumerate(keys)}
+            self.keys = keys
+            self.last = []
+            self.published = 0
+        return True
+
+    def table(self):
+        with self.lock:
+            self.published = len(self.keys)
+            return list(self.keys)
+
+    def unpublished(self):
+        return self.published < len(self.keys)
+
+    def frame(self) -> bytes | None:
+        # values of indices the clients don't know yet wait for the next frame
+        current = self.current[: self.published]
+        last = self.last
+        if len(last) < len(current):
+            last.extend([None] * (len(current) - len(last)))
+        changed = {}
+        for index, value in enumerate(current):
+            if last[index] != value:
+                changed[index] = last[index] = value
+        if not changed:
+            return None
+        return encode_frame(changed)
@@ -13,6 +13,11 @@ from inspect import getmodule, getmro, getsource, isclass, isfunction, ismethod,
 from pathlib import Path
 from textwrap import dedent
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def longest_common_substring(s1: str, s2: str) -> str:
     if not s1 or not s2:
@@ -83,6 +88,36 @@ class StateEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+_state_encoder = StateEncoder(separators=(",", ":"))
+
+
+def to_json(obj) -> str:
+    """Compact JSON of a state or a message, encoded by orjson if it's installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj, default=_state_encoder.default, option=orjson.OPT_NON_STR_KEYS
+            ).decode()
+        except TypeError:
+            pass  # e.g. integers over 64 bits, json knows how to encode them
+    return _state_encoder.encode(obj)
+
+
+def from_json(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+@lru_cache(maxsize=256)
+def compile_cached(source: str, filename="<string>", mode="exec"):
+    """compile(), the code objects of the sources already compiled are reused
+
+    The UI sends the same snippets again (a cell run again, a class patch
+    applied again on reconnect), a code object can be executed many times.
+    Syntax errors are not cached, they are raised again.
+    """
+    return compile(source, filename, mode)
+
+
 NOTE_NAMES = [
     "C",
     "C#",
@@ -19,7 +19,8 @@ from .core import (
     VirtualParameter,
 )
 from .core.parameter_instances import PadsOrKeysInstance
-from .core.world import all_links, no_registration
+from .core.world import all_links, invalidate_schemas, no_registration
+from .outbound import ClientWriters, deflate
 
 
 @dataclass
@@ -115,10 +116,19 @@ class NetOutputEntry:
 class WebSocketBus(VirtualDevice):
     NAME = "WS"
 
-    def __init__(self, host="0.0.0.0", port=6789, **kwargs):
+    def __init__(self, host="0.0.0.0", port=6789, compression=True, **kwargs):
         self.forever = False  # Required to be explicit as we override __setattr__ to create waiting rooms on missing attributes
-        self.server = serve(self.handler, host=host, port=port)
+        self.port = port
+        self.server = serve(
+            self.handler,
+            host=host,
+            port=port,
+            compression=None,
+            extensions=deflate() if compression else None,
+        )
         self.connected = defaultdict(list)
+        # each client has its own outbound queue and writer thread
+        self.writers = ClientWriters(self.NAME, on_close=self.client_closed)
         self.known_services = {}
         self.to_update = None
         super().__init__(target_cycle_time=10, disable_output=True, **kwargs)
@@ -289,6 +299,20 @@ class WebSocketBus(VirtualDevice):
                 connected_devices.remove(client)
             except ValueError:
                 pass
+            self.writers.remove(client)
+
+    def client_closed(self, client, reason):
+        for service_name, connected_clients in self.connected.items():
+            try:
+                connected_clients.remove(client)
+            except ValueError:
+                continue
+            print(
+                f"[{self.NAME}] Client {client} on {service_name} {reason} [{len(connected_clients)} clients]"
+            )
+
+    def queue_metrics(self):
+        return self.writers.metrics()
 
     def setup(self):
         if self.running:
@@ -305,12 +329,14 @@ class WebSocketBus(VirtualDevice):
                 client.close(code=1000, reason="WebSocket Bus is shutting down")
                 # client.send(json.dumps({"on": "__close_bus__"}))
             clients.clear()
+        self.writers.clear()
         if self.server:
             print(f"[{self.NAME}] Shutting down websocket bus...")
             self.server.shutdown()
         for key, value in list(self.__class__.__dict__.items()):
             if isinstance(value, VirtualParameter):
                 delattr(self.__class__, key)
+        invalidate_schemas()
         super().stop(clear_queues)
 
     def store_input(self, param: str, value):
@@ -335,38 +361,26 @@ class WebSocketBus(VirtualDevice):
         devices = self.connected[device]
         # print(f"[DEBUG] set {parameter=}, {value=}")
         setattr(self, parameter, value)
+        if not devices:
+            return
+        try:
+            message = self.make_frame(parameter, float(value))
+        except struct.error as e:
+            print(f"[{self.NAME}] An error was caught while creating the frame: {e}")
+            print(f"[{self.NAME}] Switching to json to encode {parameter}: {value}")
+            message = json.dumps(
+                {
+                    "value": float(value),
+                    "device": device,
+                    "on": parameter,
+                    "sender": ctx.param,
+                }
+            )
+        # streams keep their last values, the others only need their last one
+        vparam = self.__class__.__dict__.get(f"{on}_cv")
+        key = None if vparam is not None and vparam.stream else parameter
         for connected in list(devices):
-            try:
-                # print(f"[DEBUG] send to {connected}")
-                connected.send(self.make_frame(parameter, float(value)))
-            except (ConnectionClosed, TimeoutError) as e:
-                try:
-                    devices.remove(device)
-                    kind = (
-                        "crashed"
-                        if isinstance(e, (ConnectionClosedError, TimeoutError))
-                        else "disconnected"
-                    )
-                    print(
-                        f"[{self.NAME}] Cannot send information on {parameter} for {connected}, it probably {kind} [{len(devices)} clients]"
-                    )
-                except Exception:
-                    pass
-            except struct.error as e:
-                print(
-                    f"[{self.NAME}] An error was caught while creating the frame: {e}"
-                )
-                print(f"[{self.NAME}] Switching to json to encode {parameter}: {value}")
-                connected.send(
-                    json.dumps(
-                        {
-                            "value": float(value),
-                            "device": device,
-                            "on": parameter,
-                            "sender": ctx.param,
-                        }
-                    )
-                )
+            self.writers.for_client(connected).send_value(message, key)
 
     def _add_ports(self, name, parameters: list[str | dict[str, Any]]):
         virtual_parameters = []
@@ -407,6 +421,7 @@ class WebSocketBus(VirtualDevice):
                 waiting_room.rebind(self)
             if param_name not in self.__dict__:
                 object.__setattr__(self, param_name, None)
+        invalidate_schemas()
         return virtual_parameters
 
     def add_ports_to_remote_device(self, name, parameters: list[str | dict[str, Any]]):
@@ -435,6 +450,7 @@ class WebSocketBus(VirtualDevice):
                 self.__class__,
                 parameter.cv_name,
             )
+        invalidate_schemas()
 
         if self.to_update:
             self.to_update.send_update(self)
@@ -476,6 +492,7 @@ class WebSocketBus(VirtualDevice):
                 delattr(self.__class__, param.cv_name)
             except Exception as e:
                 print(f"[{self.NAME}] {param.cv_name} is not find in the {self.NAME}")
+        invalidate_schemas()
 
         connected_clients = self.connected[service_name]
         for connected_client in connected_clients:
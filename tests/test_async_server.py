@@ -0,0 +1,61 @@
+import threading
+import time
+
+from websockets.sync.client import connect
+
+from nallely.outbound import ClientWriters
+from nallely.trevor.async_server import AsyncClientWriter, AsyncTrevorServer
+
+PORT = 6799
+
+
+class FakeBus:
+    def __init__(self):
+        self.events = []
+        self.worker_threads = set()
+        self.writers = ClientWriters("FakeBus")
+
+    def client_connected(self, client):
+        self.events.append(("connect", None))
+        self.writers.for_client(client).send("welcome")
+
+    def handleMessage(self, client, message):
+        self.worker_threads.add(threading.current_thread().name)
+        self.events.append(("message", message))
+        self.writers.for_client(client).send(f"echo {message}")
+
+    def client_disconnected(self, client):
+        self.events.append(("disconnect", None))
+        self.writers.remove(client)
+
+
+def test__async_server_dispatches_to_one_worker():
+    bus = FakeBus()
+    server = AsyncTrevorServer(bus, host="localhost", port=PORT, queue_size=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    assert server.ready.wait(5)
+    try:
+        with connect(f"ws://localhost:{PORT}/trevor") as client:
+            assert client.recv(timeout=5) == "welcome"
+            (writer,) = bus.writers.writers.values()
+            assert isinstance(writer, AsyncClientWriter)
+            for i in range(20):
+                client.send(f"m{i}")
+            answers = [client.recv(timeout=5) for _ in range(20)]
+        assert answers == [f"echo m{i}" for i in range(20)]
+
+        deadline = time.time() + 5
+        while ("disconnect", None) not in bus.events and time.time() < deadline:
+            time.sleep(0.01)
+        assert bus.events == [
+            ("connect", None),
+            *(("message", f"m{i}") for i in range(20)),
+            ("disconnect", None),
+        ]
+        assert bus.worker_threads == {"TrevorCommands"}
+        assert not bus.writers.writers
+    finally:
+        server.shutdown()
+        thread.join(5)
+    assert not thread.is_alive()
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from nallely.trevor.broadcaster import UpdateBroadcaster
+
+
+def test__broadcaster_coalesces_requests():
+    sent = []
+    state = {"value": 0}
+    broadcaster = UpdateBroadcaster(lambda: sent.append(state["value"]), 0.05)
+    broadcaster.ensure_running()
+    try:
+        for i in range(1, 1001):
+            state["value"] = i
+            broadcaster.mark_dirty()
+        time.sleep(0.2)
+    finally:
+        broadcaster.stop()
+
+    assert 1 <= len(sent) <= 3
+    assert sent[-1] == 1000
+
+
+def test__broadcaster_rate_limited():
+    times = []
+    broadcaster = UpdateBroadcaster(lambda: times.append(time.perf_counter()), 0.02)
+    broadcaster.ensure_running()
+    try:
+        end = time.perf_counter() + 0.3
+        while time.perf_counter() < end:
+            broadcaster.mark_dirty()
+            time.sleep(0.001)
+        time.sleep(0.05)
+    finally:
+        broadcaster.stop()
+
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert len(times) <= 0.3 / 0.02 + 2
+    assert min(gaps) >= 0.02 * 0.9
+
+
+def test__broadcaster_delivers_request_made_while_sending():
+    sending = threading.Event()
+    release = threading.Event()
+    sent = []
+    state = {"value": 0}
+
+    def send():
+        value = state["value"]
+        sending.set()
+        release.wait(1)
+        sent.append(value)
+
+    broadcaster = UpdateBroadcaster(send, 0.01)
+    broadcaster.ensure_running()
+    try:
+        state["value"] = 1
+        broadcaster.mark_dirty()
+        assert sending.wait(1)
+        state["value"] = 2
+        broadcaster.mark_dirty()
+        release.set()
+        time.sleep(0.1)
+    finally:
+        broadcaster.stop()
+
+    assert sent == [1, 2]
+
+
+def test__broadcaster_survives_send_errors():
+    calls = []
+
+    def send():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("boom")
+
+    broadcaster = UpdateBroadcaster(send, 0.01)
+    broadcaster.ensure_running()
+    try:
+        broadcaster.mark_dirty()
+        time.sleep(0.05)
+        broadcaster.mark_dirty()
+        time.sleep(0.05)
+    finally:
+        broadcaster.stop()
+
+    assert len(calls) == 2
@@ -0,0 +1,64 @@
+import pytest
+
+import nallely
+from nallely import VirtualDevice
+from nallely.session import Session
+from nallely.utils import compile_cached
+
+PATCH = """class PatchedDevice(VirtualDevice):
+    def main(self, ctx):
+        return 1
+"""
+
+
+class PatchedDevice(VirtualDevice):
+    def main(self, ctx):
+        return 0
+
+
+@pytest.fixture
+def device():
+    device = PatchedDevice()
+    device.start()
+    yield device
+    nallely.stop_all_connected_devices()
+
+
+def test__compile_cached_reuses_code_objects():
+    code = compile_cached("a = 1\n", "<string>")
+    assert compile_cached("a = 1\n", "<string>") is code
+    assert compile_cached("a = 1\n", "<other>") is not code
+    with pytest.raises(SyntaxError):
+        compile_cached("a = ", "<string>")
+
+
+def test__same_class_patch_not_compiled_again(device):
+    meta = Session().meta_trevor
+    meta.object_centric_compile_inject(device, PATCH)
+    patched = device.__class__
+    assert patched.__name__ == "t_PatchedDevice"
+    assert device.main({}) == 1
+
+    meta.object_centric_compile_inject(device, PATCH)
+    assert device.__class__ is patched
+
+    meta.object_centric_compile_inject(device, PATCH.replace("1", "2"))
+    assert device.__class__ is not patched
+    assert device.main({}) == 2
+
+
+def test__same_method_not_injected_again(device):
+    meta = Session().meta_trevor
+    meta.object_centric_compile_inject(device, PATCH)
+    cls = device.__class__
+    method = "def main(self, ctx):\n    return 3\n"
+    meta.compile_inject(device, "main", method)
+    main = cls.main
+    assert device.main({}) == 3
+
+    meta.compile_inject(device, "main", method)
+    assert cls.main is main
+
+    # the class was changed by the method, the whole patch is applied again
+    meta.object_centric_compile_inject(device, PATCH)
+    assert device.main({}) == 1
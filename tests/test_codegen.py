@@ -136,6 +136,52 @@ def test__midi_device_generator_accepted_values(tmp_path):
     assert "accepted_values=['OFF', 'ON', 'NEW']" in content
 
 
+def test__midi_device_generator_sysex_dump(tmp_path):
+    device = {
+        "KORG": {
+            "NTS1": {
+                "oscillator": {"shape": {"cc": 54}},
+                "sysex_dump": {
+                    "header": [0x42, 0x30],
+                    "layout": [0x01, "oscillator.shape"],
+                    "packet_size": 32,
+                },
+            }
+        }
+    }
+
+    out_file = tmp_path / "mydev.py"
+    generate_code(device, out_file)
+
+    content = out_file.read_text()
+
+    assert "class Sysex_dumpSection" not in content
+    assert (
+        "sysex_dump = nallely.SysexDump(header=[66, 48], layout=[1, 'oscillator.shape'], packet_size=32)"
+        in content
+    )
+    ast.parse(content)
+
+
+def test__midi_device_generator_highres(tmp_path):
+    device = {
+        "SEQUENTIAL": {
+            "Take5": {
+                "filter": {
+                    "cutoff": {"cc": 0x0105, "type": "nrpn"},
+                    "drive": {"cc": 20},
+                }
+            }
+        }
+    }
+    out_file = tmp_path / "mydev.py"
+    generate_code(device, out_file)
+    content = out_file.read_text()
+
+    assert "cutoff = nallely.ModuleParameter(261, type='nrpn')" in content
+    assert "drive = nallely.ModuleParameter(20)" in content
+
+
 def test__parse_docstring_type():
     docstring = """
     Simple module
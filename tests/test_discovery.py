@@ -0,0 +1,97 @@
+import time
+
+from nallely.distributed import PeerBeacon, discovery
+
+PORT = 6795
+
+
+def beacon(name, trevor_port, changes=None):
+    return PeerBeacon(
+        lambda: {"name": name, "ports": {"trevor": trevor_port}, "load": 0.5},
+        port=PORT,
+        address="127.255.255.255",
+        interval=0.1,
+        timeout=0.5,
+        on_change=changes.append if changes is not None else None,
+    )
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test__beacons_on_loopback():
+    changes = []
+    beacons = [beacon("ergo", 6788, changes), beacon("psi", 6888), beacon("harm", 6988)]
+    for b in beacons:
+        b.ensure_running()
+    try:
+        assert wait_for(lambda: all(len(b.snapshot()) == 3 for b in beacons))
+        peers = beacons[0].snapshot()
+        assert set(peers) == {b.id for b in beacons}
+        peer = peers[beacons[1].id]
+        assert (peer.ip, peer.name, peer.ports, peer.load) == (
+            "127.0.0.1",
+            "psi",
+            {"trevor": 6888},
+            0.5,
+        )
+        assert changes and len(changes[-1]) == 3
+
+        # a peer which stops announcing itself is forgotten
+        beacons[2].stop()
+        assert wait_for(lambda: len(beacons[0].snapshot()) == 2)
+        assert beacons[2].id not in changes[-1]
+    finally:
+        for b in beacons:
+            b.stop()
+
+
+def test__beacon_ignores_other_datagrams():
+    b = beacon("ergo", 6788)
+    try:
+        assert b.receive(b"not json", "127.0.0.1") is False
+        assert b.receive(b'{"command": "ping"}', "127.0.0.1") is False
+        assert b.receive(b"[1, 2]", "127.0.0.1") is False
+        assert b.receive(b'{"nallely": "abc", "name": "psi"}', "10.0.0.2") is True
+        assert b.receive(b'{"nallely": "abc", "name": "psi"}', "10.0.0.2") is False
+        assert b.snapshot()["abc"].ip == "10.0.0.2"
+    finally:
+        b.stop()
+
+
+def test__beacon_sent_on_each_network(monkeypatch):
+    class Recorder:
+        def __init__(self):
+            self.targets = []
+
+        def sendto(self, data, target):
+            self.targets.append(target)
+
+    b = PeerBeacon(lambda: {"name": "ergo"}, port=PORT)
+    recorder, b.socket = b.socket, Recorder()
+    try:
+        monkeypatch.setattr(
+            discovery, "broadcast_addresses", lambda: ["10.0.0.255", "192.168.1.255"]
+        )
+        b.send_beacon()
+        monkeypatch.setattr(discovery, "broadcast_addresses", lambda: [])
+        b.send_beacon()
+        assert b.socket.targets == [
+            ("10.0.0.255", PORT),
+            ("192.168.1.255", PORT),
+            ("<broadcast>", PORT),
+        ]
+        assert b.sent == 3
+    finally:
+        b.socket = recorder
+        b.stop()
+
+
+def test__broadcast_addresses():
+    for address in discovery.broadcast_addresses():
+        assert address != "0.0.0.0"
+        assert len(address.split(".")) == 4
@@ -0,0 +1,201 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import mido
+import pytest
+
+import nallely
+from nallely.core.highres import HighResDecoder, HighResEncoder
+
+
+class RecordingPort:
+    def __init__(self):
+        self.received = []
+
+    def send(self, msg):
+        self.received.append(msg)
+
+
+@dataclass
+class HighResModule(nallely.Module):
+    cutoff = nallely.ModuleParameter(16, type="control_change14")
+    resonance = nallely.ModuleParameter(0x0105, type="nrpn")
+    drive = nallely.ModuleParameter(20)
+
+
+class HighResDevice(nallely.MidiDevice):
+    def __init__(self, name="hires"):
+        super().__init__(
+            device_name=name,
+            autoconnect=False,
+            modules_descr={"main": HighResModule},
+        )
+
+
+@pytest.fixture
+def device():
+    device = HighResDevice()
+    device.outport = RecordingPort()  # type: ignore
+    yield device
+    device.outport = None
+    nallely.stop_all_connected_devices()
+
+
+def sent(device):
+    pairs = [(m.control, m.value) for m in device.outport.received]
+    device.outport.received.clear()
+    return pairs
+
+
+def test__encoder_minimal_delta():
+    encoder = HighResEncoder()
+    assert encoder.encode("control_change14", 16, 8192, 0) == [(16, 64), (48, 0)]
+    assert encoder.encode("control_change14", 16, 8193, 0) == [(48, 1)]
+    assert encoder.encode("control_change14", 16, 8193, 0) == []
+    assert encoder.encode("control_change14", 16, 300, 0) == [(16, 2), (48, 44)]
+
+    assert encoder.encode("nrpn", 0x0105, 1000, 0) == [
+        (99, 2),
+        (98, 5),
+        (6, 7),
+        (38, 104),
+    ]
+    assert encoder.encode("nrpn", 0x0105, 1001, 0) == [(38, 105)]
+    assert encoder.encode("rpn", 0, 8192, 0) == [(101, 0), (100, 0), (6, 64), (38, 0)]
+    # another parameter was selected in between
+    assert encoder.encode("nrpn", 0x0105, 1002, 0) == [
+        (99, 2),
+        (98, 5),
+        (6, 7),
+        (38, 106),
+    ]
+
+
+def test__decoder_assembles_pairs():
+    decoder = HighResDecoder()
+    decoder.register("control_change14", 16)
+    decoder.register("nrpn", 0x0105)
+    assert decoder.consumes(0, 16) and decoder.consumes(0, 48)
+    assert not decoder.consumes(0, 20)
+    # data entry only while a registered (N)RPN is selected
+    assert not decoder.consumes(0, 6)
+    assert decoder.follows(99) and not decoder.consumes(0, 99)
+
+    assert decoder.feed(0, 16, 64) is None
+    event = decoder.feed(0, 48, 1)
+    assert (event.type, event.control, event.value) == ("control_change14", 16, 8193)
+
+    for control, value in [(99, 2), (98, 5), (6, 7)]:
+        assert decoder.feed(0, control, value) is None
+    assert decoder.consumes(0, 6) and not decoder.consumes(1, 6)
+    event = decoder.feed(0, 38, 104)
+    assert (event.type, event.control, event.value) == ("nrpn", 0x0105, 1000)
+
+    # unknown parameter
+    for control, value in [(99, 3), (98, 5), (6, 7)]:
+        decoder.feed(0, control, value)
+    assert not decoder.consumes(0, 6)
+    assert decoder.feed(0, 38, 104) is None
+
+
+def test__highres_parameter_output(device):
+    assert HighResModule.cutoff.range == (0, 16383)
+    device.modules.main.cutoff = 10000
+    device.modules.main.cutoff = 10001
+    assert sent(device) == [(16, 78), (48, 16), (48, 17)]
+    assert device.modules.main.cutoff == 10001
+
+    device.modules.main.resonance = 129
+    device.modules.main.resonance = 130
+    assert sent(device) == [(99, 2), (98, 5), (6, 1), (38, 1), (38, 2)]
+
+    device.modules.main.drive = 64
+    assert sent(device) == [(20, 64)]
+
+
+def test__highres_concurrent_nrpn_wire_order(device):
+    class SlowPort(RecordingPort):
+        def send(self, msg):
+            super().send(msg)
+            time.sleep(0)  # lets the other thread run in the middle of a NRPN
+
+    device.outport = SlowPort()  # type: ignore
+    values = {
+        0x0105: list(range(0, 16000, 80)),
+        0x0206: list(range(16000, 0, -80)),
+    }
+
+    def send_all(number):
+        for value in values[number]:
+            device.highres_change("nrpn", number, value)
+
+    threads = [threading.Thread(target=send_all, args=(n,)) for n in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    decoder = HighResDecoder()
+    for number in values:
+        decoder.register("nrpn", number)
+    received = {number: [] for number in values}
+    for msg in device.outport.received:
+        event = decoder.feed(msg.channel, msg.control, msg.value)
+        if event:
+            received[event.control].append(event.value)
+    assert received == values
+
+
+def test__highres_parameter_input(device):
+    received = []
+    target = HighResDevice("target")
+    target.outport = RecordingPort()  # type: ignore
+    target.modules.main.cutoff = device.modules.main.resonance
+    device.on_midi_message = lambda _, msg, control: received.append(
+        (msg.value, control.name)
+    )
+
+    for control, value in [(99, 2), (98, 5), (6, 64), (38, 0)]:
+        device._sync_state(mido.Message("control_change", control=control, value=value))
+
+    assert received == [(8192, "resonance")]
+    assert device.modules.main.resonance == 8192
+    # one event in, one 14bits value out
+    assert [(m.control, m.value) for m in target.outport.received] == [
+        (16, 64),
+        (48, 0),
+    ]
+    target.outport = None
+
+
+@dataclass
+class DataEntryModule(nallely.Module):
+    resonance = nallely.ModuleParameter(0x0105, type="nrpn")
+    volume = nallely.ModuleParameter(6)
+    select = nallely.ModuleParameter(99)
+
+
+def test__data_entry_ccs_as_7bits_parameters():
+    device = nallely.MidiDevice(
+        device_name="dataentry",
+        autoconnect=False,
+        modules_descr={"main": DataEntryModule},
+    )
+
+    def cc(control, value):
+        device._sync_state(mido.Message("control_change", control=control, value=value))
+
+    cc(6, 100)
+    assert device.modules.main.volume == 100
+    for control, value in [(99, 2), (98, 5), (6, 64), (38, 0)]:
+        cc(control, value)
+    assert device.modules.main.resonance == 8192
+    assert device.modules.main.volume == 100
+    assert device.modules.main.select == 2
+    # RPN null, nothing registered is selected anymore
+    cc(101, 127)
+    cc(100, 127)
+    cc(6, 10)
+    assert device.modules.main.volume == 10
+    nallely.stop_all_connected_devices()
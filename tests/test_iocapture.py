@@ -0,0 +1,82 @@
+import threading
+import time
+
+from nallely.trevor.trevor_bus import IOCapture
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test__iocapture_batches_output():
+    values = []
+    capture = IOCapture(values.append, interval=0.05)
+    for i in range(1000):
+        print(i, file=capture)
+    expected = "".join(f"{i}\n" for i in range(1000))
+    assert wait_for(lambda: "".join(v["line"] for v in values) == expected)
+    assert len(values) < 10
+    assert all(v["command"] == "stdout" for v in values)
+
+
+def test__iocapture_never_waits_for_the_ui():
+    def slow_send(message):
+        time.sleep(0.5)
+
+    capture = IOCapture(slow_send, interval=0.01, max_pending=1000)
+    start = time.perf_counter()
+    for i in range(10000):
+        print("x" * 10, file=capture)
+    assert time.perf_counter() - start < 0.5
+    assert capture.pending <= 1000
+
+
+def test__iocapture_truncates_the_oldest_output():
+    values = []
+    capture = IOCapture(values.append, interval=0.2, max_pending=100)
+    for i in range(100):
+        print(f"line {i:02}", file=capture)
+    assert wait_for(lambda: values)
+    line = values[0]["line"]
+    assert line.startswith("[... 700 characters dropped ...]\n")
+    assert line.endswith("line 99\n")
+    assert len(line) == len("[... 700 characters dropped ...]\n") + 100
+
+
+def test__iocapture_prompt_before_stdin_marker():
+    messages, values = [], []
+    capture = IOCapture(messages.append, interval=10)
+    capture.write("name? ")
+    reader = threading.Thread(target=lambda: values.append(capture.readline()))
+    reader.start()
+    assert wait_for(lambda: messages)
+    assert messages[0]["line"] == f"name? <stdin:{reader.ident}>"
+    capture.write_stdin("trevor", thread_id=reader.ident)
+    reader.join(5)
+    assert values == ["trevor\n"]
+
+
+def test__iocapture_send_output_before_an_error():
+    messages = []
+    capture = IOCapture(messages.append, interval=10)
+    print("Traceback...", file=capture)
+    capture.send_output()
+    messages.append({"command": "error"})
+    assert messages == [
+        {"command": "stdout", "line": "Traceback...\n"},
+        {"command": "error"},
+    ]
+    capture.send_output()
+    assert len(messages) == 2
+
+
+def test__iocapture_stop_flushes_and_ends_the_flusher():
+    messages = []
+    capture = IOCapture(messages.append, interval=10)
+    print("bye", file=capture)
+    capture.stop()
+    assert not capture.flusher.is_alive()
+    assert messages == [{"command": "stdout", "line": "bye\n"}]
@@ -0,0 +1,54 @@
+import random
+
+import mido
+import pytest
+
+import nallely
+from nallely.core.midi_clock import PPQN, MidiClockPLL, active_midi_clock
+
+from .fixtures import MidiSender
+
+
+def test__pll_smooth_tempo_from_jittery_ticks():
+    pll = MidiClockPLL()
+    pll.start()
+    period = 60 / 120 / PPQN
+    rng = random.Random(42)
+    t = 100.0
+    for i in range(PPQN * 16):
+        pll.tick(t + i * period + rng.uniform(-0.002, 0.002))
+
+    assert pll.bpm == pytest.approx(120, abs=0.5)
+    assert pll.ticks == PPQN * 16 - 1
+    position = pll.position(t + (PPQN * 16 - 1) * period)
+    assert position == pytest.approx(16 - 1 / PPQN, abs=0.1)
+
+
+def test__pll_transport():
+    pll = MidiClockPLL()
+    assert pll.position(0) is None
+    pll.start()
+    pll.tick(1.0)
+    assert pll.position(1.0) == 0
+    pll.stop()
+    pll.tick(1.02)
+    assert pll.position(1.02) is None
+    pll.song_position(4)  # 4 sixteenths, 1 quarter note
+    pll.cont()
+    pll.tick(1.04)
+    assert pll.position(1.04) == pytest.approx(1)
+
+
+def test__midi_device_clock_input():
+    sender = MidiSender()
+    try:
+        sender._sync_state(mido.Message("start"))
+        for i in range(PPQN):
+            sender._sync_state(mido.Message("clock", time=10 + i * 0.02))
+        assert sender.clock_input.running
+        assert sender.clock_input.bpm == pytest.approx(125)
+        assert active_midi_clock(10 + PPQN * 0.02) is sender.clock_input
+        sender._sync_state(mido.Message("stop"))
+        assert active_midi_clock(10 + PPQN * 0.02) is None
+    finally:
+        nallely.stop_all_connected_devices()
@@ -0,0 +1,67 @@
+import mido
+
+from nallely.core.midi_ports import MidiPortRegistry, PortEvent
+
+
+def test__port_registry_emits_hotplug_events(monkeypatch):
+    inputs = ["synth in"]
+    outputs = ["synth out"]
+    monkeypatch.setattr(mido, "get_input_names", lambda: list(inputs))
+    monkeypatch.setattr(mido, "get_output_names", lambda: list(outputs))
+
+    registry = MidiPortRegistry(min_interval=0)
+    received = []
+    registry.add_listener(received.extend)
+
+    # First enumeration only fills the cache
+    registry.refresh()
+    assert registry.inputs == ["synth in"]
+    assert received == []
+
+    inputs.append("controller in")
+    outputs.remove("synth out")
+    registry.refresh()
+
+    assert received == [
+        PortEvent("connected", "input", "controller in"),
+        PortEvent("disconnected", "output", "synth out"),
+    ]
+    assert registry.outputs == []
+
+
+def test__port_registry_rate_limit_and_failures(monkeypatch):
+    calls = []
+
+    def get_names():
+        calls.append(1)
+        return ["port"]
+
+    monkeypatch.setattr(mido, "get_input_names", get_names)
+    monkeypatch.setattr(mido, "get_output_names", get_names)
+
+    registry = MidiPortRegistry(min_interval=60)
+    registry.refresh(force=True)
+    registry.refresh()
+    assert len(calls) == 2  # only one enumeration (inputs + outputs)
+
+    def failing():
+        raise OSError("no backend")
+
+    monkeypatch.setattr(mido, "get_input_names", failing)
+    assert registry.refresh(force=True) == []
+    assert registry.inputs == ["port"]  # cache is kept
+
+
+def test__port_registry_find(monkeypatch):
+    monkeypatch.setattr(mido, "get_input_names", lambda: ["NTS-1 digital kit:in 20:0"])
+    monkeypatch.setattr(
+        mido, "get_output_names", lambda: ["NTS-1 digital kit:out 20:0"]
+    )
+
+    registry = MidiPortRegistry(min_interval=0)
+    registry.refresh(force=True)
+    registry._running = True  # avoid starting the thread for the test
+
+    assert registry.find_output("NTS-1") == "NTS-1 digital kit:out 20:0"
+    assert registry.find_input("NTS-1") == "NTS-1 digital kit:in 20:0"
+    assert registry.find_input("Minilogue") is None
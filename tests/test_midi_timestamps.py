@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+import nallely
+from nallely.core.virtual_device import event_time
+from nallely.core.world import ThreadContext
+
+from .fixtures import MidiSender
+
+
+@pytest.fixture
+def sender():
+    device = MidiSender()
+    yield device
+    nallely.stop_all_connected_devices()
+
+
+def test__input_timestamps_from_backend_deltas(sender):
+    received = []
+    sender._sync_state = lambda msg: received.append(msg.time)
+
+    before = time.perf_counter()
+    sender._rtmidi_callback(([0xB0, 45, 10], 0.0), None)
+    time.sleep(0.05)
+    # the callback is late, the backend says the messages arrived 20ms and
+    # 30ms after the first one
+    sender._rtmidi_callback(([0xB0, 45, 11], 0.02), None)
+    sender._rtmidi_callback(([0xB0, 45, 12], 0.01), None)
+
+    first, second, third = received
+    assert first >= before
+    assert second - first == pytest.approx(0.02)
+    assert third - first == pytest.approx(0.03)
+
+
+def test__input_timestamps_reanchor_on_drift(sender):
+    received = []
+    sender._sync_state = lambda msg: received.append(msg.time)
+
+    sender._rtmidi_callback(([0xB0, 45, 10], 0.0), None)
+    time.sleep(0.01)
+    # a delta in the future cannot be trusted
+    sender._rtmidi_callback(([0xB0, 45, 11], 5.0), None)
+
+    assert received[1] <= time.perf_counter()
+
+
+def test__event_time():
+    assert event_time(ThreadContext({"timestamp": 12.5})) == 12.5
+    now = time.perf_counter()
+    assert event_time(ThreadContext()) >= now
+    assert event_time() >= now
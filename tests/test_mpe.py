@@ -0,0 +1,150 @@
+import time
+from dataclasses import dataclass
+
+import mido
+import pytest
+
+import nallely
+from nallely import VoiceAllocator
+from nallely.core.mpe import MPEZone
+from nallely.trevor.trevor_api import TrevorAPI
+
+
+@dataclass
+class ControllerModule(nallely.Module):
+    zone = nallely.ModuleMPE(zone="lower", members=15)
+    slider = nallely.ModuleParameter(20)
+
+
+class MPEController(nallely.MidiDevice):
+    def __init__(self):
+        super().__init__(
+            device_name="mpe",
+            autoconnect=False,
+            modules_descr={"main": ControllerModule},
+        )
+
+    @property
+    def main(self) -> ControllerModule:
+        return self.modules.main
+
+
+@pytest.fixture
+def controller():
+    device = MPEController()
+    yield device
+    nallely.stop_all_connected_devices()
+    nallely.stop_all_virtual_devices()
+
+
+def test__mpe_zone_voices():
+    zone = MPEZone("lower", members=3)
+    assert zone.members == [1, 2, 3]
+    assert zone.feed(mido.Message("note_on", channel=4, note=60)) is None
+
+    type, value, voice = zone.feed(
+        mido.Message("note_on", channel=2, note=60, velocity=90)
+    )
+    assert (type, value, voice.channel, voice.velocity) == ("note_on", 60, 2, 90)
+    type, value, same = zone.feed(mido.Message("pitchwheel", channel=2, pitch=400))
+    assert same is voice and (type, value, voice.pitch) == ("pitchwheel", 400, 400)
+    assert zone.feed(mido.Message("aftertouch", channel=2, value=30))[0] == "pressure"
+    assert (
+        zone.feed(mido.Message("control_change", channel=2, control=74, value=9))[0]
+        == "timbre"
+    )
+    assert (voice.pressure, voice.timbre) == (30, 9)
+    assert zone.feed(mido.Message("note_off", channel=2, note=60))[0] == "note_off"
+    assert not voice.active
+
+    upper = MPEZone("upper", members=2)
+    assert upper.members == [14, 13]
+
+
+def test__mpe_configuration_message():
+    zone = MPEZone("lower")
+    for control, value in [(101, 0), (100, 6), (6, 5)]:
+        zone.feed(
+            mido.Message("control_change", channel=0, control=control, value=value)
+        )
+    assert zone.members == [1, 2, 3, 4, 5]
+
+
+def test__mpe_zone_one_link_to_voice_allocator(controller):
+    allocator = VoiceAllocator()
+    allocator.start()
+    allocator.input_cv = controller.modules.main.zone
+    assert len(controller.links_registry) == 1
+
+    for channel, note in [(1, 60), (2, 64), (3, 67)]:
+        controller._sync_state(
+            mido.Message("note_on", channel=channel, note=note, velocity=100)
+        )
+        controller._sync_state(
+            mido.Message("pitchwheel", channel=channel, pitch=channel * 100)
+        )
+    controller._sync_state(mido.Message("note_off", channel=2, note=64))
+    time.sleep(0.2)
+
+    assert allocator.allocated == [60, None, 67, None]
+    voices = controller.modules.main.zone.voices
+    assert [voices[c].pitch for c in (1, 2, 3)] == [100, 200, 300]
+    assert [voices[c].active for c in (1, 2, 3)] == [True, False, True]
+
+
+def test__mpe_zone_linked_from_trevor(controller):
+    allocator = VoiceAllocator()
+    allocator.start()
+    link = TrevorAPI().associate_parameters(
+        f"{controller.uuid}::main::zone", f"{allocator.uuid}::__virtual__::input_cv"
+    )
+    assert link.chain is not None
+    src = link.to_dict()["src"]
+    assert (src["type"], src["parameter"]["name"]) == ("mpe", "zone")
+
+    received = []
+    link.callback = lambda value, ctx: received.append((ctx.type, value))
+    for msg in [
+        mido.Message("note_on", channel=1, note=60, velocity=100),
+        mido.Message("pitchwheel", channel=1, pitch=8191),
+        mido.Message("pitchwheel", channel=1, pitch=0),
+        mido.Message("pitchwheel", channel=1, pitch=-8192),
+    ]:
+        controller._sync_state(msg)
+
+    # notes and expressions share the range of the zone (0..127)
+    assert received[0] == ("note_on", 60)
+    assert [type for type, _ in received[1:]] == ["pitchwheel"] * 3
+    assert [round(value, 2) for _, value in received[1:]] == [127, 64, 0]
+
+
+@dataclass
+class TwoZonesModule(nallely.Module):
+    lower = nallely.ModuleMPE(zone="lower", members=7)
+    upper = nallely.ModuleMPE(zone="upper", members=7)
+
+
+class TwoZonesController(nallely.MidiDevice):
+    def __init__(self):
+        super().__init__(
+            device_name="mpe2",
+            autoconnect=False,
+            modules_descr={"main": TwoZonesModule},
+        )
+
+
+def test__mpe_zones_have_their_own_links():
+    controller = TwoZonesController()
+    received = {"lower": [], "upper": []}
+    for name in received:
+        allocator = VoiceAllocator()
+        allocator.input_cv = getattr(controller.modules.main, name)
+        link = getattr(controller.modules.main, name).outgoing_links[0]
+        link.callback = lambda value, ctx, name=name: received[name].append(value)
+
+    controller._sync_state(mido.Message("note_on", channel=1, note=60, velocity=100))
+    controller._sync_state(mido.Message("note_on", channel=14, note=72, velocity=100))
+
+    assert received == {"lower": [60], "upper": [72]}
+    nallely.stop_all_connected_devices()
+    nallely.stop_all_virtual_devices()
@@ -0,0 +1,170 @@
+import threading
+import time
+
+from websockets import ConnectionClosedOK
+from websockets.frames import Close
+
+from nallely.outbound import ClientWriter, ClientWriters
+
+
+class SlowClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = []
+        self.closed = False
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def send(self, message):
+        self.gate.wait(2)
+        if self.closed:
+            raise ConnectionClosedOK(Close(1000, ""), None)
+        time.sleep(self.delay)
+        self.received.append(message)
+
+    def close(self):
+        self.closed = True
+
+
+def wait_until(predicate, timeout=2):
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test__writer_keeps_control_messages_order():
+    client = SlowClient()
+    writer = ClientWriter(client)
+    writer.start()
+    try:
+        for i in range(100):
+            writer.send(i)
+        assert wait_until(lambda: len(client.received) == 100)
+    finally:
+        writer.stop()
+    assert client.received == list(range(100))
+
+
+def test__writer_coalesces_keyed_values():
+    client = SlowClient()
+    client.gate.clear()
+    writer = ClientWriter(client)
+    writer.start()
+    try:
+        writer.send_value("first", key="a")
+        assert wait_until(lambda: writer.pending == 0)  # blocked in send
+        for i in range(50):
+            writer.send_value(f"a{i}", key="a")
+            writer.send_value(f"b{i}", key="b")
+        writer.send("control")
+        client.gate.set()
+        assert wait_until(lambda: len(client.received) == 4)
+    finally:
+        writer.stop()
+    assert client.received == ["first", "control", "a49", "b49"]
+    assert writer.coalesced == 98
+
+
+def test__writer_merges_keyed_values():
+    client = SlowClient()
+    client.gate.clear()
+    writer = ClientWriter(client)
+    writer.start()
+    try:
+        writer.send_value({"x": 0}, key="cc")
+        assert wait_until(lambda: writer.pending == 0)
+        for delta in ({"x": 1}, {"y": 2}, {"x": 3}):
+            writer.send_value(delta, key="cc", merge=lambda a, b: {**a, **b})
+        writer.send_value({"z": 4}, key="dropped")
+        writer.discard_value("dropped")
+        client.gate.set()
+        assert wait_until(lambda: len(client.received) == 2)
+    finally:
+        writer.stop()
+    assert client.received == [{"x": 0}, {"x": 3, "y": 2}]
+
+
+def test__writer_drops_oldest_values():
+    client = SlowClient()
+    client.gate.clear()
+    writer = ClientWriter(client, max_values=10)
+    writer.start()
+    try:
+        writer.send_value(-1)
+        assert wait_until(lambda: writer.pending == 0)
+        for i in range(100):
+            writer.send_value(i)
+        assert writer.metrics()["values"] == 10
+        client.gate.set()
+        assert wait_until(lambda: len(client.received) == 11)
+    finally:
+        writer.stop()
+    assert client.received == [-1, *range(90, 100)]
+    assert writer.dropped == 90
+
+
+def test__writer_disconnects_slow_clients():
+    client = SlowClient()
+    client.gate.clear()
+    closed = []
+    writers = ClientWriters("test", on_close=lambda c, r: closed.append((c, r)))
+    writers.options["max_pending"] = 10
+    writer = writers.for_client(client)
+    writer.send("blocking")
+    assert wait_until(lambda: writer.pending == 0)
+    for i in range(10):
+        assert writer.send(i)
+    assert writer.send("too much")
+    assert not writer.send("after")
+    client.gate.set()
+    assert wait_until(lambda: closed == [(client, "too slow")])
+    assert client.closed
+    assert len(writers) == 0
+
+
+def test__writer_reports_closed_connections():
+    client = SlowClient()
+    client.closed = True
+    closed = []
+    writers = ClientWriters("test", on_close=lambda c, r: closed.append(r))
+    writers.for_client(client).send("message")
+    assert wait_until(lambda: closed == ["disconnected"])
+
+
+def test__writers_metrics():
+    client = SlowClient()
+    client.gate.clear()
+    writers = ClientWriters("test")
+    try:
+        writer = writers.for_client(client)
+        writer.send("blocking")
+        assert wait_until(lambda: writer.pending == 0)
+        writer.send("a")
+        writer.send_value(1, key="x")
+        writer.send_value(2, key="x")
+        metrics = writers.metrics()[str(id(client))]
+        assert metrics["pending"] == 2
+        assert metrics["control"] == 1
+        assert metrics["values"] == 1
+        assert metrics["coalesced"] == 1
+        assert metrics["high_water"] == 2
+    finally:
+        client.gate.set()
+        writers.clear()
+
+
+def test__writers_not_recreated_for_removed_clients():
+    client = SlowClient()
+    writers = ClientWriters("test")
+    writer = writers.for_client(client)
+    writers.remove(client)
+    assert wait_until(lambda: not writer.is_alive())
+
+    # a broadcast racing with the disconnection
+    late = writers.for_client(client)
+    assert not late.send("late")
+    assert not late.is_alive()
+    assert len(writers) == 0
@@ -0,0 +1,91 @@
+import time
+
+import mido
+import pytest
+
+import nallely
+
+from .fixtures import MidiReceiver, MidiSender
+
+
+class RecordingPort:
+    def __init__(self):
+        self.received = []
+
+    def send(self, msg):
+        self.received.append((time.perf_counter(), msg))
+
+
+@pytest.fixture
+def receiver():
+    device = MidiReceiver()
+    device.debug = False
+    device.outport = RecordingPort()  # type: ignore
+    yield device
+    device.outport = None
+    nallely.stop_all_connected_devices()
+
+
+def sent(device):
+    return [(msg.control, msg.value) for _, msg in device.outport.received]
+
+
+def test__preset_diff_only_sends_changes(receiver):
+    preset = {"main": {"sink1": 10, "sink2": 20}}
+    receiver.load_preset(dct=preset)
+    assert sent(receiver) == [(99, 10), (110, 20)]
+
+    receiver.outport.received.clear()
+    receiver.load_preset(dct={"main": {"sink1": 10, "sink2": 30}})
+    assert sent(receiver) == [(110, 30)]
+
+    receiver.outport.received.clear()
+    receiver.load_preset(dct={"main": {"sink1": 10, "sink2": 30}}, diff=False)
+    assert sent(receiver) == [(99, 10), (110, 30)]
+
+
+def test__preset_diff_sends_unknown_values(receiver):
+    # sink2 has the init value but we don't know if it's the one on the device
+    receiver.load_preset(dct={"main": {"sink2": 0}})
+    assert sent(receiver) == [(110, 0)]
+
+
+def test__preset_diff_values_received_are_known(receiver):
+    sender = MidiSender()
+    sender.outport = receiver.outport
+    sender._sync_state(mido.Message("control_change", control=45, value=5))
+    sender.load_preset(dct={"main": {"button1": 5}})
+    assert sent(sender) == []
+
+    sender.modules.forget()
+    sender.load_preset(dct={"main": {"button1": 5}})
+    assert sent(sender) == [(45, 5)]
+    sender.outport = None
+
+
+def test__preset_ordered_and_rate_limited(receiver):
+    preset = {"main": {"sink2": 20, "sink1": 10}}
+    receiver.load_preset(dct=preset, ordered=True, interval_ms=20)
+    assert receiver.sink1 == 10 and receiver.sink2 == 20
+
+    end = time.perf_counter() + 1
+    while len(receiver.outport.received) < 2 and time.perf_counter() < end:
+        time.sleep(0.005)
+    assert sent(receiver) == [(99, 10), (110, 20)]
+    (first, _), (second, _) = receiver.outport.received
+    assert second - first == pytest.approx(0.02, abs=0.01)
+
+
+def test__preset_diff_values_set_disconnected_are_not_known(receiver, monkeypatch):
+    receiver.modules.main.sink2 = 20
+    assert ("main", "sink2") in receiver.modules.known
+    port = receiver.outport
+    receiver.outport = None
+    receiver.modules.main.sink1 = 10
+    assert ("main", "sink1") not in receiver.modules.known
+
+    monkeypatch.setattr(mido, "open_output", lambda *args, **kwargs: port)
+    port.received.clear()
+    receiver.connect()  # a new output, the values sent before aren't known anymore
+    receiver.load_preset(dct={"main": {"sink1": 10, "sink2": 20}})
+    assert sent(receiver) == [(99, 10), (110, 20)]
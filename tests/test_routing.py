@@ -0,0 +1,76 @@
+import mido
+import pytest
+
+import nallely
+
+from .fixtures import MidiReceiver, MidiSender
+
+
+class RecordingPort:
+    def __init__(self):
+        self.received = []
+
+    def send(self, msg):
+        self.received.append(msg)
+
+
+@pytest.fixture
+def devices():
+    sender, receiver = MidiSender(), MidiReceiver()
+    receiver.debug = False
+    receiver.outport = RecordingPort()  # type: ignore
+    yield sender, receiver
+    receiver.outport = None
+    nallely.stop_all_connected_devices()
+
+
+def test__fast_route_cc_to_cc(devices):
+    sender, receiver = devices
+    receiver.modules.main.sink1 = sender.modules.main.button1
+
+    link = sender.modules.main.button1.outgoing_links[0]
+    assert link.route is not None
+
+    sender._sync_state(mido.Message("control_change", control=45, value=32))
+
+    assert receiver.outport.received == [  # type: ignore
+        mido.Message("control_change", channel=0, control=99, value=32)
+    ]
+    assert receiver.sink1 == 32
+
+
+def test__fast_route_cc_to_cc_lut(devices):
+    sender, receiver = devices
+    scaler = sender.modules.main.button1.scale(10, 20)
+    receiver.modules.main.sink1 = scaler
+
+    sender._sync_state(mido.Message("control_change", control=45, value=127))
+    scaler.to_max = 50
+    sender._sync_state(mido.Message("control_change", control=45, value=127))
+
+    assert [m.value for m in receiver.outport.received] == [20, 50]  # type: ignore
+
+
+def test__fast_route_keys_and_fallback(devices):
+    sender, receiver = devices
+    receiver.modules.main.keys_sink = sender.modules.main.keys
+    link = sender.modules.main.keys.outgoing_links[0]
+    assert link.route is not None
+
+    sender._sync_state(mido.Message("note_on", note=60, velocity=90))
+    assert receiver.played_notes[60] == 1
+    sender._sync_state(mido.Message("note_off", note=60, velocity=0))
+    assert receiver.played_notes[60] == 0
+
+    # Python logic on the link, we go through the slow path
+    link.velocity = 12
+    link.extra_zero = "remove-note-off"
+    sender._sync_state(mido.Message("note_on", note=62, velocity=90))
+    sender._sync_state(mido.Message("note_off", note=62, velocity=0))
+
+    received = [(m.type, m.note, m.velocity) for m in receiver.outport.received]  # type: ignore
+    assert received == [
+        ("note_on", 60, 90),
+        ("note_off", 60, 0),
+        ("note_on", 62, 12),
+    ]
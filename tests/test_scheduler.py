@@ -0,0 +1,154 @@
+import time
+from decimal import Decimal
+
+import mido
+import pytest
+
+import nallely
+from nallely.clocks import Clock
+from nallely.core import VirtualDevice
+from nallely.core.scheduler import MidiScheduler, at_deadline, current_deadline
+from nallely.core.virtual_device import VirtualParameter
+from nallely.core.world import ThreadContext
+
+from .fixtures import MidiReceiver
+
+
+class RecordingPort:
+    def __init__(self):
+        self.received = []
+
+    def send(self, msg):
+        self.received.append((time.perf_counter(), msg))
+
+
+def test__scheduler_dispatch_in_deadline_order():
+    scheduler = MidiScheduler()
+    port = RecordingPort()
+    now = time.perf_counter()
+    deadlines = [now + 0.06, now + 0.02, now + 0.04]
+    for i, deadline in enumerate(deadlines):
+        scheduler.send_at(port, mido.Message("note_on", note=60 + i), deadline)
+
+    time.sleep(0.15)
+    scheduler.stop()
+
+    assert [msg.note for _, msg in port.received] == [61, 62, 60]
+    for (sent_at, _), deadline in zip(port.received, sorted(deadlines)):
+        assert sent_at >= deadline
+
+
+def test__scheduler_cancel():
+    scheduler = MidiScheduler()
+    port = RecordingPort()
+    other = RecordingPort()
+    deadline = time.perf_counter() + 0.05
+    scheduler.send_at(port, mido.Message("note_on"), deadline)
+    scheduler.send_at(other, mido.Message("note_on"), deadline)
+    scheduler.cancel_all(lambda fn, _: fn.__self__ is port)
+
+    time.sleep(0.1)
+    scheduler.stop()
+
+    assert port.received == []
+    assert len(other.received) == 1
+
+
+def test__deadline_context():
+    assert current_deadline() is None
+    with at_deadline(10.0):
+        assert current_deadline() == 10.0
+        with at_deadline(12.0):
+            assert current_deadline() == 12.0
+        assert current_deadline() == 10.0
+    assert current_deadline() is None
+
+
+@pytest.fixture
+def receiver():
+    device = MidiReceiver()
+    device.debug = False
+    device.outport = RecordingPort()  # type: ignore
+    yield device
+    device.outport = None
+    nallely.stop_all_connected_devices()
+
+
+def test__played_notes_follow_the_send_time(receiver):
+    deadline = time.perf_counter() + 0.05
+    with at_deadline(deadline):
+        receiver.note_on(60)
+    assert receiver.played_notes[60] == 0
+    assert receiver.outport.received == []
+
+    time.sleep(0.1)
+    assert receiver.played_notes[60] == 1
+    (sent_at, msg), *_ = receiver.outport.received
+    assert msg.type == "note_on" and sent_at >= deadline
+
+
+def test__all_notes_off_cancels_pending_notes(receiver):
+    with at_deadline(time.perf_counter() + 0.05):
+        receiver.note_on(60)
+    receiver.all_notes_off()
+
+    time.sleep(0.1)
+    assert receiver.played_notes[60] == 0
+    assert receiver.outport.received == []
+
+
+class Recorder(VirtualDevice):
+    input_cv = VirtualParameter("input", range=(0, 127))
+
+
+class AheadRecorder(Recorder):
+    computes_ahead = True
+
+
+@pytest.mark.parametrize("cls, on_time", [(Recorder, True), (AheadRecorder, False)])
+def test__lookahead_values_reach_devices_on_time(cls, on_time):
+    source, dest = Recorder(), cls()
+    dest.input_cv = source.output_cv
+    received = []
+    link = source.output_cv.outgoing_links[0]  # type: ignore
+    link.callback = lambda value, ctx: received.append(
+        (time.perf_counter(), value, ctx.get("deadline"))
+    )
+
+    deadline = time.perf_counter() + 0.05
+    ctx = ThreadContext({"last_values": {}, "deadline": deadline})
+    source.send_out(42, ctx, selected_outputs=[source.output_cv])
+    time.sleep(0.1)
+
+    [(received_at, value, ctx_deadline)] = received
+    assert value == 42
+    if on_time:
+        assert received_at >= deadline and ctx_deadline is None
+    else:
+        assert received_at < deadline and ctx_deadline == deadline
+    nallely.stop_all_connected_devices()
+
+
+def test__clock_lookahead_computes_ticks_ahead(monkeypatch):
+    clock = Clock()
+    clock.lookahead = 4
+    clock.play = 1
+    pulses = []
+    monkeypatch.setattr(
+        clock,
+        "send_pulse",
+        lambda value, outputs, ctx, deadline: pulses.append((value, deadline)),
+    )
+    clock.phases["lead"] = Decimal("0.999")
+    tick_time = clock.next_tick_time
+    ctx = ThreadContext({"last_values": {}})
+
+    ticks = 0
+    while ticks < 10 and "__suspend__" not in clock.main(ctx):
+        ticks += 1
+
+    assert ticks >= 4  # the clock doesn't wait until it's 4 ticks ahead
+    (on, on_deadline), (off, off_deadline), *_ = pulses
+    assert (on, on_deadline) == (1, tick_time)  # scheduled at the time of the tick
+    assert off == 0 and off_deadline > on_deadline
+    nallely.stop_all_connected_devices()
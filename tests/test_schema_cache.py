@@ -0,0 +1,100 @@
+from nallely import VirtualDevice, VirtualParameter
+from nallely.core import invalidate_schemas, no_registration
+from nallely.session import Session
+
+
+@no_registration
+class CachedDevice(VirtualDevice):
+    """Cached doc"""
+
+    input_cv = VirtualParameter("input", range=(0, 127))
+
+
+@no_registration
+class CachedSubDevice(CachedDevice):
+    other_cv = VirtualParameter("other", range=(0, 1))
+
+
+def names(schema):
+    return [parameter["name"] for parameter in schema["parameters"]]
+
+
+def test__schema_cached_per_class():
+    schema = CachedDevice.schema_as_dict()
+    assert CachedDevice.schema_as_dict() is schema
+    assert names(schema)[-1] == "input"
+
+    sub_schema = CachedSubDevice.schema_as_dict()
+    assert sub_schema is not schema
+    assert sub_schema["name"] == "CachedSubDevice"
+    assert names(sub_schema) == [*names(schema), "other"]
+
+
+def test__schema_invalidated():
+    schema = CachedDevice.schema_as_dict()
+    CachedDevice.added_cv = VirtualParameter("added")  # type: ignore
+    try:
+        assert CachedDevice.schema_as_dict() is schema
+        invalidate_schemas()
+        new_schema = CachedDevice.schema_as_dict()
+        assert new_schema is not schema
+        assert "added" in names(new_schema)
+        assert "added" in names(CachedSubDevice.schema_as_dict())
+        assert "added" in [p.name for p in CachedDevice.all_parameters()]
+    finally:
+        del CachedDevice.added_cv  # type: ignore
+        invalidate_schemas()
+    assert "added" not in names(CachedDevice.schema_as_dict())
+
+
+def test__all_parameters_returns_a_copy():
+    parameters = CachedDevice.all_parameters()
+    count = len(parameters)
+    parameters.clear()
+    assert len(CachedDevice.all_parameters()) == count
+
+
+def test__schema_invalidated_by_compile_device():
+    session = Session()
+    cls = session.compile_device(
+        "HotPatched",
+        "class HotPatched(VirtualDevice):\n"
+        '    """First"""\n'
+        '    a_cv = VirtualParameter("a")\n',
+    )
+    assert names(cls.schema_as_dict())[-1] == "a"
+    new_cls = session.compile_device(
+        "HotPatched",
+        "class HotPatched(VirtualDevice):\n"
+        '    """Second"""\n'
+        '    b_cv = VirtualParameter("b")\n',
+    )
+    schema = new_cls.schema_as_dict()
+    assert names(schema)[-1] == "b"
+    assert "a" not in names(schema)
+    assert schema["doc"] == "Second"
+
+
+def test__schema_invalidated_by_runtime_range_change():
+    from types import SimpleNamespace
+
+    from nallely.experimental.maths import Integrator
+
+    def input_range():
+        schema = Integrator.schema_as_dict()
+        return next(p for p in schema["parameters"] if p["name"] == "input")["range"]
+
+    device = SimpleNamespace(
+        limits="unbound", input_cv=SimpleNamespace(parameter=Integrator.input_cv)
+    )
+    schema = Integrator.schema_as_dict()
+    try:
+        assert Integrator.range.fget(device) == (None, None)  # type: ignore
+        assert list(input_range()) == [None, None]
+        schema = Integrator.schema_as_dict()
+        Integrator.range.fget(device)  # type: ignore
+        assert Integrator.schema_as_dict() is schema
+    finally:
+        device.limits = "-1..1"
+        Integrator.range.fget(device)  # type: ignore
+    assert list(input_range()) == [-1.0, 1.0]
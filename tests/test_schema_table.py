@@ -0,0 +1,53 @@
+from nallely.trevor.schemas import SchemaTable
+
+
+def schema(name="LFO", *parameters):
+    return {"name": name, "parameters": [{"name": p} for p in parameters]}
+
+
+def device(id, meta, **extra):
+    return {"id": id, "repr": f"{meta['name']}{id}", "meta": meta, **extra}
+
+
+def test__schemas_sent_once_per_class():
+    lfo = schema("LFO", "speed")
+    state = {"virtual_devices": [device(i, lfo) for i in range(20)]}
+    SchemaTable().normalize(state)
+    assert state["schemas"] == {"LFO": {"1": lfo}}
+    for entry in state["virtual_devices"]:
+        assert "meta" not in entry
+        assert (entry["class"], entry["schema_version"]) == ("LFO", 1)
+
+
+def test__hot_patched_class_gets_a_new_version():
+    table = SchemaTable()
+    old = schema("LFO", "speed")
+    table.normalize({"virtual_devices": [device(1, old)]})
+
+    rebuilt = schema("LFO", "speed")  # invalidated cache, same schema
+    state = {"virtual_devices": [device(1, rebuilt)]}
+    table.normalize(state)
+    assert state["virtual_devices"][0]["schema_version"] == 1
+
+    patched = schema("LFO", "speed", "phase")
+    state = {"virtual_devices": [device(1, rebuilt), device(2, patched)]}
+    table.normalize(state)
+    assert state["schemas"] == {"LFO": {"1": rebuilt, "2": patched}}
+    assert [d["schema_version"] for d in state["virtual_devices"]] == [1, 2]
+
+    # once the old instances are gone, their version is forgotten
+    state = {"virtual_devices": [device(2, patched)]}
+    table.normalize(state)
+    assert state["schemas"] == {"LFO": {"2": patched}}
+
+
+def test__proxies_keep_their_schema():
+    service = schema("my_service", "input")
+    state = {
+        "midi_devices": [device(1, {"name": "Minilogue", "sections": []})],
+        "virtual_devices": [device(2, service, proxy=True)],
+    }
+    SchemaTable().normalize(state)
+    assert state["virtual_devices"][0]["meta"] is service
+    assert list(state["schemas"]) == ["Minilogue"]
+    assert state["midi_devices"][0]["class"] == "Minilogue"
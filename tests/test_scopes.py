@@ -0,0 +1,142 @@
+import time
+
+import pytest
+
+from nallely.trevor.scopes import (
+    ScopeHub,
+    ScopeObserver,
+    ScopeSubscription,
+    decode_scope_frame,
+    encode_scope_frame,
+)
+
+
+class FakeDevice:
+    def __init__(self, uuid=42):
+        self.uuid = uuid
+        self.observers = []
+
+    def register_observer(self, observer):
+        self.observers.append(observer)
+
+    def unregister_observer(self, observer):
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+
+class FakeOutput:
+    def __init__(self, name):
+        self.name = name
+
+
+def test__scope_frame_roundtrip():
+    frame = encode_scope_frame([(1, 0.0, 1.0), (2, -3.0, 5.0)])
+    assert len(frame) == 3 + 2 * 10
+    assert decode_scope_frame(frame) == [(1, 0.0, 1.0), (2, -3.0, 5.0)]
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [("last", (1, 2.0, 2.0)), ("minmax", (1, -4.0, 10.0)), ("mean", (1, 2.0, 2.0))],
+)
+def test__subscription_decimation(mode, expected):
+    subscription = ScopeSubscription(1, None, 42, "output", mode=mode)
+    for value in (4.0, 10.0, -4.0, -2.0, 2.0):
+        subscription.add(value)
+    assert subscription.take() == expected
+    assert subscription.take() is None
+
+
+def test__subscription_unknown_mode():
+    with pytest.raises(ValueError):
+        ScopeSubscription(1, None, 42, "output", mode="median")  # type: ignore
+
+
+def test__hub_watches_devices_while_subscribed():
+    watched = []
+    hub = ScopeHub(lambda c, f: None, on_watch=lambda d, w: watched.append((d, w)))
+    first = hub.subscribe("client", 42, "output")
+    second = hub.subscribe("client", 42, "other")
+    assert watched == [(42, True)]
+
+    hub.unsubscribe(first.id)
+    assert watched == [(42, True)]
+    hub.unsubscribe(second.id)
+    assert watched == [(42, True), (42, False)]
+    assert hub.watched == {}
+
+
+def test__hub_unsubscribe_from_other_client():
+    hub = ScopeHub(lambda c, f: None)
+    subscription = hub.subscribe("client", 42, "output")
+    assert hub.unsubscribe(subscription.id, "other") is None
+    assert hub.unsubscribe(subscription.id, "client") is subscription
+
+
+def test__hub_remove_client():
+    hub = ScopeHub(lambda c, f: None)
+    hub.subscribe("a", 1, "output")
+    hub.subscribe("a", 2, "output")
+    kept = hub.subscribe("b", 1, "output")
+    hub.remove_client("a")
+    assert list(hub.subscriptions.values()) == [kept]
+    assert list(hub.watched) == [1]
+
+
+def test__hub_sends_decimated_frames():
+    frames = []
+    hub = ScopeHub(lambda client, frame: frames.append((client, frame)))
+    device = FakeDevice()
+    subscription = hub.subscribe(
+        "client", device.uuid, "output", rate=20, mode="minmax"
+    )
+    observer = ScopeObserver(hub, device)
+    hub.ensure_running()
+    try:
+        end = time.perf_counter() + 0.25
+        value = 0
+        while time.perf_counter() < end:
+            observer.triggered(value % 100, None, [FakeOutput("output")], None)
+            observer.triggered(1000, None, [FakeOutput("unwatched")], None)
+            value += 1
+            time.sleep(0.0005)
+    finally:
+        hub.stop()
+
+    assert 3 <= len(frames) <= 7
+    for client, frame in frames:
+        assert client == "client"
+        ((id, low, high),) = decode_scope_frame(frame)
+        assert id == subscription.id
+        assert 0 <= low < high <= 99
+
+
+def test__observer_dispose_removes_subscriptions():
+    hub = ScopeHub(lambda c, f: None)
+    device = FakeDevice()
+    hub.subscribe("client", device.uuid, "output")
+    observer = ScopeObserver(hub, device)
+    device.register_observer(observer)
+    observer.dispose()
+    assert device.observers == []
+    assert hub.subscriptions == {}
+
+
+def test__observer_feeds_inputs():
+    hub = ScopeHub(lambda c, f: None)
+    device = FakeDevice()
+    subscription = hub.subscribe("client", device.uuid, "speed")
+    observer = ScopeObserver(hub, device)
+    observer.received("speed", 3, None)
+    observer.received("other", 10, None)
+    assert subscription.take() == (subscription.id, 3.0, 3.0)
+
+
+def test__hub_ids_skip_the_ones_in_use():
+    hub = ScopeHub(lambda c, f: None)
+    kept = hub.subscribe("client", 42, "output")
+    assert kept.id == 1
+    for _ in range(0xFFFF - 1):
+        hub.unsubscribe(hub.subscribe("client", 42, "output").id)
+    ids = [hub.subscribe("client", 42, "output").id for _ in range(2)]
+    assert ids == [2, 3]
@@ -0,0 +1,128 @@
+import copy
+import json
+from decimal import Decimal
+
+from nallely.trevor import state_diff
+from nallely.trevor.state_diff import VersionedState, diff
+
+
+def apply(state, ops):
+    state = copy.deepcopy(state)
+    for op in ops:
+        if op["path"] == "":
+            state = op["value"]
+            continue
+        keys = [
+            k.replace("~1", "/").replace("~0", "~") for k in op["path"][1:].split("/")
+        ]
+        target = state
+        for key in keys[:-1]:
+            target = target[int(key) if isinstance(target, list) else key]
+        key = int(keys[-1]) if isinstance(target, list) else keys[-1]
+        if op["op"] == "remove":
+            del target[key]
+        elif op["op"] == "add" and isinstance(target, list):
+            target.insert(key, op["value"])
+        else:
+            target[key] = op["value"]
+    return state
+
+
+def test__diff_roundtrip():
+    old = {
+        "midi_devices": [{"id": 1, "config": {"filter": {"cutoff": 10}}}],
+        "connections": [{"id": 4}, {"id": 5}],
+        "ports/in": ["a"],
+        "flag": 1,
+    }
+    new = {
+        "midi_devices": [
+            {"id": 1, "config": {"filter": {"cutoff": 12}}},
+            {"id": 2, "config": {}},
+        ],
+        "connections": [{"id": 4}],
+        "ports/in": ["a"],
+        "flag": True,
+        "myname": "trevor",
+    }
+
+    ops = diff(old, new)
+    assert {
+        "op": "replace",
+        "path": "/midi_devices/0/config/filter/cutoff",
+        "value": 12,
+    } in ops
+    assert {"op": "remove", "path": "/connections/1"} in ops
+    assert {"op": "replace", "path": "/flag", "value": True} in ops
+    assert not any(op["path"].startswith("/ports~1in") for op in ops)
+    assert apply(old, ops) == new
+    assert diff(new, new) == []
+
+
+def test__versioned_state():
+    states = VersionedState()
+    assert states.update({"a": Decimal("1.5")}) is None
+    assert states.full() == {"a": 1.5, "version": 1}
+    assert states.update({"a": 1.5}) is None
+
+    patch = states.update({"a": 2, "b": [1]})
+    assert patch["command"] == "state_patch"
+    assert (patch["base"], patch["version"]) == (1, 2)
+    assert apply({"a": 1.5}, patch["patch"]) == {"a": 2, "b": [1]}
+
+    full = states.full({"a": 3})
+    assert full == {"a": 3, "version": 3}
+
+
+def test__versioned_state_reuses_unchanged_items():
+    states = VersionedState()
+    devices = [{"id": 1, "config": {"speed": 1}}, {"id": 2, "config": {"speed": 1}}]
+    states.update({"virtual_devices": devices, "myname": "trevor"})
+    first = states.state
+
+    devices = [{"id": 1, "config": {"speed": 1}}, {"id": 2, "config": {"speed": 3}}]
+    patch = states.update({"virtual_devices": devices, "myname": "trevor"})
+    assert patch["patch"] == [
+        {"op": "replace", "path": "/virtual_devices/1/config/speed", "value": 3}
+    ]
+    assert states.state["virtual_devices"][0] is first["virtual_devices"][0]
+    assert states.state["virtual_devices"][1] is not first["virtual_devices"][1]
+
+
+def test__versioned_state_only_encodes_changed_items(monkeypatch):
+    states = VersionedState()
+    devices = [{"id": 1, "config": {"speed": 1}}, {"id": 2, "config": {"speed": 1}}]
+    states.update({"virtual_devices": devices, "myname": "trevor"})
+
+    encoded = []
+
+    def to_json(value):
+        encoded.append(value)
+        return json.dumps(value)
+
+    monkeypatch.setattr(state_diff, "to_json", to_json)
+    devices = [{"id": 1, "config": {"speed": 1}}, {"id": 2, "config": {"speed": 3}}]
+    patch = states.update({"virtual_devices": devices, "myname": "trevor"})
+    assert encoded == [{"id": 2, "config": {"speed": 3}}]
+    assert patch["patch"] == [
+        {"op": "replace", "path": "/virtual_devices/1/config/speed", "value": 3}
+    ]
+
+
+def test__versioned_state_encode():
+    states = VersionedState()
+    full = states.full(
+        {
+            "virtual_devices": [{"id": 1, "value": Decimal("0.5")}],
+            "schemas": {"LFO": {"1": {"name": "LFO"}}},
+            "myname": "trevor",
+            "empty": [],
+        }
+    )
+    assert json.loads(states.encode(full)) == {
+        "virtual_devices": [{"id": 1, "value": 0.5}],
+        "schemas": {"LFO": {"1": {"name": "LFO"}}},
+        "myname": "trevor",
+        "empty": [],
+        "version": 1,
+    }
@@ -0,0 +1,76 @@
+import gzip
+import http.client
+import socket
+
+import pytest
+
+from nallely.trevor.static_server import HTTPServerThread
+
+PORT = 3099
+BUNDLE = b"console.log('trevor');\n" * 200
+
+
+@pytest.fixture
+def ui(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html>" + "<div></div>" * 200 + "</html>")
+    (tmp_path / "assets" / "index-Bz3x9_aQ.js").write_bytes(BUNDLE)
+    (tmp_path / "assets" / "index-Bz3x9_aQ.js.gz").write_bytes(gzip.compress(BUNDLE))
+    server = HTTPServerThread(tmp_path, port=PORT)
+    server.start()
+    yield tmp_path
+    server.stop()
+
+
+def get(path, **headers):
+    connection = http.client.HTTPConnection("localhost", PORT, timeout=5)
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test__static_server_serves_gzip_variants(ui):
+    response, body = get("/assets/index-Bz3x9_aQ.js", **{"Accept-Encoding": "gzip"})
+    assert response.status == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert gzip.decompress(body) == BUNDLE
+
+    response, body = get("/assets/index-Bz3x9_aQ.js")
+    assert response.headers["Content-Encoding"] is None
+    assert body == BUNDLE
+
+    # no .gz built, compressed once in the cache
+    response, body = get("/", **{"Accept-Encoding": "gzip, br"})
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert gzip.decompress(body) == (ui / "index.html").read_bytes()
+
+
+def test__static_server_revalidation(ui):
+    response, _ = get("/index.html")
+    etag, modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    response, body = get("/index.html", **{"If-None-Match": etag})
+    assert (response.status, body) == (304, b"")
+    response, body = get("/index.html", **{"If-Modified-Since": modified})
+    assert (response.status, body) == (304, b"")
+
+    (ui / "index.html").write_text("<html>new</html>")
+    response, body = get("/index.html", **{"If-None-Match": etag})
+    assert (response.status, body) == (200, b"<html>new</html>")
+    assert response.headers["ETag"] != etag
+
+
+def test__static_server_slow_client_doesnt_block(ui):
+    # a client which never finishes its request
+    slow = socket.create_connection(("localhost", PORT))
+    slow.sendall(b"GET /index.html HTTP/1.1\r\n")
+    try:
+        response, _ = get("/missing.js")
+        assert response.status == 404
+        response, _ = get("/index.html")
+        assert response.status == 200
+    finally:
+        slow.close()
@@ -0,0 +1,119 @@
+import threading
+
+import mido
+import pytest
+
+import nallely
+from nallely.core.sysex import SysexDump, SysexTransfer
+
+from .fixtures import MidiSender
+
+
+class RecordingPort:
+    def __init__(self):
+        self.received = []
+        self.sent = threading.Event()
+
+    def send(self, msg):
+        self.received.append(msg)
+        self.sent.set()
+
+
+class DumpSender(MidiSender):
+    sysex_dump = SysexDump(
+        header=[0x41, 0x10],
+        layout=[0x00, "main.button1", "main.button2"],
+        footer=[0x7F],
+        checksum="roland",
+        packet_size=2,
+        chunk_delay_ms=0,
+    )
+
+
+@pytest.fixture
+def device():
+    device = DumpSender()
+    device.outport = RecordingPort()  # type: ignore
+    yield device
+    device.outport = None
+    nallely.stop_all_connected_devices()
+
+
+def test__sysex_dump_messages(device):
+    device.modules.main.button1 = 0x20
+    dump = DumpSender.sysex_dump
+    assert dump.parameters == ["main.button1", "main.button2"]
+    assert dump.encode(device, {"main.button2": 0x81}) == [0x00, 0x20, 0x01]
+
+    messages = dump.messages(device)
+    assert [list(m.data) for m in messages] == [
+        [0x41, 0x10, 0x00, 0x20, 0x60, 0x7F],
+        [0x41, 0x10, 0x00, 0x00, 0x7F],
+    ]
+
+
+def test__sysex_dump_roland_dt1(device):
+    # GS reset: F0 41 10 42 12 40 00 7F 00 41 F7
+    gs_reset = SysexDump(
+        header=[0x41, 0x10, 0x42, 0x12],
+        address=[0x40, 0x00, 0x7F],
+        layout=[0x00],
+        checksum="roland",
+    )
+    assert [list(m.data) for m in gs_reset.messages(device)] == [
+        [0x41, 0x10, 0x42, 0x12, 0x40, 0x00, 0x7F, 0x00, 0x41]
+    ]
+
+    chunked = SysexDump(
+        header=[0x41, 0x10, 0x42, 0x12],
+        address=[0x40, 0x00, 0x7F],
+        layout=[0x00, 0x7F, "main.button1"],
+        checksum="roland",
+        packet_size=1,
+    )
+    device.modules.main.button1 = 0x04
+    messages = [list(m.data[4:]) for m in chunked.messages(device)]
+    # the address is advanced for each chunk, with a 7bits carry
+    assert messages == [
+        [0x40, 0x00, 0x7F, 0x00, 0x41],
+        [0x40, 0x01, 0x00, 0x7F, 0x40],
+        [0x40, 0x01, 0x01, 0x04, 0x3A],
+    ]
+
+
+def test__preset_load_sends_sysex_dump(device):
+    device.modules.from_dict_patch({"main": {"button1": 10, "button2": 20}})
+    device.outport.sent.wait(1)  # type: ignore
+    device.sysex_streamer.submit(SysexTransfer([], chunk_delay_ms=0)).wait(
+        1
+    )  # everything before is streamed
+
+    received = device.outport.received  # type: ignore
+    assert all(m.type == "sysex" for m in received)
+    assert [list(m.data[2:-2]) for m in received] == [[0x00, 10], [20]]
+    assert device.modules.main.button1 == 10
+    assert device.modules.main.button2 == 20
+
+
+def test__sysex_handshake(device):
+    messages = [mido.Message("sysex", data=[0x01, i]) for i in range(3)]
+    transfer = device.send_sysex(
+        messages, chunk_delay_ms=0, handshake=[0x7E], handshake_timeout_ms=1000
+    )
+    for _ in range(2):
+        device.outport.sent.wait(1)  # type: ignore
+        device.outport.sent.clear()  # type: ignore
+        device._sync_state(mido.Message("sysex", data=[0x7E, 0x00]))
+    assert transfer.wait(1)
+    assert transfer.error is None
+    assert transfer.sent == 3
+
+
+def test__sysex_handshake_timeout(device):
+    messages = [mido.Message("sysex", data=[0x01, i]) for i in range(3)]
+    transfer = device.send_sysex(
+        messages, chunk_delay_ms=0, handshake=[0x7E], handshake_timeout_ms=20
+    )
+    assert transfer.wait(1)
+    assert transfer.sent == 1
+    assert transfer.error
@@ -0,0 +1,112 @@
+import pytest
+
+from nallely.trevor.topology import LazyClients, page
+
+
+def device(id, name="LFO", **config):
+    return {
+        "id": id,
+        "repr": f"{name}{id}",
+        "class": name,
+        "schema_version": 1,
+        "config": config,
+    }
+
+
+def link(id, src, dst):
+    return {
+        "id": id,
+        "src": {"device": src, "parameter": {"name": "output"}},
+        "dest": {"device": dst, "parameter": {"name": "speed"}},
+        "muted": False,
+    }
+
+
+def state(devices, links=()):
+    return {
+        "virtual_devices": list(devices),
+        "connections": list(links),
+        "schemas": {"LFO": {"1": {"name": "LFO", "parameters": []}}},
+    }
+
+
+def test__topology_of_a_new_client():
+    lazy = LazyClients()
+    message = lazy.add_client("a", state([device(1), device(2)], [link(10, 1, 2)]))
+    assert message["command"] == "topology"
+    assert message["devices"]["1"] == {
+        "id": 1,
+        "repr": "LFO1",
+        "kind": "virtual",
+        "class": "LFO",
+        "schema_version": 1,
+        "paused": False,
+    }
+    assert message["schemas"]["LFO"]["1"]["name"] == "LFO"
+    assert message["links"]["10"]["src"] == 1
+    assert message["links"]["10"]["dst_parameter"] == "speed"
+    assert "config" not in message["devices"]["1"]
+
+
+def test__viewport_receives_details():
+    lazy = LazyClients()
+    lazy.add_client("a", state([device(1), device(2), device(3)], [link(10, 1, 2)]))
+    messages = lazy.set_viewport("a", [2])
+    assert [(m["command"], m["id"]) for m in messages] == [
+        ("device_update", "2"),
+        ("link_update", "10"),
+    ]
+    assert messages[0]["device"]["config"] == {}
+    # already displayed devices are not sent again
+    assert lazy.set_viewport("a", [2]) == []
+
+
+def test__updates_only_for_the_viewport():
+    lazy = LazyClients()
+    lazy.add_client("a", state([device(1), device(2)]))
+    lazy.add_client("b", state([device(1), device(2)]))
+    lazy.set_viewport("a", [1])
+    lazy.set_viewport("b", [2])
+
+    patch, updates = lazy.update(state([device(1, speed=3), device(2)]))
+    assert patch is None  # the topology didn't change
+    assert updates == {
+        "a": [
+            {
+                "command": "device_patch",
+                "id": "1",
+                "patch": [{"op": "add", "path": "/config/speed", "value": 3}],
+            }
+        ]
+    }
+
+    patch, updates = lazy.update(state([device(1, speed=3)]))
+    assert patch["command"] == "topology_patch"
+    assert patch["patch"] == [{"op": "remove", "path": "/devices/2"}]
+    assert updates == {"b": [{"command": "device_update", "id": "2", "device": None}]}
+
+
+def test__removed_link_updates_its_devices_viewport():
+    lazy = LazyClients()
+    lazy.add_client("a", state([device(1), device(2)], [link(10, 1, 2)]))
+    lazy.set_viewport("a", [2])
+    _, updates = lazy.update(state([device(1), device(2)]))
+    assert updates == {"a": [{"command": "link_update", "id": "10", "link": None}]}
+
+
+def test__details_without_lazy_clients():
+    lazy = LazyClients()
+    details = lazy.details(state([device(1), device(2)], [link(10, 1, 2)]), [2], [10])
+    assert details["devices"] == [device(2)]
+    assert details["links"][0]["id"] == 10
+
+
+def test__pages():
+    devices = [device(i) for i in range(250)]
+    first = page(state(devices), "virtual_devices", 0, 100)
+    last = page(state(devices), "virtual_devices", 200, 100)
+    assert first["total"] == 250
+    assert first["items"] == devices[:100]
+    assert last["items"] == devices[200:]
+    with pytest.raises(ValueError):
+        page(state(devices), "presets")
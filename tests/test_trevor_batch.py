@@ -0,0 +1,145 @@
+import pytest
+
+import nallely
+from nallely.core import all_devices
+from nallely.trevor.trevor_api import BatchError, TrevorAPI
+
+from .fixtures import let_time_to_react
+
+
+@pytest.fixture
+def api():
+    yield TrevorAPI()
+    nallely.stop_all_connected_devices()
+
+
+def output(device_id):
+    return f"{device_id}::__virtual__::output_cv"
+
+
+def speed(device_id):
+    return f"{device_id}::__virtual__::speed_cv"
+
+
+def test__batch_resolves_references(api):
+    created = []
+    results = api.batch(
+        [
+            {"command": "create_device", "name": "LFO"},
+            {"command": "create_device", "name": "LFO"},
+            {
+                "command": "associate_parameters",
+                "from_parameter": output("$0"),
+                "to_parameter": speed("$1"),
+                "unbind": False,
+            },
+            {
+                "command": "set_virtual_value",
+                "device_id": "$1",
+                "parameter": "min_value",
+                "value": 3,
+            },
+        ],
+        on_created=created.append,
+    )
+    first, second = created
+    link = first.links_registry[(output(first.uuid), speed(second.uuid))]
+    assert results == [first.uuid, second.uuid, id(link.chain), None]
+    assert (output(first.uuid), speed(second.uuid)) in first.links_registry
+    assert second.min_value == 3
+
+
+def test__batch_references_scalers(api):
+    src, dst = api.create_device("LFO"), api.create_device("LFO")
+    results = api.batch(
+        [
+            {
+                "command": "associate_parameters",
+                "from_parameter": output(src.uuid),
+                "to_parameter": speed(dst.uuid),
+                "unbind": False,
+                "with_scaler": False,
+            },
+            {
+                "command": "create_scaler",
+                "from_parameter": output(src.uuid),
+                "to_parameter": speed(dst.uuid),
+                "create": True,
+            },
+            {
+                "command": "set_scaler_parameter",
+                "scaler_id": "$1",
+                "parameter": "to_min",
+                "value": 4,
+            },
+        ]
+    )
+    scaler = api.get_link(output(src.uuid), speed(dst.uuid)).chain
+    assert results == [None, id(scaler), None]
+    assert scaler.to_min == 4
+
+
+def test__batch_rolls_back_on_error(api):
+    lfo = api.create_device("LFO")
+    lfo.min_value = 1
+    before = list(all_devices())
+    with pytest.raises(BatchError) as error:
+        api.batch(
+            [
+                {"command": "create_device", "name": "LFO"},
+                {
+                    "command": "associate_parameters",
+                    "from_parameter": output("$0"),
+                    "to_parameter": speed(lfo.uuid),
+                    "unbind": False,
+                },
+                {
+                    "command": "set_virtual_value",
+                    "device_id": lfo.uuid,
+                    "parameter": "min_value",
+                    "value": 5,
+                },
+                {"command": "create_device", "name": "NotADevice"},
+            ]
+        )
+    assert error.value.index == 3
+    assert list(all_devices()) == before
+    let_time_to_react(0.1)  # the values are queued to the device thread
+    assert lfo.min_value == 1
+
+
+def test__batch_restores_replaced_links(api):
+    src, dst = api.create_device("LFO"), api.create_device("LFO")
+    link = api.associate_parameters(
+        output(src.uuid), speed(dst.uuid), with_scaler={"to_min": 2, "to_max": 8}
+    )
+    link.muted = True
+    with pytest.raises(BatchError):
+        api.batch(
+            [
+                {
+                    "command": "associate_parameters",
+                    "from_parameter": output(src.uuid),
+                    "to_parameter": speed(dst.uuid),
+                    "unbind": True,
+                },
+                {"command": "set_scaler_parameter", "scaler_id": 0, "parameter": 1},
+            ]
+        )
+    restored = api.get_link(output(src.uuid), speed(dst.uuid))
+    assert restored is not None
+    assert restored.muted
+    assert (restored.chain.to_min, restored.chain.to_max) == (2, 8)
+
+
+def test__batch_rejects_unknown_commands(api):
+    before = list(all_devices())
+    with pytest.raises(BatchError) as error:
+        api.batch(
+            [
+                {"command": "create_device", "name": "LFO"},
+                {"command": "reset_all"},
+            ]
+        )
+    assert error.value.index == 1
+    assert list(all_devices()) == before
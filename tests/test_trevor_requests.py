@@ -0,0 +1,136 @@
+import json
+import threading
+
+import pytest
+
+from nallely.trevor.state_diff import VersionedState
+from nallely.trevor.trevor_bus import CommandResult, TrevorBus
+
+
+class Writer:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+class Writers:
+    def __init__(self):
+        self.writers = {}
+
+    def for_client(self, client):
+        return self.writers.setdefault(client, Writer())
+
+
+class FakeBus:
+    client_commands = TrevorBus.client_commands
+    answering_commands = TrevorBus.answering_commands
+    handleMessage = TrevorBus.handleMessage
+    run_command = TrevorBus.run_command
+    to_json = staticmethod(TrevorBus.to_json)
+
+    def __init__(self):
+        self.writers = Writers()
+        self.broadcasted = []
+        self.states = VersionedState()
+
+    def send_message(self, message):
+        self.broadcasted.append(message)
+
+    def create_device(self, name):
+        return CommandResult(42)
+
+    def list_patches(self):
+        return {"command": "patches", "arg": []}
+
+    def kill_device(self, device_id):
+        raise StopIteration()
+
+    def completion_request(self, requestId, expression):
+        return {"command": "completion", "requestId": requestId, "options": []}
+
+    def create_link(self):
+        # another thread can't take the lock to snapshot the session meanwhile
+        snapshot = threading.Thread(target=self.try_snapshot)
+        snapshot.start()
+        snapshot.join()
+
+    def try_snapshot(self):
+        if self.states.lock.acquire(blocking=False):
+            self.states.lock.release()
+            self.broadcasted.append("snapshot")
+
+
+def request(bus, client, command, **params):
+    bus.handleMessage(client, json.dumps({"command": command, **params}))
+    return bus.writers.for_client(client).sent
+
+
+def test__fire_and_forget_commands():
+    bus = FakeBus()
+    assert request(bus, "client", "create_device", name="LFO") == []
+    assert request(bus, "client", "list_patches") == []
+    assert bus.broadcasted == [{"command": "patches", "arg": []}]
+    with pytest.raises(StopIteration):
+        request(bus, "client", "kill_device", device_id=1)
+
+
+def test__requests_are_acknowledged_to_their_client():
+    bus = FakeBus()
+    request(bus, "a", "create_device", name="LFO", requestId=1)
+    request(bus, "a", "list_patches", requestId=2)
+    request(bus, "a", "kill_device", device_id=1, requestId=3)
+    acks = bus.writers.for_client("a").sent
+    assert acks[:2] == [
+        {"command": "ack", "requestId": 1, "result": 42},
+        {"command": "ack", "requestId": 2},
+    ]
+    assert acks[2]["requestId"] == 3
+    assert acks[2]["error"].startswith("StopIteration")
+    assert bus.writers.for_client("b").sent == []
+    # the messages returned by the commands are still broadcasted
+    assert bus.broadcasted == [{"command": "patches", "arg": []}]
+
+
+def test__answering_commands_keep_their_request_id():
+    bus = FakeBus()
+    request(bus, "a", "completion_request", expression="x", requestId="r1")
+    assert bus.writers.for_client("a").sent == []
+    assert bus.broadcasted == [
+        {"command": "completion", "requestId": "r1", "options": []}
+    ]
+
+
+def test__commands_run_under_the_states_lock():
+    bus = FakeBus()
+    request(bus, "a", "create_link")
+    assert bus.broadcasted == []
+    bus.try_snapshot()
+    assert bus.broadcasted == ["snapshot"]
+
+
+class StateBus(FakeBus):
+    full_state = TrevorBus.full_state
+
+    def __init__(self):
+        super().__init__()
+        self.session = {"devices": [1]}
+        self.states.full(self.session)
+
+    def flush_update(self):
+        patch = self.states.update(self.session)
+        if patch:
+            self.send_message(patch)
+
+
+def test__full_state_sent_to_its_client_with_its_version():
+    bus = StateBus()
+    bus.session = {"devices": [1, 2]}
+    request(bus, "a", "full_state", requestId=1)
+    state, ack = bus.writers.for_client("a").sent
+    assert state == {"devices": [1, 2], "version": 2}
+    assert ack == {"command": "ack", "requestId": 1}
+    assert bus.writers.for_client("b").sent == []
+    # the pending update went to everyone, the next patch applies on version 2
+    assert [(m["base"], m["version"]) for m in bus.broadcasted] == [(1, 2)]
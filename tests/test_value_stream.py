@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from nallely.trevor.value_stream import (
+    CC_VALUES_FRAME,
+    ControlValueStream,
+    decode_frame,
+    encode_frame,
+    merge_frames,
+)
+
+
+def test__frame_roundtrip():
+    frame = encode_frame({0: 1.0, 3: 127.0, 512: -0.5})
+    assert len(frame) == 3 + 3 * 6
+    assert decode_frame(frame) == (CC_VALUES_FRAME, {0: 1.0, 3: 127.0, 512: -0.5})
+
+
+def test__frame_float32_values():
+    _, values = decode_frame(encode_frame({1: 0.1}))
+    assert values[1] == pytest.approx(0.1, rel=1e-6)
+
+
+def test__stream_indices_and_table():
+    stream = ControlValueStream()
+    stream.update((1, "dev", "filter", "cutoff"), 10)
+    stream.update((1, "dev", "filter", "resonance"), 20)
+    stream.update((1, "dev", "filter", "cutoff"), 30)
+
+    assert stream.unpublished()
+    assert stream.table() == [
+        (1, "dev", "filter", "cutoff"),
+        (1, "dev", "filter", "resonance"),
+    ]
+    assert not stream.unpublished()
+    assert decode_frame(stream.frame()) == (CC_VALUES_FRAME, {0: 30, 1: 20})  # type: ignore
+    assert stream.frame() is None
+
+
+def test__stream_only_sends_changed_values():
+    stream = ControlValueStream()
+    stream.update("a", 1)
+    stream.update("b", 2)
+    stream.table()
+    stream.frame()
+
+    stream.update("a", 1)
+    stream.update("b", 3)
+    assert decode_frame(stream.frame())[1] == {1: 3}  # type: ignore
+
+    stream.update("a", 1)
+    assert stream.frame() is None
+
+
+def test__stream_keeps_unpublished_values():
+    stream = ControlValueStream()
+    stream.update("a", 1)
+    stream.table()
+    stream.update("b", 2)
+
+    assert decode_frame(stream.frame())[1] == {0: 1}  # type: ignore
+    stream.table()
+    assert decode_frame(stream.frame())[1] == {1: 2}  # type: ignore
+
+
+def test__merged_frames_keep_all_the_deltas():
+    stream = ControlValueStream()
+    stream.update("a", 1)
+    stream.update("b", 2)
+    stream.table()
+    first = stream.frame()
+    stream.update("b", 3)
+    stream.update("c", 4)
+    stream.table()
+    merged = merge_frames(first, stream.frame())  # type: ignore
+    assert decode_frame(merged) == (CC_VALUES_FRAME, {0: 1, 1: 3, 2: 4})
+
+
+def test__stream_forgets_keys():
+    stream = ControlValueStream()
+    for key, value in (((1, "a"), 1), ((2, "b"), 2), ((1, "c"), 3)):
+        stream.update(key, value)
+    stream.table()
+    stream.frame()
+
+    assert not stream.retain(lambda key: True)
+    assert stream.retain(lambda key: key[0] != 2)
+    assert stream.unpublished()
+    assert stream.table() == [(1, "a"), (1, "c")]
+    assert decode_frame(stream.frame())[1] == {0: 1, 1: 3}  # type: ignore
+    stream.update((1, "c"), 5)
+    assert decode_frame(stream.frame())[1] == {1: 5}  # type: ignore
+
+
+def test__stream_update_while_forgetting_keys():
+    stream = ControlValueStream()
+    stream.update((2, "b"), 1)
+    stream.update((1, "a"), 2)
+    forgetters = []
+
+    class Indices(dict):
+        def get(self, key, default=None):
+            # retain() runs between the lookup of the index and the write
+            forgetter = threading.Thread(
+                target=stream.retain, args=(lambda key: key[0] != 2,)
+            )
+            forgetters.append(forgetter)
+            forgetter.start()
+            forgetter.join(0.1)
+            return super().get(key, default)
+
+    stream.indices = Indices(stream.indices)
+    stream.update((1, "a"), 3)
+    forgetters[0].join()
+
+    assert stream.table() == [(1, "a")]
+    assert stream.current == [3]
@@ -15,6 +15,7 @@ import type {
 	MidiDeviceSection,
 	MidiDeviceWithSection,
 	MidiParameter,
+	MpeZone,
 	PadOrKey,
 	PadsOrKeys,
 	Pitchwheel,
@@ -218,7 +219,7 @@ const collectAllVirtualParameters = (device: VirtualDevice) => {
 };
 
 const collectAllMidiParameters = (device: MidiDevice) => {
-	const parameters: (MidiParameter | PadsOrKeys | Pitchwheel)[] = [];
+	const parameters: (MidiParameter | PadsOrKeys | Pitchwheel | MpeZone)[] = [];
 	for (const section of device.meta.sections) {
 		if (section.pads_or_keys) {
 			parameters.push(section.pads_or_keys);
@@ -227,6 +228,7 @@ const collectAllMidiParameters = (device: MidiDevice) => {
 		// 	parameters.push(section.pitchwheel);
 		// }
 		parameters.push(...section.pitchwheels);
+		parameters.push(...(section.mpe_zones ?? []));
 		parameters.push(...section.parameters);
 	}
 	return parameters.map((p) => parameterUUID(device.id, p));
@@ -244,6 +246,7 @@ const getSectionParameters = (sectionWrapper) => {
 		return [];
 	}
 	const pitchwheels = sectionWrapper.section.pitchwheels ?? [];
+	const mpeZones = sectionWrapper.section.mpe_zones ?? [];
 	const mainOutputIndex = sectionWrapper.section.parameters.findIndex(
 		(e) => e.name === "output_cv",
 	);
@@ -252,7 +255,7 @@ const getSectionParameters = (sectionWrapper) => {
 		const output = params.splice(mainOutputIndex, 1);
 		params.push(...output);
 	}
-	return [...params, ...pitchwheels];
+	return [...params, ...pitchwheels, ...mpeZones];
 };
 
 const selectAllVirtualDeviceSection = createSelector(
@@ -436,10 +439,15 @@ const PatcheableParameter = ({
 	onLongPress?: (srcId: string, portElemId: string, pointerId: number) => void;
 }) => {
 	const trevor = useTrevorWebSocket();
+	const inputOnlySection = section.section as {
+		pitchwheels?: { name: string }[];
+		mpe_zones?: { name: string }[];
+	};
+	// pitchwheels and MPE zones have no value to set from the UI
 	const isPitchwheel =
-		(section.section as { pitchwheels?: { name: string }[] }).pitchwheels?.some(
-			(pw) => pw.name === param.name,
-		) ?? false;
+		inputOnlySection.pitchwheels?.some((pw) => pw.name === param.name) ||
+		inputOnlySection.mpe_zones?.some((zone) => zone.name === param.name) ||
+		false;
 	const handleValueChange = (value: string | number) => {
 		if (param.section_name === "__virtual__") {
 			trevor?.setVirtualValue(
@@ -11,8 +11,17 @@ export interface NallelyState {
 	waiting_services: ExternalService[];
 	exposed_services: Record<string, [string, string][]>;
 	myname: string | undefined;
+	cc_indices?: CCIndex[];
+	// class name -> schema version -> schema, referred to by the devices
+	schemas?: Record<
+		string,
+		Record<string, VirtualDeviceSchema | MidiDeviceSchema>
+	>;
 }
 
+// [device id, device, section, parameter] of an index of the CC values frames
+export type CCIndex = [number, string, string, string];
+
 export type ExternalService = {
 	key: string;
 	target: string;
@@ -33,6 +42,8 @@ export interface VirtualDevice {
 	id: number;
 	repr: string;
 	meta: VirtualDeviceSchema;
+	class?: string;
+	schema_version?: number;
 	config: {
 		[key: string]: string | number | boolean;
 	};
@@ -58,6 +69,8 @@ export interface MidiDevice {
 	id: number;
 	repr: string;
 	meta: MidiDeviceSchema;
+	class?: string;
+	schema_version?: number;
 	config: {
 		// [key: string]: Record<string, MidiConfigValue>;
 		[key: string]: Record<string, number>;
@@ -99,6 +112,7 @@ export interface MidiDeviceSection {
 	name: string;
 	pads_or_keys: PadsOrKeys | null;
 	pitchwheels: Pitchwheel[];
+	mpe_zones?: MpeZone[];
 	parameters: MidiParameter[];
 	virtual: false;
 }
@@ -135,6 +149,18 @@ export interface MidiParameter {
 
 export type Pitchwheel = PadOrKey;
 
+// MPE zone of a controller, an output only port carrying all the voices
+export interface MpeZone {
+	zone: "lower" | "upper";
+	members: number;
+	channel: number | null;
+	section_name: string;
+	name: string;
+	cc_note: -1;
+	range: [number, number];
+	stream: boolean;
+}
+
 export type MidiDeviceWithSection = {
 	device: MidiDevice;
 	section: MidiDeviceSection;
@@ -0,0 +1,57 @@
+// Applies JSON-patch (RFC 6902) operations sent by Trevor on the state.
+// Objects and arrays on the path of an operation are copied, the rest of the
+// state is shared with the previous one.
+
+export type PatchOperation = {
+	op: "add" | "remove" | "replace";
+	path: string;
+	value?: unknown;
+};
+
+const unescape = (key: string) => key.replace(/~1/g, "/").replace(/~0/g, "~");
+
+const applyOperation = (
+	target: any,
+	keys: string[],
+	operation: PatchOperation,
+): any => {
+	if (keys.length === 0) {
+		return operation.value;
+	}
+	const [key, ...rest] = keys;
+	if (Array.isArray(target)) {
+		const copy = [...target];
+		const index = key === "-" ? copy.length : Number.parseInt(key, 10);
+		if (rest.length > 0) {
+			copy[index] = applyOperation(copy[index], rest, operation);
+		} else if (operation.op === "remove") {
+			copy.splice(index, 1);
+		} else if (operation.op === "add") {
+			copy.splice(index, 0, operation.value);
+		} else {
+			copy[index] = operation.value;
+		}
+		return copy;
+	}
+	const copy = { ...target };
+	if (rest.length > 0) {
+		copy[key] = applyOperation(copy[key], rest, operation);
+	} else if (operation.op === "remove") {
+		delete copy[key];
+	} else {
+		copy[key] = operation.value;
+	}
+	return copy;
+};
+
+export const applyPatch = <T>(state: T, operations: PatchOperation[]): T => {
+	let result: any = state;
+	for (const operation of operations) {
+		const keys =
+			operation.path === ""
+				? []
+				: operation.path.split("/").slice(1).map(unescape);
+		result = applyOperation(result, keys, operation);
+	}
+	return result;
+};
@@ -0,0 +1,38 @@
+// Device entries of the state refer to their class schema in the schemas
+// table (sent once per class), the components expect it in `meta`.
+// Resolved devices are cached by entry, so the devices untouched by a patch
+// keep their identity.
+
+import type { MidiDevice, NallelyState, VirtualDevice } from "../model";
+
+const resolved = new WeakMap<object, object>();
+
+const resolveDevice = <T extends VirtualDevice | MidiDevice>(
+	device: T,
+	schemas: NonNullable<NallelyState["schemas"]>,
+): T => {
+	if (device.meta || !device.class) {
+		return device;
+	}
+	let resolvedDevice = resolved.get(device) as T | undefined;
+	if (!resolvedDevice) {
+		const meta = schemas[device.class]?.[String(device.schema_version)];
+		resolvedDevice = { ...device, meta } as T;
+		resolved.set(device, resolvedDevice);
+	}
+	return resolvedDevice;
+};
+
+export const resolveSchemas = (state: NallelyState): NallelyState => {
+	const schemas = state.schemas;
+	if (!schemas) {
+		return state;
+	}
+	return {
+		...state,
+		midi_devices: state.midi_devices?.map((d) => resolveDevice(d, schemas)),
+		virtual_devices: state.virtual_devices?.map((d) =>
+			resolveDevice(d, schemas),
+		),
+	};
+};
@@ -1,4 +1,6 @@
 import type {
+	CCIndex,
+	CCValues,
 	MidiDevice,
 	MidiParameter,
 	PadOrKey,
@@ -16,10 +18,18 @@ import {
 import * as RuntimeAPI from "../store/runtimeSlice";
 import * as TrevorAPI from "../store/trevorSlice";
 import { setFullState } from "../store/trevorSlice";
+import { applyPatch } from "../utils/jsonPatch";
+import { resolveSchemas } from "../utils/schemas";
 import { isPadOrdKey, isPadsOrdKeys, isVirtualParameter } from "../utils/utils";
 
 // const WEBSOCKET_URL = `ws://${window.location.hostname}:6788/trevor`;
 
+const CC_VALUES_FRAME = 1;
+const SCOPE_FRAME = 2;
+
+// receives the low and high values of a frame (the same value for "last" and "mean")
+type ScopeListener = (low: number, high: number) => void;
+
 export const WsStatus = {
 	CONNECTED: "connected",
 	DISCONNECTED: "disconnected",
@@ -34,6 +44,11 @@ export class TrevorWebSocket {
 	private pendingRequests = new Map<string, (response: any) => void>();
 	private retryTimeoutId: ReturnType<typeof setTimeout> | null = null;
 	private unsubscribe;
+	// last full state received and its version, patches are applied on it
+	private state: any = null;
+	private stateVersion = -1;
+	private resyncing = false;
+	private scopeListeners = new Map<number, ScopeListener>();
 
 	constructor(public url: string) {
 		this.connect(this.url);
@@ -59,6 +74,73 @@ export class TrevorWebSocket {
 		this.unsubscribe();
 		this.disconnect();
 	}
+	private handleFrame(data: ArrayBuffer) {
+		// type (u8), count (u16), then count * (index (u16), value (f32)), little endian
+		const view = new DataView(data);
+		if (view.getUint8(0) === SCOPE_FRAME) {
+			this.handleScopeFrame(view);
+			return;
+		}
+		if (view.getUint8(0) !== CC_VALUES_FRAME) {
+			return;
+		}
+		const indices: CCIndex[] = this.state?.cc_indices ?? [];
+		const count = view.getUint16(1, true);
+		const values: CCValues = {};
+		for (let i = 0, offset = 3; i < count; i++, offset += 6) {
+			const key = indices[view.getUint16(offset, true)];
+			if (!key) {
+				continue;
+			}
+			const [deviceId, device, section, parameter] = key;
+			values[deviceId] ??= {};
+			values[deviceId][device] ??= {};
+			values[deviceId][device][section] ??= {};
+			values[deviceId][device][section][parameter] = view.getFloat32(
+				offset + 2,
+				true,
+			);
+		}
+		store.dispatch(RuntimeAPI.updateCCValues(values));
+	}
+
+	private handleScopeFrame(view: DataView) {
+		// type (u8), count (u16), then count * (id (u16), low (f32), high (f32))
+		const count = view.getUint16(1, true);
+		for (let i = 0, offset = 3; i < count; i++, offset += 10) {
+			const listener = this.scopeListeners.get(view.getUint16(offset, true));
+			listener?.(
+				view.getFloat32(offset + 2, true),
+				view.getFloat32(offset + 6, true),
+			);
+		}
+	}
+
+	async subscribeScope(
+		deviceId: number,
+		parameter: string,
+		listener: ScopeListener,
+		rate = 30,
+		mode: "last" | "minmax" | "mean" = "last",
+	): Promise<number> {
+		const subscription = await this.requestWithAnswer("subscribe_scope", {
+			device_id: deviceId,
+			parameter,
+			rate,
+			mode,
+		});
+		this.scopeListeners.set(subscription.id, listener);
+		return subscription.id;
+	}
+
+	unsubscribeScope(scopeId: number) {
+		this.scopeListeners.delete(scopeId);
+		this.sendJsonMessage({
+			command: "unsubscribe_scope",
+			scope_id: scopeId,
+		});
+	}
+
 	private generateRequestId(): string {
 		return Math.random().toString(36).substr(2, 9);
 	}
@@ -97,6 +179,10 @@ export class TrevorWebSocket {
 			this.retryTimeoutId = null;
 		}
 		this.manualClose = false;
+		this.state = null;
+		this.resyncing = false;
+		// subscriptions don't survive the connection
+		this.scopeListeners.clear();
 		if (this.socket) {
 			this.socket.close();
 			this.socket = null;
@@ -109,12 +195,18 @@ export class TrevorWebSocket {
 			return;
 		}
 
+		this.socket.binaryType = "arraybuffer";
+
 		this.socket.onopen = () => {
 			console.debug("Connected to Trevor");
 			this.isConnected = true;
 		};
 
 		this.socket.onmessage = (event) => {
+			if (event.data instanceof ArrayBuffer) {
+				this.handleFrame(event.data);
+				return;
+			}
 			const message = JSON.parse(event.data);
 			if (message.errors) {
 				store.dispatch(setErrors(message.errors));
@@ -125,8 +217,30 @@ export class TrevorWebSocket {
 				return;
 			}
 			if (message.command === undefined) {
+				if (message.version === undefined) {
+					console.debug("Untagged message ignored", message);
+					return;
+				}
+				this.state = message;
+				this.stateVersion = message.version;
+				this.resyncing = false;
 				store.dispatch(setConnected(WsStatus.CONNECTED));
-				store.dispatch(setFullState(message));
+				store.dispatch(setFullState(resolveSchemas(message)));
+				return;
+			}
+			if (message.command === "state_patch") {
+				if (this.state === null || message.base !== this.stateVersion) {
+					// we missed a patch, we ask for the full state
+					this.state = null;
+					if (!this.resyncing) {
+						this.resyncing = true;
+						this.pullFullState();
+					}
+					return;
+				}
+				this.state = applyPatch(this.state, message.patch);
+				this.stateVersion = message.version;
+				store.dispatch(setFullState(resolveSchemas(this.state)));
 				return;
 			}
 			if (message.command.startsWith("RuntimeAPI::")) {
@@ -147,6 +261,27 @@ export class TrevorWebSocket {
 				store.dispatch(apiCommand(message.arg));
 				return;
 			}
+			if (message.command === "scopeSubscribed" && message.requestId) {
+				const resolve = this.pendingRequests.get(message.requestId);
+				if (resolve) {
+					this.pendingRequests.delete(message.requestId);
+					resolve(message.arg);
+				}
+				return;
+			}
+			if (message.command === "ack" && message.requestId) {
+				// generic acknowledgement, with the result or the error of the command
+				const resolve = this.pendingRequests.get(message.requestId);
+				if (resolve) {
+					this.pendingRequests.delete(message.requestId);
+					resolve(
+						message.error
+							? Promise.reject(new Error(message.error))
+							: message.result,
+					);
+				}
+				return;
+			}
 			if (message.command === "completion" && message.requestId) {
 				const resolve = this.pendingRequests.get(message.requestId);
 				if (resolve) {
@@ -501,6 +636,7 @@ export class TrevorWebSocket {
 	}
 
 	pullFullState() {
+		// the state is sent to this client only
 		this.sendJsonMessage({
 			command: "full_state",
 		});